@@ -32,3 +32,9 @@ class RuntimeInstance(object):
 class StoreType(Enum):
     IN_MEMORY = "IN_MEMORY"
     LMDB = "LMDB"
+
+
+class StorageLevel(Enum):
+    DISK_ONLY = "DISK_ONLY"
+    MEMORY_ONLY = "MEMORY_ONLY"
+    MEMORY_AND_DISK = "MEMORY_AND_DISK"
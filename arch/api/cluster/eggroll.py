@@ -14,15 +14,29 @@
 #  limitations under the License.
 #
 
+import math
 import uuid
 from functools import partial
 from operator import is_not
 from typing import Iterable
 
 import grpc
+import numpy as np
 
 from arch.api.utils import eggroll_serdes, file_utils
 from arch.api.utils.log_utils import getLogger
+from arch.api.utils.broadcast_utils import Broadcast, broadcast_copy, local_reader
+from arch.api.utils.future_utils import DTableFuture, combine_partials
+from arch.api.utils import load_utils
+from arch.api.utils.array_utils import array_partition, concat_arrays
+from arch.api.utils.load_utils import default_progress_path, LOAD_CHUNK_BYTES
+from arch.api.utils.fold_utils import aggregate_partition, dump_zero, reduce_partition, tree_scale
+from arch.api.utils.partition_utils import resolve_partitions
+from arch.api.utils.join_utils import broadcast_side
+from arch.api.utils.pair_utils import broadcast_join_partition, flat_map_partition, KeepRows, PartitionPairs, \
+    ProbeKeys
+from arch.api.utils.sample_utils import merge_samples, sample_partition
+from arch.api.utils.stats_utils import StatsCatalog, TableStats
 from arch.api.proto import kv_pb2, kv_pb2_grpc, processor_pb2, processor_pb2_grpc, storage_basic_pb2
 from arch.api.utils import cloudpickle
 
@@ -35,16 +49,47 @@ def init(job_id=None, server_conf_path="arch/conf/server_conf.json"):
     server_conf = file_utils.load_json_conf(server_conf_path)
     _roll_host = server_conf.get("servers").get("roll").get("host")
     _roll_port = server_conf.get("servers").get("roll").get("port")
-    _EggRoll(job_id, _roll_host, _roll_port)
+    # processors behind the roll, tables are spread over them when no partition count is given
+    _roll_eggs = server_conf.get("servers").get("roll").get("eggs", 1)
+    _EggRoll(job_id, _roll_host, _roll_port, _roll_eggs)
 
 
 def _get_meta(_table):
     return ('store_type', _table._type), ('table_name', _table._name), ('name_space', _table._namespace)
 
 
+def _table_key(_table):
+    return "{}.{}.{}".format(_table._type, _table._namespace, _table._name)
+
+
 empty = kv_pb2.Empty()
 
 
+class _Broadcast(Broadcast):
+    '''
+    Stored once per job in a table of its own, one fragment per egg holding a copy under the broadcast id.
+    Processors read the copy in the storage of their egg, the driver reads through the roll.
+    '''
+
+    def _store(self, value):
+        _table = _EggRoll.get_instance()._store_broadcast(self._id, value)
+        self._locator = (storage_basic_pb2.StorageType.Value(_table._type), _table._namespace, _table._name)
+
+    def _load(self):
+        reader = local_reader()
+        if reader is not None:
+            return reader(self._locator, self._id)
+        return self._table().get(self._id)
+
+    def _table(self):
+        _type, namespace, name = self._locator
+        return _DTable(storage_basic_pb2.StorageLocator(type=_type, namespace=namespace, name=name))
+
+    def unpersist(self):
+        super(_Broadcast, self).unpersist()
+        self._table().destroy()
+
+
 class _DTable(object):
 
     def __init__(self, storage_locator, partitions=1):
@@ -78,9 +123,32 @@ class _DTable(object):
     def get(self, k):
         return self.__client.get(self, k)
 
-    def collect(self):
+    def load_file(self, path, parse=None, head=True, chunk_bytes=LOAD_CHUNK_BYTES, progress_path=None):
+        # the processors cannot read the file of the driver, chunks are parsed locally and put
+        if progress_path is None:
+            progress_path = default_progress_path(self._namespace, self._name)
+        return load_utils.load_file(self, path, progress_path, parse, head, chunk_bytes)
+
+    def get_all(self, keys):
+        return self.__client.get_all(self, keys)
+
+    def collect(self, ordered=True):
+        # the roll streams the whole table in key order, there is no cheaper unordered scan
         return _EggRollIterator(self)
 
+    def to_numpy(self, value_fn=None, ordered=True):
+        '''
+        Values, mapped by value_fn if given, as one array. The processors build the array of every partition
+        and the driver only concatenates them, the whole array still ends up in driver memory.
+        '''
+        partials = self.__client.map_partitions(self, partial(array_partition, value_fn=value_fn, ordered=ordered))
+        parts = [part for _, part in partials.collect()]
+        partials.destroy()
+        return concat_arrays(parts, ordered)
+
+    def values_as_array(self, ordered=True):
+        return self.to_numpy(ordered=ordered)
+
     def delete(self, k):
         return self.__client.delete(self, k)
 
@@ -90,6 +158,26 @@ class _DTable(object):
     def count(self):
         return self.__client.count(self)
 
+    def stats(self):
+        return self.__client.stats(self)
+
+    def persist(self, level=None):
+        # tables live in the eggs, there is no driver controlled worker memory to keep them in
+        return self
+
+    def cache(self):
+        return self
+
+    def unpersist(self):
+        return self
+
+    def checkpoint(self, name=None, namespace=None):
+        if name is None:
+            return self
+        if namespace is None:
+            namespace = self.__client.job_id
+        return self.save_as(name, namespace)
+
     def put_if_absent(self, k, v):
         return self.__client.put_if_absent(self, k, v)
 
@@ -105,28 +193,99 @@ class _DTable(object):
     def mapValues(self, func):
         return self.__client.map_values(self, func)
 
+    def map_values_async(self, func):
+        return self.__client.map_values_async(self, func)
+
     def mapPartitions(self, func):
         return self.__client.map_partitions(self, func)
 
     def reduce(self, func):
         return self.__client.reduce(self, func)
 
+    def reduce_async(self, func):
+        return self.__client.reduce_async(self, func)
+
+    def aggregate(self, zero, seq_op, comb_op, depth=2):
+        return self.__client.aggregate(self, zero, seq_op, comb_op, depth)
+
+    def tree_reduce(self, func, depth=2):
+        return self.__client.tree_reduce(self, func, depth)
+
+    def repartition(self, partitions):
+        # the roll has no shuffle between partition counts, the rows are copied through this client
+        if partitions == self._partitions:
+            return self
+        return self.save_as(str(uuid.uuid1()), self.__client.job_id, partition=partitions)
+
     def join(self, other, func):
+        side = self._broadcast_side(other)
+        if side is not None:
+            return self._broadcast_join(other, func, side)
         if other._partitions != self._partitions:
             if other.count() > self.count():
-                return self.save_as(str(uuid.uuid1()), self.__client.job_id, partition=other._partitions).join(other,
-                                                                                                               func)
-            else:
-                return self.join(other.save_as(str(uuid.uuid1()), self.__client.job_id, partition=self._partitions),
-                                 func)
+                return self.repartition(other._partitions).join(other, func)
+            return self.join(other.repartition(self._partitions), func)
         return self.__client.join(self, other, func)
 
+    def _broadcast_side(self, other):
+        # tables of different partitions are counted to align them anyway, others only show the stats known
+        refresh = other._partitions != self._partitions
+        return broadcast_side(self.__client.stats(self, refresh), self.__client.stats(other, refresh))
+
+    def _broadcast_join(self, other, func, side):
+        '''
+        Broadcasts the rows of the small side as a dict, the processors join every partition of the large
+        side with it in place and drop the keys it lacks, nothing is repartitioned. The broadcast table is
+        destroyed once the join is written.
+        '''
+        small, large = (other, self) if side == 'right' else (self, other)
+        broadcast = _Broadcast(dict(small.collect()))
+        try:
+            return large.map_partitions_to_pairs(
+                partial(broadcast_join_partition, broadcast=broadcast, func=func, broadcast_on_left=side == 'left'),
+                True)
+        finally:
+            broadcast.unpersist()
+
+    def join_async(self, other, func):
+        side = self._broadcast_side(other)
+        if side is not None:
+            return DTableFuture.completed(self._broadcast_join(other, func, side))
+        if other._partitions != self._partitions:
+            if other.count() > self.count():
+                return self.repartition(other._partitions).join_async(other, func)
+            return self.join_async(other.repartition(self._partitions), func)
+        return self.__client.join_async(self, other, func)
+
     def glom(self):
         return self.__client.glom(self)
 
     def sample(self, fraction, seed=None):
         return self.__client.sample(self, fraction, seed)
 
+    def map_partitions_to_pairs(self, func, preserves_partitioning=False):
+        return self.__client.map_partitions_to_pairs(self, func, preserves_partitioning)
+
+    def filter(self, func):
+        # the processors copy the stored bytes of the rows kept
+        return self.__client.map_partitions(self, KeepRows(func))
+
+    def semi_join(self, other):
+        return self._probe_keys(other, False)
+
+    def subtract_by_key(self, other):
+        return self._probe_keys(other, True)
+
+    def _probe_keys(self, other, subtract):
+        # a join of the aligned partitions in the processors that only looks the keys of other up
+        return self.__client.join(self, other.repartition(self._partitions), ProbeKeys(subtract))
+
+    def flat_map(self, func):
+        return self.__client.flat_map(self, func)
+
+    def take_sample(self, n, seed=None):
+        return self.__client.take_sample(self, n, seed)
+
 
 class _EggRoll(object):
     value_serdes = eggroll_serdes.get_serdes()
@@ -138,32 +297,48 @@ class _EggRoll(object):
             raise EnvironmentError("eggroll should be initialized before use")
         return _EggRoll.instance
 
-    def __init__(self, job_id, host, port):
+    def __init__(self, job_id, host, port, eggs=1):
         if _EggRoll.instance is not None:
             raise EnvironmentError("eggroll should be initialized only once")
         self.channel = grpc.insecure_channel(target="{}:{}".format(host, port),
                                              options=[('grpc.max_send_message_length', -1),
                                                       ('grpc.max_receive_message_length', -1)])
         self.job_id = job_id
+        self.parallelism = eggs
         self.kv_stub = kv_pb2_grpc.KVServiceStub(self.channel)
         self.proc_stub = processor_pb2_grpc.ProcessServiceStub(self.channel)
+        self.__stats_catalog = None
         _EggRoll.instance = self
 
-    def table(self, name, namespace, partition=1, create_if_missing=True, error_if_exist=False, persistent=True):
+    def table(self, name, namespace, partition=None, create_if_missing=True, error_if_exist=False, persistent=True):
         _type = storage_basic_pb2.LMDB if persistent else storage_basic_pb2.IN_MEMORY
+        # the roll keeps the fragment count of a table that already exists
+        partition, _ = resolve_partitions(partition, self.parallelism, name="{}.{}".format(namespace, name))
         storage_locator = storage_basic_pb2.StorageLocator(type=_type, namespace=namespace, name=name)
         create_table_info = kv_pb2.CreateTableInfo(storageLocator=storage_locator, fragmentCount=partition)
         _table = self._create_table(create_table_info)
         LOGGER.debug("created table: %s", _table)
         return _table
 
-    def parallelize(self, data: Iterable, include_key=False, name=None, partition=1, namespace=None,
+    def broadcast(self, value):
+        return _Broadcast(value)
+
+    def _store_broadcast(self, broadcast_id, value):
+        # one processor task per fragment writes the copy of its egg, only these tasks carry the value
+        carrier = self.table(str(uuid.uuid1()), self.job_id, partition=self.parallelism, persistent=False)
+        rtn = self.map_partitions_to_pairs(carrier, partial(broadcast_copy, broadcast_id=broadcast_id, value=value),
+                                           True)
+        carrier.destroy()
+        return rtn
+
+    def parallelize(self, data: Iterable, include_key=False, name=None, partition=None, namespace=None,
                     create_if_missing=True,
                     error_if_exist=False, persistent=False):
         if namespace is None:
             namespace = _EggRoll.get_instance().job_id
         if name is None:
             name = str(uuid.uuid1())
+        partition, data = resolve_partitions(partition, self.parallelism, data, name="{}.{}".format(namespace, name))
         storage_locator = storage_basic_pb2.StorageLocator(type=storage_basic_pb2.LMDB, namespace=namespace,
                                                            name=name) if persistent else storage_basic_pb2.StorageLocator(
             type=storage_basic_pb2.IN_MEMORY, namespace=namespace, name=name)
@@ -208,34 +383,74 @@ class _EggRoll(object):
         k = self.value_serdes.serialize(k)
         v = self.value_serdes.serialize(v)
         self.kv_stub.put(kv_pb2.Operand(key=k, value=v), metadata=_get_meta(_table))
+        self._stats().invalidate(_table_key(_table), [0])
 
     def put_if_absent(self, _table, k, v):
         k = self.value_serdes.serialize(k)
         v = self.value_serdes.serialize(v)
         operand = self.kv_stub.putIfAbsent(kv_pb2.Operand(key=k, value=v), metadata=_get_meta(_table))
-        return self._deserialize_operand(operand)
+        rtn = self._deserialize_operand(operand)
+        if rtn is None:
+            self._stats().invalidate(_table_key(_table), [0])
+        return rtn
 
     def put_all(self, _table, kvs: Iterable):
-        self.kv_stub.putAll(self.__generate_operand(kvs), metadata=_get_meta(_table))
+        try:
+            self.kv_stub.putAll(self.__generate_operand(kvs), metadata=_get_meta(_table))
+        finally:
+            self._stats().invalidate(_table_key(_table), [0])
 
     def delete(self, _table, k):
         k = self.value_serdes.serialize(k)
         operand = self.kv_stub.delete(kv_pb2.Operand(key=k), metadata=_get_meta(_table))
-        return self._deserialize_operand(operand)
+        rtn = self._deserialize_operand(operand)
+        if rtn is not None:
+            self._stats().invalidate(_table_key(_table), [0])
+        return rtn
 
     def get(self, _table, k):
         k = self.value_serdes.serialize(k)
         operand = self.kv_stub.get(kv_pb2.Operand(key=k), metadata=_get_meta(_table))
         return self._deserialize_operand(operand)
 
+    def get_all(self, _table, keys):
+        futures = [self.kv_stub.get.future(kv_pb2.Operand(key=self.value_serdes.serialize(k)),
+                                           metadata=_get_meta(_table)) for k in keys]
+        return [self._deserialize_operand(f.result()) for f in futures]
+
     def iterate(self, _table, _range):
         return self.kv_stub.iterate(_range, metadata=_get_meta(_table))
 
     def destroy(self, _table):
         self.kv_stub.destroy(empty, metadata=_get_meta(_table))
+        self._stats().drop(_table_key(_table))
 
     def count(self, _table):
-        return self.kv_stub.count(empty, metadata=_get_meta(_table)).value
+        # processors and other clients write tables without this client knowing, counts always come from the roll
+        return self._count(_table).rows
+
+    def stats(self, _table, refresh=True):
+        '''
+        TableStats for planning, from the stats catalog. The roll routes keys to fragments itself, so the
+        stats cover the whole table as one partition. They miss writes of processors and other clients, the
+        writes of this client mark them stale. With refresh, the roll counts a stale table, without it the
+        entry is returned as it is, None if there is none.
+        '''
+        stats = self._stats().get(_table_key(_table))
+        if not refresh:
+            return stats
+        return self._count(_table) if stats is None or stats.rows is None else stats
+
+    def _count(self, _table):
+        stats = TableStats(1, [self.kv_stub.count(empty, metadata=_get_meta(_table)).value])
+        self._stats().put(_table_key(_table), stats)
+        return stats
+
+    def _stats(self):
+        # the eggs keep no table stats, this client maintains them for the tables it writes
+        if self.__stats_catalog is None:
+            self.__stats_catalog = StatsCatalog(self.table('__STATS__', '__META__', partition=10))
+        return self.__stats_catalog
 
     '''
     Computing apis
@@ -253,24 +468,37 @@ class _EggRoll(object):
         return self._create_table_from_locator(resp, _table._partitions)
 
     def map_values(self, _table: _DTable, func):
+        return self.map_values_async(_table, func).result()
+
+    def map_values_async(self, _table: _DTable, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
         operand = storage_basic_pb2.StorageLocator(namespace=_table._namespace, type=_table._type, name=_table._name)
         unary_p = processor_pb2.UnaryProcess(operand=operand,
                                              info=processor_pb2.TaskInfo(task_id=self.job_id,
                                                                          function_id=func_id,
                                                                          function_bytes=func_bytes))
-        resp = self.proc_stub.mapValues(unary_p)
-        return self._create_table_from_locator(resp, _table._partitions)
+        return DTableFuture([self.proc_stub.mapValues.future(unary_p)],
+                            lambda results: self._inherit_stats(
+                                self._create_table_from_locator(results[0], _table._partitions), _table))
+
+    def _inherit_stats(self, res, source):
+        stats = self._stats().get(_table_key(source))
+        if stats is not None:
+            self._stats().put(_table_key(res), stats.derived())
+        return res
 
     def map_partitions(self, _table: _DTable, func):
+        return self._map_partitions_async(_table, func).result()
+
+    def _map_partitions_async(self, _table: _DTable, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
         operand = storage_basic_pb2.StorageLocator(namespace=_table._namespace, type=_table._type, name=_table._name)
         unary_p = processor_pb2.UnaryProcess(operand=operand,
                                              info=processor_pb2.TaskInfo(task_id=self.job_id,
                                                                          function_id=func_id,
                                                                          function_bytes=func_bytes))
-        resp = self.proc_stub.mapPartitions(unary_p)
-        return self._create_table_from_locator(resp, _table._partitions)
+        return DTableFuture([self.proc_stub.mapPartitions.future(unary_p)],
+                            lambda results: self._create_table_from_locator(results[0], _table._partitions))
 
     def reduce(self, _table: _DTable, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
@@ -291,15 +519,59 @@ class _EggRoll(object):
                 val = func(val, _nv)
         return val
 
+    def reduce_async(self, _table: _DTable, func):
+        # reduce streams its partials back, the partials are kept in a table until the future is waited for
+        return self._map_partitions_async(_table, partial(reduce_partition, func=func)).then(
+            partial(self._reduce_partials, func=func))
+
+    @staticmethod
+    def _reduce_partials(partials: _DTable, func):
+        rtn = combine_partials([v for _, v in partials.collect()], func)
+        partials.destroy()
+        return rtn
+
+    def aggregate(self, _table: _DTable, zero, seq_op, comb_op, depth=2):
+        partials = self.map_partitions(_table, partial(aggregate_partition, zero_bytes=dump_zero(zero), seq_op=seq_op))
+        rtn = self._combine_partials(partials, comb_op, depth)
+        return zero if rtn is None else rtn
+
+    def tree_reduce(self, _table: _DTable, func, depth=2):
+        partials = self.map_partitions(_table, partial(reduce_partition, func=func))
+        return self._combine_partials(partials, func, depth)
+
+    def _combine_partials(self, partials: _DTable, comb_op, depth):
+        '''
+        Every partition of partials holds at most one value. Groups of partitions are combined
+        by the processors level by level, a level writes its results to a table with fewer partitions.
+
+        Processors only read the fragments of their own egg, so the partials of a group are brought
+        together by copying every level through this client with save_as. The client streams the values
+        without holding a level, the combining runs in the processors, but each level still costs a round
+        trip of its partials through the driver.
+        '''
+        scale = tree_scale(partials._partitions, depth)
+        while partials._partitions > 1:
+            level = partials.save_as(str(uuid.uuid1()), self.job_id,
+                                     partition=int(math.ceil(partials._partitions / scale)))
+            partials.destroy()
+            partials = self.map_partitions(level, partial(reduce_partition, func=comb_op))
+            level.destroy()
+        rtn = self.reduce(partials, comb_op)
+        partials.destroy()
+        return rtn
+
     def join(self, _left: _DTable, _right: _DTable, func):
+        return self.join_async(_left, _right, func).result()
+
+    def join_async(self, _left: _DTable, _right: _DTable, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
         l_op = storage_basic_pb2.StorageLocator(namespace=_left._namespace, type=_left._type, name=_left._name)
         r_op = storage_basic_pb2.StorageLocator(namespace=_right._namespace, type=_right._type, name=_right._name)
         binary_p = processor_pb2.BinaryProcess(left=l_op, right=r_op, info=processor_pb2.TaskInfo(task_id=self.job_id,
                                                                                                   function_id=func_id,
                                                                                                   function_bytes=func_bytes))
-        resp = self.proc_stub.join(binary_p)
-        return self._create_table_from_locator(resp, _left._partitions)
+        return DTableFuture([self.proc_stub.join.future(binary_p)],
+                            lambda results: self._create_table_from_locator(results[0], _left._partitions))
 
     def glom(self, _table: _DTable):
         func_id = str(uuid.uuid1())
@@ -323,6 +595,25 @@ class _EggRoll(object):
         resp = self.proc_stub.sample(unary_p)
         return self._create_table_from_locator(resp, _table._partitions)
 
+    def map_partitions_to_pairs(self, _table, func, preserves_partitioning):
+        # the processors write the pairs to the fragment of their source partition, pairs whose keys may
+        # belong to another fragment are rehashed through this client, as map does
+        res = self.map_partitions(_table, PartitionPairs(func))
+        if preserves_partitioning:
+            return res
+        rtn = res.save_as(str(uuid.uuid1()), self.job_id, partition=res._partitions)
+        res.destroy()
+        return rtn
+
+    def flat_map(self, _table, func):
+        return self.map_partitions_to_pairs(_table, partial(flat_map_partition, func=func), False)
+
+    def take_sample(self, _table: _DTable, n, seed):
+        partials = self.map_partitions(_table, partial(sample_partition, n=n, seed=seed))
+        parts = [part for _, part in partials.collect()]
+        partials.destroy()
+        return merge_samples(parts, n, np.random.RandomState(seed))
+
 
 class _EggRollIterator(object):
 
@@ -14,26 +14,50 @@
 #  limitations under the License.
 #
 
-import hashlib
+import math
+import queue
+import threading
 import time
 import uuid
 from collections import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from heapq import heapify, heappop, heapreplace
-from itertools import tee
 from operator import is_not
 
 import grpc
-from cachetools import cached, TTLCache
+import numpy as np
 
 from arch.api.proto import kv_pb2_grpc, kv_pb2, processor_pb2_grpc, processor_pb2, storage_basic_pb2
 from arch.api.proto.storage_basic_pb2 import StorageLocator
 from arch.api.utils import cloudpickle as pickle, eggroll_serdes
 from arch.api.utils import file_utils
 from arch.api.utils.metric_utils import record_metrics
+from arch.api.utils.hash_utils import hash_key_mod, hash_keys_mod, chunks
+from arch.api.utils.broadcast_utils import Broadcast, broadcast_copy, local_reader
+from arch.api.utils.codec_utils import Codec, CodecStats, default_codec
+from arch.api.utils.future_utils import DTableFuture, combine_partials
+from arch.api.utils import load_utils
+from arch.api.utils.array_utils import array_partition, concat_arrays
+from arch.api.utils.load_utils import default_progress_path, LOAD_CHUNK_BYTES
+from arch.api.utils.fold_utils import aggregate_partition, dump_zero, reduce_partition, tree_scale
+from arch.api.utils.partition_utils import resolve_partitions
+from arch.api.utils.join_utils import broadcast_side
+from arch.api.utils.pair_utils import broadcast_join_partition, flat_map_partition, KeepRows, PartitionPairs, \
+    ProbeKeys
+from arch.api.utils.sample_utils import merge_samples, sample_partition
+from arch.api.utils.stats_utils import StatsCatalog, TableStats
 
 current_milli_time = lambda: int(round(time.time() * 1000))
 
+# rows serialized, hashed and streamed to the eggs per putAll round
+PUT_CHUNK_SIZE = 100000
+# rows each partition streams ahead of an unordered iterate
+DRAIN_QUEUE_SIZE = 10000
+DRAIN_POLL_SECONDS = 0.1
+
+_DRAINED = object()
+
 
 def init(job_id=None, mode=None):
     EggRoll(job_id)
@@ -59,16 +83,38 @@ class EggRoll(object):
         EggRoll.init()
         self.job_id = str(uuid.uuid1()) if job_id is None else job_id
         self._meta_table = _DTable(self, storage_basic_pb2.LMDB, "__META__", "__META__", 10)
+        # the eggs keep no table stats, this client maintains them for the tables it writes
+        self._stats_catalog = StatsCatalog(_DTable(self, storage_basic_pb2.LMDB, "__META__", "__STATS__", 10))
         EggRoll.__instance = self
 
-    def table(self, name, namespace, partition=1, create_if_missing=True, error_if_exist=False, persistent=True):
+    @property
+    def parallelism(self):
+        return len(self.proc_list)
+
+    def table(self, name, namespace, partition=None, create_if_missing=True, error_if_exist=False, persistent=True):
         _type = storage_basic_pb2.LMDB if persistent else storage_basic_pb2.IN_MEMORY
         _table_key = "{}.{}.{}".format(_type, namespace, name)
+        if partition is None:
+            partition = self._meta_table.get(_table_key)
+        if partition is None:
+            partition, _ = resolve_partitions(None, self.parallelism, name=_table_key)
         _old_partition = self._meta_table.put_if_absent(_table_key, partition)
         return _DTable(EggRoll.get_instance(), _type, namespace, name,
                        partition if _old_partition is None else _old_partition)
 
-    def parallelize(self, data: Iterable, include_key=False, name=None, partition=1, namespace=None,
+    def broadcast(self, value):
+        return _Broadcast(value)
+
+    def _store_broadcast(self, broadcast_id, value):
+        # one processor task per partition writes a copy, a partition per processor leaves one on every egg,
+        # only these tasks carry the value
+        carrier = self.table(str(uuid.uuid1()), self.job_id, partition=len(self.proc_list), persistent=False)
+        rtn = self.map_partitions_to_pairs(carrier, partial(broadcast_copy, broadcast_id=broadcast_id, value=value),
+                                           True)
+        carrier.destroy()
+        return rtn
+
+    def parallelize(self, data: Iterable, include_key=False, name=None, partition=None, namespace=None,
                     create_if_missing=True,
                     error_if_exist=False, persistent=False):
         eggroll = EggRoll.get_instance()
@@ -78,6 +124,7 @@ class EggRoll(object):
             raise ValueError("namespace cannot be None for persistent table")
         elif namespace is None:
             namespace = eggroll.job_id
+        partition, data = resolve_partitions(partition, self.parallelism, data, name="{}.{}".format(namespace, name))
         _table = self.table(name, namespace, partition, persistent)
         _iter = data if include_key else enumerate(data)
         eggroll.put(_table, _iter)
@@ -155,6 +202,9 @@ class EggRoll(object):
 
     @record_metrics
     def mapPartitions(self, _table, func):
+        return self._map_partitions_async(_table, func).result()
+
+    def _map_partitions_async(self, _table, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
         results = []
 
@@ -168,12 +218,17 @@ class EggRoll(object):
             proc_id = partition % len(self.proc_list)
             channel, stub = self.proc_list[proc_id]
             results.append(stub.mapPartitions.future(unary_p))
-        for r in results:
-            result = r.result()
-        return _DTable(self, result.type, result.namespace, result.name, _table.partition)
+        return DTableFuture(results, partial(self._table_of_results, partitions=_table.partition))
+
+    def _table_of_results(self, results, partitions):
+        result = results[-1]
+        return _DTable(self, result.type, result.namespace, result.name, partitions)
 
     @record_metrics
     def mapValues(self, _table, func):
+        return self.map_values_async(_table, func).result()
+
+    def map_values_async(self, _table, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
         results = []
         for partition in range(_table.partition):
@@ -185,10 +240,14 @@ class EggRoll(object):
             proc_id = partition % len(self.proc_list)
             channel, stub = self.proc_list[proc_id]
             results.append(stub.mapValues.future(unary_p))
+        return DTableFuture(results, partial(self._table_of_results, partitions=_table.partition)).then(
+            partial(self._inherit_stats, source=_table))
 
-        for r in results:
-            result = r.result()
-        return _DTable(self, result.type, result.namespace, result.name, _table.partition)
+    def _inherit_stats(self, res, source):
+        stats = self._stats_catalog.get(self.__table_key(source))
+        if stats is not None:
+            self._stats_catalog.put(self.__table_key(res), stats.derived())
+        return res
 
     @record_metrics
     def glom(self, _table):
@@ -242,19 +301,83 @@ class EggRoll(object):
             if len(val.value) > 0:
                 rs.append(self._serdes.deserialize(val.value))
         rs = [r for r in filter(partial(is_not, None), rs)]
-        if len(results) <= 0:
+        if len(rs) <= 0:
             return rtn
         rtn = rs[0]
         for r in rs[1:]:
             rtn = func(rtn, r)
         return rtn
 
+    def reduce_async(self, _table, func):
+        # reduce streams its partials back, the partials are kept in a table until the future is waited for
+        return self._map_partitions_async(_table, partial(reduce_partition, func=func)).then(
+            partial(self._reduce_partials, func=func))
+
+    @staticmethod
+    def _reduce_partials(partials, func):
+        rtn = combine_partials([v for _, v in partials.collect(ordered=False)], func)
+        partials.destroy()
+        return rtn
+
+    @record_metrics
+    def aggregate(self, _table, zero, seq_op, comb_op, depth=2):
+        partials = self.mapPartitions(_table, partial(aggregate_partition, zero_bytes=dump_zero(zero), seq_op=seq_op))
+        rtn = self._combine_partials(partials, comb_op, depth)
+        return zero if rtn is None else rtn
+
+    @record_metrics
+    def tree_reduce(self, _table, func, depth=2):
+        partials = self.mapPartitions(_table, partial(reduce_partition, func=func))
+        return self._combine_partials(partials, func, depth)
+
+    def map_partitions_to_pairs(self, _table, func, preserves_partitioning):
+        # the processors write the pairs to their source partition, pairs whose keys may belong to another
+        # partition are rehashed through this client, as map does
+        res = self.mapPartitions(_table, PartitionPairs(func))
+        if preserves_partitioning:
+            return res
+        rtn = res.save_as(str(uuid.uuid1()), self.job_id, partition=res.partition)
+        res.destroy()
+        return rtn
+
+    def flat_map(self, _table, func):
+        return self.map_partitions_to_pairs(_table, partial(flat_map_partition, func=func), False)
+
+    def take_sample(self, _table, n, seed):
+        partials = self.mapPartitions(_table, partial(sample_partition, n=n, seed=seed))
+        parts = [part for _, part in partials.collect()]
+        partials.destroy()
+        return merge_samples(parts, n, np.random.RandomState(seed))
+
+    def _combine_partials(self, partials, comb_op, depth):
+        '''
+        Every partition of partials holds at most one value. Groups of partitions are combined
+        by the processors level by level, a level writes its results to a table with fewer partitions.
+
+        Processors only read the fragments of their own egg, so the partials of a group are brought
+        together by copying every level through this client with save_as. The client streams the values
+        without holding a level, the combining runs in the processors, but each level still costs a round
+        trip of its partials through the driver.
+        '''
+        scale = tree_scale(partials.partition, depth)
+        while partials.partition > 1:
+            level = partials.save_as(str(uuid.uuid1()), self.job_id,
+                                     partition=int(math.ceil(partials.partition / scale)))
+            partials.destroy()
+            partials = self.mapPartitions(level, partial(reduce_partition, func=comb_op))
+            level.destroy()
+        rtn = self.reduce(partials, comb_op)
+        partials.destroy()
+        return rtn
+
     @record_metrics
     def join(self, left, right, func):
+        return self.join_async(left, right, func).result()
+
+    def join_async(self, left, right, func):
         func_id, func_bytes = self.serialize_and_hash_func(func)
 
         results = []
-        res = None
         for partition in range(left.partition):
             l_op = EggRoll.__get_storage_locator(left, partition)
             r_op = EggRoll.__get_storage_locator(right, partition)
@@ -265,9 +388,7 @@ class EggRoll(object):
             proc_id = partition % len(self.proc_list)
             channel, stub = self.proc_list[proc_id]
             results.append(stub.join.future(binary_p))
-        for r in results:
-            res = r.result()
-        return _DTable(self, res.type, res.namespace, res.name, left.partition)
+        return DTableFuture(results, partial(self._table_of_results, partitions=left.partition))
 
     @staticmethod
     def __get_storage_locator(_table, fragment=None):
@@ -275,37 +396,39 @@ class EggRoll(object):
             fragment = _table.partition
         return StorageLocator(name=_table.name, namespace=_table.namespace, type=_table.type, fragment=fragment)
 
-    def split_gen(self, _iter: Iterable, num):
-        gens = tee(_iter, num)
-        return (self.dispatch_gen(gen, i, num) for i, gen in enumerate(gens))
-
-    def dispatch_gen(self, _iter: Iterable, p, total):
-        for k, v in _iter:
-            _p, i = self.__get_index(k, total)
-            if _p == p:
-                yield kv_pb2.Operand(key=self._serdes.serialize(k), value=self._serdes.serialize(v))
+    def split_chunk(self, chunk, partitions, serialize_value=None):
+        k_bytes_list = [self._serdes.serialize(k) for k, _ in chunk]
+        if serialize_value is None:
+            serialize_value = self._serdes.serialize
+        buckets = {}
+        for p, k_bytes, (_, v) in zip(hash_keys_mod(k_bytes_list, partitions).tolist(), k_bytes_list, chunk):
+            buckets.setdefault(p, []).append(kv_pb2.Operand(key=k_bytes, value=serialize_value(v)))
+        return buckets
 
     def put(self, _table, kv_list):
-
-        gens = self.split_gen(kv_list, _table.partition)
-        results = []
-
-        for p, gen in enumerate(gens):
-            i = p % len(self.proc_list)
-            stub = self.egg_list[i]
-            meta = self.__get_meta(_table, str(p))
-            stub.putAll(gen, metadata=meta)
-        for r in results:
-            r.result()
+        serialize_value = _table.value_serializer()
+        written = set()
+        try:
+            for chunk in chunks(kv_list, PUT_CHUNK_SIZE):
+                for p, operands in self.split_chunk(chunk, _table.partition, serialize_value).items():
+                    i = self.__get_index_by_proc(p % len(self.proc_list))
+                    stub = self.egg_list[i]
+                    meta = self.__get_meta(_table, str(p))
+                    written.add(p)
+                    stub.putAll(iter(operands), metadata=meta)
+        finally:
+            self._stats_catalog.invalidate(self.__table_key(_table), written)
         return True
 
     def put_if_absent(self, _table, k, v):
         p, i = self.__get_index(k, _table.partition)
         stub = self.egg_list[i]
         meta = self.__get_meta(_table, str(p))
-        rtn = stub.putIfAbsent(kv_pb2.Operand(key=self._serdes.serialize(k), value=self._serdes.serialize(v)),
+        rtn = stub.putIfAbsent(kv_pb2.Operand(key=self._serdes.serialize(k), value=_table.value_serializer()(v)),
                                metadata=meta).value
         rtn = self._serdes.deserialize(rtn) if len(rtn) > 0 else None
+        if rtn is None:
+            self._stats_catalog.invalidate(self.__table_key(_table), [p])
         return rtn
 
     def get(self, _table, k_list):
@@ -318,21 +441,58 @@ class EggRoll(object):
             res.append(self.__get_pair(op))
         return res
 
+    def get_all(self, _table, k_list):
+        '''
+        Keys are hashed in one batch and every get is issued as a future, so requests to all eggs are in
+        flight at the same time instead of one round trip per key.
+        '''
+        k_bytes_list = [self._serdes.serialize(k) for k in k_list]
+        futures = []
+        for p, k_bytes in zip(hash_keys_mod(k_bytes_list, _table.partition).tolist(), k_bytes_list):
+            stub = self.egg_list[self.__get_index_by_proc(p % len(self.proc_list))]
+            futures.append(stub.get.future(kv_pb2.Operand(key=k_bytes), metadata=self.__get_meta(_table, str(p))))
+        return [self.__get_pair(f.result())[1] for f in futures]
+
     def delete(self, _table, k):
         p, i = self.__get_index(k, _table.partition)
         stub = self.egg_list[i]
         op = stub.delete(kv_pb2.Operand(key=self._serdes.serialize(k)),
                          metadata=self.__get_meta(_table, str(p)))
-        return self.__get_pair(op)
+        rtn = self.__get_pair(op)
+        if rtn[1] is not None:
+            self._stats_catalog.invalidate(self.__table_key(_table), [p])
+        return rtn
 
-    def iterate(self, _table):
+    def iterate(self, _table, ordered=True):
         iters = []
         for p in range(_table.partition):
             proc_id = p % len(EggRoll.proc_list)
             i = self.__get_index_by_proc(proc_id)
             stub = self.egg_list[i]
             iters.append(_PartitionIterator(stub, self.__get_meta(_table, str(p))))
-        return self._merge(iters)
+        return self._merge(iters) if ordered else self._drain(iters)
+
+    def _drain(self, iters):
+        '''
+        Streams every partition on its own thread into a queue of at most DRAIN_QUEUE_SIZE rows, yields the
+        partitions one after another while the others fill their queues. The producers stop once the caller
+        stops iterating.
+        '''
+        queues = [queue.Queue(maxsize=DRAIN_QUEUE_SIZE) for _ in iters]
+        closed = threading.Event()
+        with ThreadPoolExecutor(max_workers=len(iters) or 1) as pool:
+            for it, q in zip(iters, queues):
+                pool.submit(_stream_partition, it, q, closed)
+            try:
+                for q in queues:
+                    op = q.get()
+                    while op is not _DRAINED:
+                        if isinstance(op, Exception):
+                            raise op
+                        yield self._serdes.deserialize(op.key), self._serdes.deserialize(op.value)
+                        op = q.get()
+            finally:
+                closed.set()
 
     def destroy(self, _table):
         for p in range(_table.partition):
@@ -340,29 +500,48 @@ class EggRoll(object):
             i = self.__get_index_by_proc(proc_id)
             stub = self.egg_list[i]
             stub.destroy(kv_pb2.Empty(), metadata=self.__get_meta(_table, str(p)))
+        self._stats_catalog.drop(self.__table_key(_table))
 
     def count(self, _table):
-        count = 0
-        for p in range(_table.partition):
-            proc_id = p % len(EggRoll.proc_list)
-            i = self.__get_index_by_proc(proc_id)
-            stub = self.egg_list[i]
-            count += stub.count(kv_pb2.Empty(), metadata=self.__get_meta(_table, str(p))).value
-        return count
+        # processors and other clients write tables without this client knowing, counts always come from the eggs
+        return self._count_partitions(_table, range(_table.partition)).rows
+
+    def stats(self, _table, refresh=True):
+        '''
+        TableStats for planning, from the stats catalog. They miss writes of processors and other clients,
+        the writes of this client mark their partitions stale. With refresh, stale partitions are counted by
+        their eggs, without it the entry is returned as it is, None if there is none.
+        '''
+        stats = self._stats_catalog.get(self.__table_key(_table))
+        if not refresh:
+            return stats
+        stale = range(_table.partition) if stats is None else stats.stale_partitions()
+        return self._count_partitions(_table, stale) if stale else stats
+
+    def _count_partitions(self, _table, partitions):
+        # the eggs only count rows, bytes and key ranges of the counted partitions are unknown
+        _table_key = self.__table_key(_table)
+        stats = self._stats_catalog.get(_table_key) or TableStats(_table.partition)
+        futures = []
+        for p in partitions:
+            stub = self.egg_list[self.__get_index_by_proc(p % len(EggRoll.proc_list))]
+            futures.append(stub.count.future(kv_pb2.Empty(), metadata=self.__get_meta(_table, str(p))))
+        for p, f in zip(partitions, futures):
+            stats.update(p, f.result().value)
+        self._stats_catalog.put(_table_key, stats)
+        return stats
+
+    @staticmethod
+    def __table_key(_table):
+        return "{}.{}.{}".format(_table.type, _table.namespace, _table.name)
 
     @staticmethod
     def __get_meta(_table, fragment):
         return ('store_type', _table.type), ('table_name', _table.name), ('name_space', _table.namespace), (
             'fragment', fragment)
 
-    @cached(cache=TTLCache(maxsize=100, ttl=360))
-    def __calc_hash(self, k):
-        k_bytes = hashlib.sha1(self._serdes.serialize(k)).digest()
-        return int.from_bytes(k_bytes, byteorder='little')
-
     def __key_to_partition(self, k, partitions):
-        i = self.__calc_hash(k)
-        return i % partitions
+        return hash_key_mod(self._serdes.serialize(k), partitions)
 
     @staticmethod
     def __get_index_by_proc(proc_id):
@@ -382,6 +561,31 @@ class EggRoll(object):
             op.value) > 0 else (self._serdes.deserialize(op.key), None)
 
 
+class _Broadcast(Broadcast):
+    '''
+    Stored once per job in a table of its own, every egg keeps a copy under the broadcast id. Processors
+    read the copy in the storage of their egg, the driver reads through the eggs.
+    '''
+
+    def _store(self, value):
+        _table = EggRoll.get_instance()._store_broadcast(self._id, value)
+        self._locator = (storage_basic_pb2.StorageType.Value(_table.type), _table.namespace, _table.name)
+        self._partitions = _table.partition
+
+    def _load(self):
+        reader = local_reader()
+        if reader is not None:
+            return reader(self._locator, self._id)
+        return self._table().get(self._id)
+
+    def _table(self):
+        return _DTable(EggRoll.get_instance(), *self._locator, self._partitions)
+
+    def unpersist(self):
+        super(_Broadcast, self).unpersist()
+        self._table().destroy()
+
+
 class _DTable(object):
 
     def __init__(self, eggroll: EggRoll, _type: int, namespace, name, partition=1):
@@ -390,24 +594,69 @@ class _DTable(object):
         self.name = name
         self.eggroll = eggroll
         self.partition = partition
+        # codec of the values this client writes, the processors compress their outputs like their inputs
+        self._codec = None
+        self._codec_stats = CodecStats()
 
     def __str__(self):
         return "type:{} namespace:{} table:{}".format(self.type, self.namespace, self.name)
 
+    def set_codec(self, codec=None, level=None, dictionary=False):
+        '''
+        Compresses the values written to this table from now on. Trained dictionaries need the standalone
+        eggroll, processors have no table to load them from.
+        '''
+        if dictionary:
+            raise ValueError("codec dictionaries are only supported by the standalone eggroll")
+        codec = default_codec() if codec is None else codec
+        self._codec = None if codec == 'none' else Codec(codec, level)
+        return self
+
+    def codec_stats(self):
+        '''
+        CodecStats of the values written to this table through this client.
+        '''
+        return self._codec_stats
+
+    def value_serializer(self):
+        serialize = self.eggroll._serdes.serialize
+        codec, stats = self._codec, self._codec_stats
+        if codec is None:
+            return serialize
+
+        def _encode(v):
+            raw = serialize(v)
+            start = time.process_time()
+            stored = codec.encode(raw)
+            stats.encode_seconds += time.process_time() - start
+            stats.values += 1
+            stats.raw_bytes += len(raw)
+            stats.stored_bytes += len(stored)
+            return stored
+
+        return _encode
+
+    def _derived(self, res):
+        res._codec = self._codec
+        return res
+
     def save_as(self, name, namespace, partition=None):
         if partition is None:
             partition = self.partition
-        res = EggRoll.get_instance().table(name, namespace, partition)
+        res = self._derived(EggRoll.get_instance().table(name, namespace, partition))
         res.put_all(self.collect())
         return res
 
     def map(self, func):
-        res = self.eggroll.map(self, func)
+        res = self._derived(self.eggroll.map(self, func))
         return res.save_as(str(uuid.uuid1()), res.namespace, partition=res.partition)
 
     def mapValues(self, func):
         res = self.eggroll.mapValues(self, func)
-        return res
+        return self._derived(res)
+
+    def map_values_async(self, func):
+        return self.eggroll.map_values_async(self, func).then(self._derived)
 
     def mapPartitions(self, func):
         return self.eggroll.mapPartitions(self, func)
@@ -421,8 +670,30 @@ class _DTable(object):
     def get(self, k):
         return self.eggroll.get(self, [k])[0]
 
-    def collect(self):
-        return self.eggroll.iterate(self)
+    def load_file(self, path, parse=None, head=True, chunk_bytes=LOAD_CHUNK_BYTES, progress_path=None):
+        # the processors cannot read the file of the driver, chunks are parsed locally and put
+        if progress_path is None:
+            progress_path = default_progress_path(self.namespace, self.name)
+        return load_utils.load_file(self, path, progress_path, parse, head, chunk_bytes)
+
+    def get_all(self, keys):
+        return self.eggroll.get_all(self, keys)
+
+    def collect(self, ordered=True):
+        return self.eggroll.iterate(self, ordered)
+
+    def to_numpy(self, value_fn=None, ordered=True):
+        '''
+        Values, mapped by value_fn if given, as one array. The processors build the array of every partition
+        and the driver only concatenates them, the whole array still ends up in driver memory.
+        '''
+        partials = self.mapPartitions(partial(array_partition, value_fn=value_fn, ordered=ordered))
+        parts = [part for _, part in partials.collect()]
+        partials.destroy()
+        return concat_arrays(parts, ordered)
+
+    def values_as_array(self, ordered=True):
+        return self.to_numpy(ordered=ordered)
 
     def delete(self, k_list):
         return self.eggroll.delete(self, k_list)[1]
@@ -433,17 +704,84 @@ class _DTable(object):
     def reduce(self, func):
         return self.eggroll.reduce(self, func)
 
+    def reduce_async(self, func):
+        return self.eggroll.reduce_async(self, func)
+
+    def aggregate(self, zero, seq_op, comb_op, depth=2):
+        return self.eggroll.aggregate(self, zero, seq_op, comb_op, depth)
+
+    def tree_reduce(self, func, depth=2):
+        return self.eggroll.tree_reduce(self, func, depth)
+
+    def repartition(self, partitions):
+        # processors have no shuffle between partition counts, the rows are copied through this client
+        if partitions == self.partition:
+            return self
+        return self.save_as(str(uuid.uuid1()), self.eggroll.job_id, partition=partitions)
+
     def join(self, other, func):
+        side = self._broadcast_side(other)
+        if side is not None:
+            return self._broadcast_join(other, func, side)
         if other.partition != self.partition:
             if other.count() > self.count():
-                return self.save_as(str(uuid.uuid1()), self.eggroll.job_id, partition=other.partition).join(other, func)
-            else:
-                return self.join(other.save_as(str(uuid.uuid1()), self.eggroll.job_id, partition=self.partition), func)
-        return self.eggroll.join(self, other, func)
+                return self.repartition(other.partition).join(other, func)
+            return self.join(other.repartition(self.partition), func)
+        return self._derived(self.eggroll.join(self, other, func))
+
+    def _broadcast_side(self, other):
+        # tables of different partitions are counted to align them anyway, others only show the stats known
+        refresh = other.partition != self.partition
+        return broadcast_side(self.eggroll.stats(self, refresh), self.eggroll.stats(other, refresh))
+
+    def _broadcast_join(self, other, func, side):
+        '''
+        Broadcasts the rows of the small side as a dict, the processors join every partition of the large
+        side with it in place and drop the keys it lacks, nothing is repartitioned. The broadcast table is
+        destroyed once the join is written.
+        '''
+        small, large = (other, self) if side == 'right' else (self, other)
+        broadcast = _Broadcast(dict(small.collect(ordered=False)))
+        try:
+            return self._derived(large.map_partitions_to_pairs(
+                partial(broadcast_join_partition, broadcast=broadcast, func=func, broadcast_on_left=side == 'left'),
+                True))
+        finally:
+            broadcast.unpersist()
+
+    def join_async(self, other, func):
+        side = self._broadcast_side(other)
+        if side is not None:
+            return DTableFuture.completed(self._broadcast_join(other, func, side))
+        if other.partition != self.partition:
+            if other.count() > self.count():
+                return self.repartition(other.partition).join_async(other, func)
+            return self.join_async(other.repartition(self.partition), func)
+        return self.eggroll.join_async(self, other, func).then(self._derived)
 
     def count(self):
         return self.eggroll.count(self)
 
+    def stats(self):
+        return self.eggroll.stats(self)
+
+    def persist(self, level=None):
+        # tables live in the eggs, there is no driver controlled worker memory to keep them in
+        return self
+
+    def cache(self):
+        return self
+
+    def unpersist(self):
+        return self
+
+    def checkpoint(self, name=None, namespace=None):
+        if name is None:
+            return self
+        if namespace is None:
+            namespace = self.eggroll.job_id
+        return self.save_as(name, namespace)
+
     def glom(self):
         return self.eggroll.glom(self)
 
@@ -453,6 +791,50 @@ class _DTable(object):
     def sample(self, fraction, seed=None):
         return self.eggroll.sample(self, fraction, seed)
 
+    def map_partitions_to_pairs(self, func, preserves_partitioning=False):
+        return self.eggroll.map_partitions_to_pairs(self, func, preserves_partitioning)
+
+    def filter(self, func):
+        # the processors copy the stored bytes of the rows kept
+        return self._derived(self.eggroll.mapPartitions(self, KeepRows(func)))
+
+    def semi_join(self, other):
+        return self._probe_keys(other, False)
+
+    def subtract_by_key(self, other):
+        return self._probe_keys(other, True)
+
+    def _probe_keys(self, other, subtract):
+        # a join of the aligned partitions in the processors that only looks the keys of other up
+        return self._derived(self.eggroll.join(self, other.repartition(self.partition), ProbeKeys(subtract)))
+
+    def flat_map(self, func):
+        return self.eggroll.flat_map(self, func)
+
+    def take_sample(self, n, seed=None):
+        return self.eggroll.take_sample(self, n, seed)
+
+
+def _stream_partition(it, q, closed):
+    end = _DRAINED
+    try:
+        for op in it:
+            if not _offer(q, op, closed):
+                return
+    except Exception as e:
+        end = e
+    _offer(q, end, closed)
+
+
+def _offer(q, item, closed):
+    while not closed.is_set():
+        try:
+            q.put(item, timeout=DRAIN_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
 
 class _PartitionIterator(object):
 
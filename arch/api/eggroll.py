@@ -15,7 +15,7 @@
 #
 
 from arch.api.utils.log_utils import LoggerFactory
-from arch.api.utils import file_utils
+from arch.api.utils import file_utils, partition_utils
 from typing import Iterable
 import uuid
 import os
@@ -23,7 +23,12 @@ from arch.api import WorkMode
 from arch.api import RuntimeInstance
 
 
-def init(job_id=None, mode: WorkMode = WorkMode.STANDALONE):
+def init(job_id=None, mode: WorkMode = WorkMode.STANDALONE, lazy=False, partition=None):
+    '''
+    partition is the job default for tables created without a partition count, by default the count
+    follows the size of the data and the cores or eggs available.
+    '''
+    partition_utils.set_default_partitions(partition)
     if job_id is None:
         job_id = str(uuid.uuid1())
         LoggerFactory.setDirectory()
@@ -32,7 +37,7 @@ def init(job_id=None, mode: WorkMode = WorkMode.STANDALONE):
     RuntimeInstance.MODE = mode
     if mode == WorkMode.STANDALONE:
         from arch.api.standalone.eggroll import Standalone
-        RuntimeInstance.EGGROLL = Standalone(job_id=job_id)
+        RuntimeInstance.EGGROLL = Standalone(job_id=job_id, lazy=lazy)
     elif mode == WorkMode.CLUSTER:
         from arch.api.cluster.eggroll import _EggRoll
         from arch.api.cluster.eggroll import init as c_init
@@ -45,12 +50,30 @@ def init(job_id=None, mode: WorkMode = WorkMode.STANDALONE):
     RuntimeInstance.EGGROLL.table("__federation__", job_id, partition=10)
 
 
-def table(name, namespace, partition=1, persistent=True, create_if_missing=True, error_if_exist=False):
+def table(name, namespace, partition=None, persistent=True, create_if_missing=True, error_if_exist=False):
     return RuntimeInstance.EGGROLL.table(name=name, namespace=namespace, partition=partition, persistent=persistent)
 
 
-def parallelize(data: Iterable, include_key=False, name=None, partition=1, namespace=None, persistent=False,
+def parallelize(data: Iterable, include_key=False, name=None, partition=None, namespace=None, persistent=False,
                 create_if_missing=True, error_if_exist=False):
     return RuntimeInstance.EGGROLL.parallelize(data=data, include_key=include_key, name=name, partition=partition,
                                                namespace=namespace,
                                                persistent=persistent)
+
+
+def suggest_partitions(rows=None, size=None):
+    '''
+    Partition count the job would give a table of rows rows and size serialized bytes.
+    '''
+    default = partition_utils.get_default_partitions()
+    if default is not None:
+        return default
+    return partition_utils.suggest_partitions(RuntimeInstance.EGGROLL.parallelism, rows, size)
+
+
+def broadcast(value):
+    '''
+    Ships a read-only value to workers once, closures should capture the returned handle and read
+    `handle.value` instead of capturing the value itself.
+    '''
+    return RuntimeInstance.EGGROLL.broadcast(value)
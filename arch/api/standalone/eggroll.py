@@ -14,52 +14,185 @@
 #  limitations under the License.
 #
 
+import math
 import os
 import pickle as c_pickle
-from arch.api import StoreType
-from arch.api.utils import cloudpickle as f_pickle, cache_utils, file_utils
-from heapq import heapify, heappop, heapreplace
+import time
+from arch.api import StoreType, StorageLevel
+from arch.api.utils import cloudpickle as f_pickle, file_utils
+from heapq import heapify, heappop, heapreplace, merge
 from typing import Iterable
 import uuid
-from concurrent.futures import ProcessPoolExecutor as Executor
+from concurrent.futures import Future, ProcessPoolExecutor as Executor
 import lmdb
-from cachetools import cached
+from cachetools import LRUCache
 import numpy as np
 from functools import partial
-from operator import is_not
+from operator import itemgetter
+from contextlib import ExitStack
+import shutil
 import hashlib
+import tempfile
+import atexit
+import multiprocessing
+from collections import OrderedDict, deque
+import queue
+import threading
+import weakref
+from arch.api.utils.log_utils import getLogger
+from arch.api.utils.array_utils import concat_arrays
+from arch.api.utils.broadcast_utils import Broadcast
+from arch.api.utils.future_utils import DTableFuture, combine_partials
+from arch.api.utils.fold_utils import aggregate_partition, dump_zero, tree_scale
+from arch.api.utils.lmdb_utils import range_rows, split_keys, write_sorted
+from arch.api.utils.partition_utils import resolve_partitions
+from arch.api.utils.load_utils import default_progress_path, LoadProgress, parser_of, read_lines, run_load, \
+    split_file, LOAD_CHUNK_BYTES, LOAD_COMMIT_ROWS
+from arch.api.utils.codec_utils import Codec, CodecStats, decode, default_codec, measure, train_dictionary, \
+    DICTIONARY_SAMPLES
+from arch.api.utils.join_utils import broadcast_side, MergeJoin, use_merge_join, MERGE_JOIN_MIN_ROWS, \
+    MERGE_JOIN_MAX_RATIO, BROADCAST_JOIN_MAX_ROWS, BROADCAST_JOIN_MAX_BYTES
+from arch.api.utils.sample_utils import merge_samples, reservoir_sample
+from arch.api.utils.stats_utils import StatsCatalog, TableStats
+from arch.api.utils.hash_utils import hash_key_to_partition as _hash_key_to_partition, hash_keys_to_partitions, \
+    chunks
+
+# lmdb environments each process keeps open, their byte budget (0 for none) and the map size of new ones
+ENV_POOL_SIZE = 256
+ENV_POOL_BYTES = 0
+ENV_MAP_SIZE = 10_737_418_240
+
+# bytes a map task buffers before writing its buckets as sorted spill runs
+SHUFFLE_BUFFER_BYTES = 64 << 20
+
+# deserialized functions kept by each worker process, keyed by function id
+FUNCTION_CACHE_SIZE = 128
+_function_cache = LRUCache(maxsize=FUNCTION_CACHE_SIZE)
+
+# partitions of the tables this driver has registered, saves a meta table round trip per table call
+_table_partitions = {}
+
+# serialized bytes of the deserialized partitions each worker keeps for persisted tables
+WORKER_CACHE_BYTES = 1 << 30
+
+# (type, namespace, name) -> StorageLevel of the tables the driver persisted in worker memory
+_storage_levels = {}
+
+# (type, namespace, name) -> Codec of the tables whose values the driver asked to compress
+_codecs = {}
+
+# partitions joined by merging cursors and the key lookups that saved, summed over the driver and its workers
+_merge_join_counters = multiprocessing.Array('l', 2)
+
+# rows a key range task gets at least, partitions holding more than their share are split into such tasks
+SPLIT_MIN_ROWS = 1 << 16
+
+# task timings of the latest operations
+STRAGGLER_HISTORY = 64
+_straggler_stats = deque(maxlen=STRAGGLER_HISTORY)
+# slowest over median task seconds above which an operation is logged as skewed
+STRAGGLER_RATIO = 2.0
 
 
 class Standalone:
     __instance = None
 
-    def __init__(self, job_id=None):
+    def __init__(self, job_id=None, lazy=False):
+        global LOGGER
+        LOGGER = getLogger()
         self.data_dir = os.path.join(file_utils.get_project_base_directory(), 'data')
+        self.memory_dir = _get_memory_root(self.data_dir)
         self.job_id = str(uuid.uuid1()) if job_id is None else "{}".format(job_id)
         self.meta_table = _DTable('__META__', '__META__', 'fragments', 10)
-        self.pool = Executor()
+        # every process may write the tables and invalidate their entries, so none is kept by the driver
+        self.stats_catalog = StatsCatalog(_DTable('__META__', '__META__', 'stats', 10), cached=False)
+        self.function_table = _DTable(StoreType.IN_MEMORY.value, self.job_id, '__functions__', 1)
+        self.broadcast_table = _DTable(StoreType.IN_MEMORY.value, self.job_id, '__broadcast__', 1)
+        self.dictionary_table = _DTable(StoreType.LMDB.value, '__CODEC__', 'dictionaries', 1)
+        self.pool = _RoutedPool()
+        self.lazy = lazy
+        self.tracker = _TableTracker(self.job_id, self.data_dir, self.memory_dir)
+        atexit.register(shutil.rmtree, os.path.join(self.data_dir, '__CACHE__', self.job_id), ignore_errors=True)
         Standalone.__instance = self
 
-    def table(self, name, namespace, partition=1, create_if_missing=True, error_if_exist=False, persistent=True):
+    @property
+    def parallelism(self):
+        return len(self.pool._slots)
+
+    def table(self, name, namespace, partition=None, create_if_missing=True, error_if_exist=False, persistent=True):
         __type = StoreType.LMDB.value if persistent else StoreType.IN_MEMORY.value
         _table_key = ".".join([__type, namespace, name])
-        self.meta_table.put_if_absent(_table_key, partition)
-        partition = self.meta_table.get(_table_key)
-        return _DTable(__type, namespace, name, partition)
-
-    def parallelize(self, data: Iterable, include_key=False, name=None, partition=1, namespace=None,
+        self.tracker.flush()
+        if _table_key not in _table_partitions:
+            if partition is None and self.meta_table.get(_table_key) is None:
+                partition, _ = resolve_partitions(None, self.parallelism, name=_table_key)
+            self.meta_table.put_if_absent(_table_key, partition)
+            _table_partitions[_table_key] = self.meta_table.get(_table_key)
+        partition = _table_partitions[_table_key]
+        return self.tracker.retain(_DTable(__type, namespace, name, partition))
+
+    def parallelize(self, data: Iterable, include_key=False, name=None, partition=None, namespace=None,
                     create_if_missing=True,
                     error_if_exist=False,
                     persistent=False):
-        _iter = data if include_key else enumerate(data)
+        _intermediate = name is None and not persistent
         if name is None:
             name = str(uuid.uuid1())
         if namespace is None:
             namespace = self.job_id
+        partition, data = resolve_partitions(partition, self.parallelism, data, name=".".join([namespace, name]))
+        _iter = data if include_key else enumerate(data)
         __table = self.table(name, namespace, partition, persistent=persistent)
+        if _intermediate:
+            self.tracker.track(__table)
         __table.put_all(_iter)
         return __table
 
+    def broadcast(self, value):
+        return _Broadcast(value)
+
+    @staticmethod
+    def configure_env_pool(max_envs=None, max_bytes=None, map_size=None):
+        _env_pool.configure(max_envs, max_bytes, map_size)
+
+    @staticmethod
+    def env_pool_stats():
+        return _env_pool.stats()
+
+    @staticmethod
+    def configure_worker_cache(max_bytes):
+        _partition_cache.max_bytes = max_bytes
+
+    @staticmethod
+    def configure_merge_join(min_rows=None, max_ratio=None):
+        global MERGE_JOIN_MIN_ROWS, MERGE_JOIN_MAX_RATIO
+        MERGE_JOIN_MIN_ROWS = MERGE_JOIN_MIN_ROWS if min_rows is None else min_rows
+        MERGE_JOIN_MAX_RATIO = MERGE_JOIN_MAX_RATIO if max_ratio is None else max_ratio
+
+    @staticmethod
+    def configure_broadcast_join(max_rows=None, max_bytes=None):
+        global BROADCAST_JOIN_MAX_ROWS, BROADCAST_JOIN_MAX_BYTES
+        BROADCAST_JOIN_MAX_ROWS = BROADCAST_JOIN_MAX_ROWS if max_rows is None else max_rows
+        BROADCAST_JOIN_MAX_BYTES = BROADCAST_JOIN_MAX_BYTES if max_bytes is None else max_bytes
+
+    @staticmethod
+    def configure_task_splitting(min_rows=None):
+        global SPLIT_MIN_ROWS
+        SPLIT_MIN_ROWS = SPLIT_MIN_ROWS if min_rows is None else min_rows
+
+    @staticmethod
+    def straggler_stats():
+        '''
+        Task timings of the latest operations, oldest first: the tasks, partitions split into key
+        ranges, and the median and slowest task seconds.
+        '''
+        return list(_straggler_stats)
+
+    @staticmethod
+    def join_stats():
+        with _merge_join_counters.get_lock():
+            return dict(zip(('merge_joins', 'lookups_avoided'), _merge_join_counters[:]))
+
     @staticmethod
     def get_instance():
         if Standalone.__instance is None:
@@ -67,41 +200,409 @@ class Standalone:
         return Standalone.__instance
 
 
+class _Broadcast(Broadcast):
+    def _store(self, value):
+        Standalone.get_instance().broadcast_table.put(self._id, value)
+
+    def _load(self):
+        return Standalone.get_instance().broadcast_table.get(self._id)
+
+    def unpersist(self):
+        super(_Broadcast, self).unpersist()
+        Standalone.get_instance().broadcast_table.delete(self._id)
+
+
+class _TableBroadcast(Broadcast):
+    '''
+    Broadcast of a value kept in an intermediate table of its own. The table is reclaimed like the other
+    intermediate tables, once no handle and no pending table needing it is left in the driver.
+    '''
+
+    def __init__(self, table):
+        self._id = ".".join(table._key())
+        self._table_key = table._key()
+
+    def _load(self):
+        return _DTable(*self._table_key, 1).get(0)
+
+
+class _TableTracker(object):
+    '''
+    Counts the live driver handles of every intermediate table, the tables operators create under
+    the job namespace. Once the last handle is garbage collected the table is unlinked by a
+    background thread, the driver closes its environments and drops the meta entries on its next
+    table call. Named tables, checkpoints and tables sent through federation are never tracked.
+    '''
+
+    def __init__(self, job_id, data_dir, memory_dir):
+        self._job_id = job_id
+        self._data_dir = data_dir
+        self._memory_dir = memory_dir
+        self._pid = os.getpid()
+        # (type, namespace, name) -> [live handles, partitions]
+        self._refs = {}
+        self._lock = threading.RLock()
+        self._pending = queue.Queue()
+        self._reclaimed = queue.Queue()
+        self.reclaimed_tables = 0
+        self.reclaimed_bytes = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='table-reclaimer-{}'.format(job_id), daemon=True)
+        self._worker.start()
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def _key_of(table):
+        return table._type, table._namespace, table._name
+
+    def _in_driver(self):
+        return os.getpid() == self._pid
+
+    def track(self, table):
+        if not self._in_driver():
+            return table
+        with self._lock:
+            self._refs.setdefault(self._key_of(table), [0, table._partitions])
+        return self.retain(table)
+
+    def retain(self, table):
+        if not self._in_driver():
+            return table
+        key = self._key_of(table)
+        with self._lock:
+            ref = self._refs.get(key)
+            if ref is None:
+                return table
+            ref[0] += 1
+        weakref.finalize(table, self._release, key).atexit = False
+        return table
+
+    def untrack(self, table):
+        with self._lock:
+            self._refs.pop(self._key_of(table), None)
+
+    def _release(self, key):
+        with self._lock:
+            ref = self._refs.get(key)
+            if ref is None:
+                return
+            ref[0] -= 1
+            if ref[0] > 0:
+                return
+            del self._refs[key]
+        self._pending.put((key, ref[1]))
+
+    def _table_path(self, _type, namespace, name):
+        _root = self._memory_dir if _type == StoreType.IN_MEMORY.value else self._data_dir
+        return os.sep.join([_root, _type, namespace, name])
+
+    def _unlink(self, key, partitions):
+        _table_path = self._table_path(*key)
+        if not os.path.isdir(_table_path):
+            # pending tables that were never computed have nothing in storage
+            return
+        size = 0
+        for root, _, files in os.walk(_table_path):
+            for f in files:
+                try:
+                    size += os.stat(os.path.join(root, f)).st_blocks * 512
+                except OSError:
+                    pass
+        shutil.rmtree(_table_path, ignore_errors=True)
+        self._reclaimed.put((key, partitions, size))
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                self._unlink(*item)
+            except Exception:
+                self._reclaimed.put((item[0], item[1], None))
+            finally:
+                self._pending.task_done()
+
+    def flush(self):
+        '''
+        Closes the driver environments and removes the meta entries of the tables unlinked so far.
+        Mapped pages of an unlinked partition are only released once every process closes it.
+        '''
+        if not self._in_driver():
+            return
+        meta_table = None
+        while True:
+            try:
+                key, partitions, size = self._reclaimed.get_nowait()
+            except queue.Empty:
+                break
+            _table_path = self._table_path(*key)
+            _env_pool.unpin(_table_path)
+            _codecs.pop(key, None)
+            if _storage_levels.pop(key, None) is not None:
+                try:
+                    Standalone.get_instance().pool.submit_all(do_uncache, key)
+                except RuntimeError:
+                    # the pool is already shut down when the job exits
+                    pass
+            for p in range(partitions):
+                _env_pool.close(os.sep.join([_table_path, str(p)]))
+            if meta_table is None:
+                meta_table = _DTable('__META__', '__META__', 'fragments', 10)
+                stats_table = _DTable('__META__', '__META__', 'stats', 10)
+            meta_table.delete(".".join(key))
+            stats_table.delete(".".join(key))
+            _table_partitions.pop(".".join(key), None)
+            if size is None:
+                LOGGER.warning("failed to reclaim table {}".format(".".join(key)))
+                continue
+            self.reclaimed_tables += 1
+            self.reclaimed_bytes += size
+            LOGGER.debug("reclaimed table {}, {} bytes".format(".".join(key), size))
+
+    def wait(self):
+        self._pending.join()
+        self.flush()
+
+    def report(self):
+        self.flush()
+        with self._lock:
+            live = len(self._refs)
+        return {'job_id': self._job_id, 'reclaimed_tables': self.reclaimed_tables,
+                'reclaimed_bytes': self.reclaimed_bytes, 'live_tables': live}
+
+    def shutdown(self):
+        if not self._in_driver() or self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            leftover, self._refs = self._refs, {}
+        for key, (_, partitions) in leftover.items():
+            self._pending.put((key, partitions))
+        self.wait()
+        self._pending.put(None)
+        LOGGER.info("job {} reclaimed {} intermediate tables, {} bytes".format(
+            self._job_id, self.reclaimed_tables, self.reclaimed_bytes))
+
+
+class _RoutedPool(object):
+    '''
+    One single process executor per slot. Tasks on partition p always run on slot p % slots, so the
+    worker that cached a partition gets every later task on it, other tasks take the slots in turn.
+    Key range tasks of split partitions go to the slot with the fewest queued tasks instead.
+    '''
+
+    def __init__(self, slots=None):
+        self._slots = [Executor(max_workers=1) for _ in range(slots or os.cpu_count() or 1)]
+        self._turn = 0
+        self._queued = [0] * len(self._slots)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, process, *args):
+        operand = getattr(process, '_operand', None)
+        if getattr(process, '_key_range', None) is not None:
+            with self._lock:
+                slot = self._queued.index(min(self._queued))
+        elif operand is not None:
+            slot = operand._partition % len(self._slots)
+        else:
+            slot = self._turn % len(self._slots)
+            self._turn += 1
+        return self._submit_to_slot(slot, fn, process, *args)
+
+    def _submit_to_slot(self, slot, fn, *args):
+        with self._lock:
+            self._queued[slot] += 1
+        future = self._slots[slot].submit(fn, *args)
+        future.add_done_callback(partial(self._done, slot))
+        return future
+
+    def _done(self, slot, _):
+        with self._lock:
+            self._queued[slot] -= 1
+
+    def submit_all(self, fn, *args):
+        return [executor.submit(fn, *args) for executor in self._slots]
+
+    def shutdown(self, wait=True):
+        for executor in self._slots:
+            executor.shutdown(wait)
+
+
 def serialize(_obj):
     return c_pickle.dumps(_obj)
 
 
-def _evict(_, env):
-    env.close()
+def _load_dictionary(dict_id):
+    return Standalone.get_instance().dictionary_table.get(dict_id)
+
+
+def _loads(data):
+    return c_pickle.loads(decode(data, _load_dictionary))
+
+
+def _value_dumps(codec: Codec):
+    if codec is None:
+        return c_pickle.dumps
+    encode = codec.encode
+    return lambda _obj: encode(c_pickle.dumps(_obj))
+
+
+class _EnvPool(object):
+    '''
+    LRU pool of the lmdb environments a process keeps open. Environments are released once the pool holds
+    more than max_envs of them or, with a byte budget, once their data exceeds max_bytes, environments
+    of pinned tables never are. Every task carries the driver settings, so workers follow them.
+    Counters are kept for this process and, in shared memory, summed over the driver and its workers.
+    '''
+    _HITS, _MISSES, _EVICTIONS = range(3)
+    # misses between two sweeps for environments of tables that were removed by another process
+    SWEEP_INTERVAL = 32
+
+    def __init__(self, max_envs=ENV_POOL_SIZE, max_bytes=ENV_POOL_BYTES, map_size=ENV_MAP_SIZE):
+        self.max_envs = max_envs
+        self.max_bytes = max_bytes
+        self.map_size = map_size
+        self._pinned = frozenset()
+        # path -> (env, writable), least recently used first. One env per path and process, lmdb does not
+        # support opening an environment twice in a process, it is reopened writable once a writer needs it
+        self._envs = OrderedDict()
+        self._lock = threading.RLock()
+        self._counters = [0, 0, 0]
+        self._misses_since_sweep = 0
+        self._shared_counters = multiprocessing.Array('l', 3)
+
+    def settings(self):
+        return self.max_envs, self.max_bytes, self.map_size, self._pinned
+
+    def apply(self, settings):
+        if settings == self.settings():
+            return
+        with self._lock:
+            self.max_envs, self.max_bytes, self.map_size, self._pinned = settings
+            self._shrink()
+
+    def configure(self, max_envs=None, max_bytes=None, map_size=None):
+        self.apply((self.max_envs if max_envs is None else max_envs,
+                    self.max_bytes if max_bytes is None else max_bytes,
+                    self.map_size if map_size is None else map_size,
+                    self._pinned))
+
+    def pin(self, table_path):
+        with self._lock:
+            self._pinned = self._pinned | {table_path}
+
+    def unpin(self, table_path):
+        with self._lock:
+            self._pinned = self._pinned - {table_path}
+            self._shrink()
+
+    def _count(self, counter):
+        self._counters[counter] += 1
+        with self._shared_counters.get_lock():
+            self._shared_counters[counter] += 1
+
+    def open(self, path, write, opener):
+        with self._lock:
+            env, writable = self._envs.get(path, (None, False))
+            if env is not None and (writable or not write):
+                self._envs.move_to_end(path)
+                self._count(self._HITS)
+                return env
+            self._misses_since_sweep += 1
+            if self._misses_since_sweep >= self.SWEEP_INTERVAL:
+                self._sweep()
+            # a read only env being replaced is not closed here, a task may still hold it
+            env = opener(path, write or writable, self.map_size)
+            self._envs[path] = (env, write or writable)
+            self._envs.move_to_end(path)
+            self._count(self._MISSES)
+            self._shrink(keep=path)
+            return env
+
+    def _sweep(self):
+        # an unlinked partition keeps its pages until every process closes it
+        self._misses_since_sweep = 0
+        for path in [path for path in self._envs if not os.path.isdir(path)]:
+            self._envs.pop(path)[0].close()
+
+    def close(self, path):
+        with self._lock:
+            env, _ = self._envs.pop(path, (None, False))
+            if env is not None:
+                env.close()
 
-
-@cached(cache=cache_utils.EvictTTLCache(maxsize=64, ttl=3600, evict=_evict))
-def _open_env(path, write=False):
+    @staticmethod
+    def _size_of(env):
+        return (env.info()['last_pgno'] + 1) * env.stat()['psize']
+
+    def _shrink(self, keep=None):
+        used = sum(self._size_of(env) for env, _ in self._envs.values()) if self.max_bytes > 0 else 0
+        for path in list(self._envs):
+            if len(self._envs) <= self.max_envs and (self.max_bytes <= 0 or used <= self.max_bytes):
+                return
+            if path == keep or os.path.dirname(path) in self._pinned:
+                continue
+            # not closed here, a task may still hold it, lmdb closes it with the last reference
+            env, _ = self._envs.pop(path)
+            if self.max_bytes > 0:
+                used -= self._size_of(env)
+            self._count(self._EVICTIONS)
+
+    def stats(self):
+        with self._lock:
+            local = dict(zip(('hits', 'misses', 'evictions'), self._counters))
+            local.update(envs=len(self._envs), pinned=len(self._pinned))
+        with self._shared_counters.get_lock():
+            local['all_processes'] = dict(zip(('hits', 'misses', 'evictions'), self._shared_counters[:]))
+        return local
+
+
+_env_pool = _EnvPool()
+
+
+def _open_env(path, write, map_size):
     os.makedirs(path, exist_ok=True)
-    return lmdb.open(path, create=True, max_dbs=1, max_readers=1024, lock=write, sync=False, map_size=10_737_418_240)
+    return lmdb.open(path, create=True, max_dbs=1, max_readers=1024, lock=write, sync=False, map_size=map_size)
 
 
 def _get_db_path(*args):
     return os.sep.join([Standalone.get_instance().data_dir, *args])
 
 
-def _get_env(*args, write=False):
-    _path = _get_db_path(*args)
-    return _open_env(_path, write=write)
+def _open_memory_env(path, write, map_size):
+    '''
+    IN_MEMORY partitions live on a tmpfs mount, writers update the shared pages in place and readers
+    in every process map the same pages, nothing is ever written back to disk.
+    '''
+    os.makedirs(path, exist_ok=True)
+    return lmdb.open(path, create=True, max_dbs=1, max_readers=1024, lock=write, sync=False, writemap=True,
+                     readahead=False, map_size=map_size)
+
 
+def _get_memory_root(data_dir):
+    '''
+    Every data dir gets its own directory on /dev/shm, so parties sharing a data dir share their tables.
+    '''
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha1(os.path.abspath(data_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base, 'fate_{}'.format(digest))
 
-def _hash_key_to_partition(key, partitions):
-    _key = hashlib.sha1(key).digest()
-    if isinstance(_key, bytes):
-        _key = int.from_bytes(_key, byteorder='little', signed=False)
-    if partitions < 1:
-        raise ValueError('partitions must be a positive number')
-    b, j = -1, 0
-    while j < partitions:
-        b = int(j)
-        _key = ((_key * 2862933555777941757) + 1) & 0xffffffffffffffff
-        j = float(b + 1) * (float(1 << 31) / float((_key >> 33) + 1))
-    return int(b)
+
+def _get_memory_path(*args):
+    return os.sep.join([Standalone.get_instance().memory_dir, *args])
+
+
+def _get_table_path(_type, namespace, name):
+    if _type == StoreType.IN_MEMORY.value:
+        return _get_memory_path(_type, namespace, name)
+    return _get_db_path(_type, namespace, name)
+
+
+def _get_env(*args, write=False):
+    if args[0] == StoreType.IN_MEMORY.value:
+        return _env_pool.open(_get_memory_path(*args), write, _open_memory_env)
+    return _env_pool.open(_get_db_path(*args), write, _open_env)
 
 
 class _TaskInfo:
@@ -125,130 +626,577 @@ class _Operand:
         return _get_env(self._type, self._namespace, self._name, str(self._partition), write=write)
 
 
+class _Stage:
+    '''
+    A narrow, partition-preserving operation which is fused into the pipeline of a lazy table.
+    `_other` locates the right table of a join stage as (type, namespace, name).
+    '''
+
+    def __init__(self, kind, task_info: _TaskInfo, other=None):
+        self._kind = kind
+        self._info = task_info
+        self._other = other
+
+
 class _UnaryProcess:
-    def __init__(self, task_info: _TaskInfo, operand: _Operand):
+    def __init__(self, task_info: _TaskInfo, operand: _Operand, stages=()):
         self._info = task_info
         self._operand = operand
+        self._stages = stages
+        self._env_pool_settings = _env_pool.settings()
+        self._cache_levels = _cache_levels_of(operand, stages)
+        self._cache_bytes = _partition_cache.max_bytes
+        self._merge_join = (MERGE_JOIN_MIN_ROWS, MERGE_JOIN_MAX_RATIO)
+        # (start key, end key) of a split partition, None for the whole partition
+        self._key_range = None
+        # derived tables compress their values like their source
+        self._codec = _codecs.get((operand._type, operand._namespace, operand._name))
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        _env_pool.apply(self._env_pool_settings)
+        _partition_cache.max_bytes = self._cache_bytes
+
+
+class _LoadProcess(_UnaryProcess):
+    '''
+    Loads one byte range of a file into every partition of the operand table. The operand partition is
+    the chunk number, it only spreads the chunks over the pool.
+    '''
+
+    def __init__(self, task_info: _TaskInfo, operand: _Operand, partitions, path, chunk, commit_rows):
+        super().__init__(task_info, operand)
+        self._partitions = partitions
+        self._path = path
+        self._chunk = chunk
+        self._commit_rows = commit_rows
 
 
-class _BinaryProcess:
-    def __init__(self, task_info: _TaskInfo, left: _Operand, right: _Operand):
-        self._info = task_info
-        self._left = left
-        self._right = right
+def _cache_levels_of(operand: _Operand, stages):
+    if not _storage_levels:
+        return {}
+    keys = [(operand._type, operand._namespace, operand._name)] + [s._other for s in stages if s._other is not None]
+    return {k: _storage_levels[k] for k in keys if k in _storage_levels}
+
+
+class _CachedPartition(object):
+    def __init__(self, rows, size, level):
+        self.rows = rows
+        self.size = size
+        self.level = level
+        self._lookup = None
+
+    def lookup(self):
+        if self._lookup is None:
+            self._lookup = dict(self.rows)
+        return self._lookup
+
+
+class _PartitionCache(object):
+    '''
+    Deserialized partitions a worker keeps for persisted tables, least recently used first. Sizes count
+    the serialized bytes of the rows. MEMORY_AND_DISK partitions are written to a local spill file when
+    evicted and read back with a single load, MEMORY_ONLY partitions are read from the table again.
+    '''
+
+    def __init__(self, max_bytes=WORKER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        # (type, namespace, name, partition) -> _CachedPartition
+        self._entries = OrderedDict()
+        self._used = 0
+
+    @staticmethod
+    def _spill_path(key):
+        return _get_db_path('__CACHE__', Standalone.get_instance().job_id, str(os.getpid()), ".".join(map(str, key)))
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        spill_path = self._spill_path(key)
+        if not os.path.exists(spill_path):
+            return None
+        with open(spill_path, 'rb') as f:
+            rows, size, level = c_pickle.load(f)
+        os.remove(spill_path)
+        return self.put(key, rows, size, level)
+
+    def put(self, key, rows, size, level):
+        entry = _CachedPartition(rows, size, level)
+        if size > self.max_bytes:
+            return entry
+        self._entries[key] = entry
+        self._used += size
+        while self._used > self.max_bytes and len(self._entries) > 1:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._used -= evicted.size
+            if evicted.level == StorageLevel.MEMORY_AND_DISK:
+                spill_path = self._spill_path(evicted_key)
+                os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+                with open(spill_path, 'wb') as f:
+                    c_pickle.dump((evicted.rows, evicted.size, evicted.level), f, protocol=c_pickle.HIGHEST_PROTOCOL)
+        return entry
+
+    def drop(self, table_key):
+        for key in [key for key in self._entries if key[:3] == table_key]:
+            self._used -= self._entries.pop(key).size
+        spill_dir = os.path.dirname(self._spill_path(table_key + (0,)))
+        if os.path.isdir(spill_dir):
+            prefix = ".".join(table_key) + "."
+            for spill in os.listdir(spill_dir):
+                if spill.startswith(prefix):
+                    os.remove(os.path.join(spill_dir, spill))
+
+
+_partition_cache = _PartitionCache()
+
+
+def _cached_partition(op: _Operand, level):
+    key = (op._type, op._namespace, op._name, op._partition)
+    entry = _partition_cache.get(key)
+    if entry is None:
+        rows = []
+        size = 0
+        deserialize = _loads
+        with op.as_env().begin() as txn:
+            for k_bytes, v_bytes in txn.cursor():
+                size += len(k_bytes) + len(v_bytes)
+                rows.append((k_bytes, deserialize(v_bytes)))
+        entry = _partition_cache.put(key, rows, size, level)
+    return entry
+
+
+def do_uncache(table_key):
+    _partition_cache.drop(table_key)
 
 
 def __get_function(info: _TaskInfo):
-    return f_pickle.loads(info._function_bytes)
+    try:
+        return _function_cache[info._function_id]
+    except KeyError:
+        pass
+    function_bytes = info._function_bytes
+    if function_bytes is None:
+        function_bytes = Standalone.get_instance().function_table.get(info._function_id)
+    _function = f_pickle.loads(function_bytes)
+    _function_cache[info._function_id] = _function
+    return _function
 
 
-def _generator_from_cursor(cursor):
-    deserialize = c_pickle.loads
-    for k, v in cursor:
-        yield deserialize(k), deserialize(v)
+def _deserialize_values(rows):
+    deserialize = _loads
+    for k_bytes, v_bytes in rows:
+        yield k_bytes, deserialize(v_bytes)
 
 
-def do_map(p: _UnaryProcess):
-    _mapper = __get_function(p._info)
-    op = p._operand
-    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
-    source_env = op.as_env()
-    serialize = c_pickle.dumps
-    deserialize = c_pickle.loads
-    _table_key = ".".join([op._type, op._namespace, op._name])
-    txn_map = {}
-    partitions = Standalone.get_instance().meta_table.get(_table_key)
-    for p in range(partitions):
-        env = _get_env(rtn._type, rtn._namespace, rtn._name, str(p), write=True)
-        txn = env.begin(write=True)
-        txn_map[p] = txn
-    with source_env.begin() as source_txn:
-        cursor = source_txn.cursor()
-        for k_bytes, v_bytes in cursor:
-            k, v = deserialize(k_bytes), deserialize(v_bytes)
-            k1, v1 = _mapper(k, v)
-            k1_bytes, v1_bytes = serialize(k1), serialize(v1)
-            p = _hash_key_to_partition(k1_bytes, partitions)
-            dest_txn = txn_map[p]
-            dest_txn.put(k1_bytes, v1_bytes)
-        cursor.close()
-    for p, txn in txn_map.items():
-        txn.commit()
-    return rtn
+def _map_values_rows(rows, mapper):
+    for k_bytes, v in rows:
+        yield k_bytes, mapper(v)
 
 
-def do_map_partitions(p: _UnaryProcess):
-    _mapper = __get_function(p._info)
+_MISSING = object()
+
+
+def _txn_getter(txn):
+    deserialize = _loads
+
+    def _get(k_bytes):
+        v_bytes = txn.get(k_bytes)
+        return _MISSING if v_bytes is None else deserialize(v_bytes)
+
+    return _get
+
+
+def _join_rows(rows, right_get, joiner, raw):
+    deserialize = _loads
+    for k_bytes, v1 in rows:
+        v2 = right_get(k_bytes)
+        if v2 is _MISSING:
+            continue
+        yield k_bytes, joiner(deserialize(v1) if raw else v1, v2)
+
+
+def _broadcast_join_rows(rows, broadcast_rows, joiner, broadcast_on_left, raw):
+    deserialize = _loads
+    for k_bytes, v in rows:
+        v_broadcast = broadcast_rows.get(k_bytes, _MISSING)
+        if v_broadcast is _MISSING:
+            continue
+        v = deserialize(v) if raw else v
+        yield k_bytes, joiner(v_broadcast, v) if broadcast_on_left else joiner(v, v_broadcast)
+
+
+def _lookup_get(lookup, k_bytes):
+    return lookup.get(k_bytes, _MISSING)
+
+
+def _filter_rows(rows, predicate, raw):
+    deserialize = _loads
+    for k_bytes, v in rows:
+        if predicate(deserialize(k_bytes), deserialize(v) if raw else v):
+            yield k_bytes, v
+
+
+def _cursor_contains(txn, stack: ExitStack):
+    cursor = txn.cursor()
+    stack.callback(cursor.close)
+    return cursor.set_key
+
+
+def _key_filter_rows(rows, contains, keep):
+    for k_bytes, v in rows:
+        if bool(contains(k_bytes)) == keep:
+            yield k_bytes, v
+
+
+def _merge_join_rows(rows, right_cursor, joiner, raw):
+    deserialize = _loads
+    merge_join = MergeJoin(right_cursor)
+    try:
+        for k_bytes, v1, v2_bytes in merge_join.pairs(rows):
+            yield k_bytes, joiner(deserialize(v1) if raw else v1, deserialize(v2_bytes))
+    finally:
+        with _merge_join_counters.get_lock():
+            _merge_join_counters[0] += 1
+            _merge_join_counters[1] += merge_join.lookups_avoided
+
+
+def _sample_rows(rows, fraction, seed):
+    random_state = np.random.RandomState(seed)
+    for k_bytes, v in rows:
+        if random_state.rand() < fraction:
+            yield k_bytes, v
+
+
+def _open_source(p: _UnaryProcess, stack: ExitStack):
+    '''
+    Opens the source partition of `p` and chains the pending stages onto its cursor.
+    Returns the rows as (key bytes, value) pairs and whether the values are still serialized.
+    '''
     op = p._operand
-    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
-    source_env = op.as_env()
+    levels = p._cache_levels
+    level = levels.get((op._type, op._namespace, op._name))
+    if level is None:
+        source_env = op.as_env()
+        source_rows = source_env.stat()['entries']
+        source_txn = stack.enter_context(source_env.begin())
+        cursor = source_txn.cursor()
+        stack.callback(cursor.close)
+        rows, raw = iter(cursor) if p._key_range is None else range_rows(cursor, *p._key_range), True
+    else:
+        cached = _cached_partition(op, level).rows
+        source_rows = len(cached)
+        rows, raw = iter(cached), False
+    for stage in p._stages:
+        if stage._kind == 'sample':
+            fraction, seed = c_pickle.loads(stage._info._function_bytes)
+            rows = _sample_rows(rows, fraction, seed)
+        elif stage._kind == 'mapValues':
+            if raw:
+                rows, raw = _deserialize_values(rows), False
+            rows = _map_values_rows(rows, __get_function(stage._info))
+        elif stage._kind == 'join':
+            right_op = _Operand(*stage._other, op._partition)
+            right_level = levels.get(stage._other)
+            if right_level is not None:
+                right_lookup = _cached_partition(right_op, right_level).lookup()
+                # bound per stage, a closure would see the lookup of the last join of the pipeline
+                right_get = partial(_lookup_get, right_lookup)
+                rows, raw = _join_rows(rows, right_get, __get_function(stage._info), raw), False
+                continue
+            right_env = right_op.as_env()
+            right_txn = stack.enter_context(right_env.begin())
+            # rows keep the key order of the source, a right side on disk is then read in one sequential
+            # pass, lookups into /dev/shm are as cheap as cursor steps
+            if right_op._type != StoreType.IN_MEMORY.value \
+                    and use_merge_join(source_rows, right_env.stat()['entries'], *p._merge_join):
+                right_cursor = right_txn.cursor()
+                stack.callback(right_cursor.close)
+                rows = _merge_join_rows(rows, right_cursor, __get_function(stage._info), raw)
+            else:
+                rows = _join_rows(rows, _txn_getter(right_txn), __get_function(stage._info), raw)
+            raw = False
+        elif stage._kind == 'broadcast_join':
+            broadcast, broadcast_on_left, joiner = __get_function(stage._info)
+            rows, raw = _broadcast_join_rows(rows, broadcast.value, joiner, broadcast_on_left, raw), False
+        elif stage._kind == 'filter':
+            rows = _filter_rows(rows, __get_function(stage._info), raw)
+        elif stage._kind in ('semi_join', 'subtract_by_key'):
+            # only the keys of the other table are looked at, its values are never read
+            right_op = _Operand(*stage._other, op._partition)
+            right_level = levels.get(stage._other)
+            if right_level is None:
+                contains = _cursor_contains(stack.enter_context(right_op.as_env().begin()), stack)
+            else:
+                contains = _cached_partition(right_op, right_level).lookup().__contains__
+            rows = _key_filter_rows(rows, contains, stage._kind == 'semi_join')
+        else:
+            raise ValueError("unknown stage: {}".format(stage._kind))
+    return rows, raw
+
+
+def _partition_stats(env):
+    # (rows, bytes, key range) from the metadata of a partition and its first and last keys
+    stat = env.stat()
+    size = stat['psize'] * (stat['branch_pages'] + stat['leaf_pages'] + stat['overflow_pages'])
+    with env.begin() as txn, txn.cursor() as cursor:
+        if not cursor.first():
+            return stat['entries'], size, None
+        first = bytes(cursor.key())
+        cursor.last()
+        return stat['entries'], size, (first, bytes(cursor.key()))
+
+
+def _open_generator(p: _UnaryProcess, stack: ExitStack):
+    rows, raw = _open_source(p, stack)
+    deserialize = _loads
+    return ((deserialize(k_bytes), deserialize(v) if raw else v) for k_bytes, v in rows)
+
+
+def do_timed(p, fn):
+    start = time.time()
+    rtn = fn(p)
+    return time.time() - start, rtn
+
+
+class _OperationTimer(object):
+    '''
+    Collects the seconds every task of an operation ran in its worker. Once the last task is done, the
+    timings are added to the straggler stats.
+    '''
+
+    def __init__(self, operation, tasks, split_partitions):
+        self._stats = dict(operation=operation, tasks=tasks, split_partitions=split_partitions)
+        self._seconds = []
+        self._lock = threading.Lock()
+
+    def submit(self, pool, fn, p):
+        rtn = Future()
+        pool.submit(do_timed, p, fn).add_done_callback(partial(self._done, rtn))
+        return rtn
+
+    def _done(self, rtn: Future, future: Future):
+        error = future.exception()
+        seconds = None
+        if error is None:
+            seconds, result = future.result()
+        with self._lock:
+            self._seconds.append(seconds)
+            last = len(self._seconds) == self._stats['tasks']
+        if last:
+            self._report()
+        if error is None:
+            rtn.set_result(result)
+        else:
+            rtn.set_exception(error)
+
+    def _report(self):
+        seconds = sorted(s for s in self._seconds if s is not None)
+        if not seconds:
+            return
+        stats = dict(self._stats, median_seconds=seconds[len(seconds) // 2], max_seconds=seconds[-1])
+        _straggler_stats.append(stats)
+        if stats['max_seconds'] > STRAGGLER_RATIO * max(stats['median_seconds'], 0.1):
+            LOGGER.info("skewed operation: {}".format(stats))
+        else:
+            LOGGER.debug("operation timings: {}".format(stats))
+
+
+def do_pipeline(p: _UnaryProcess):
+    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, p._operand._partition)
     dst_env = rtn.as_env(write=True)
-    serialize = c_pickle.dumps
-    with source_env.begin() as source_txn:
+    serialize = _value_dumps(p._codec)
+    # every stage keeps the key order of the source cursor
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        if not raw:
+            rows = ((k_bytes, serialize(v)) for k_bytes, v in rows)
         with dst_env.begin(write=True) as dst_txn:
-            cursor = source_txn.cursor()
-            v = _mapper(_generator_from_cursor(cursor))
-            if cursor.last():
-                k_bytes = cursor.key()
-                dst_txn.put(k_bytes, serialize(v))
-            cursor.close()
+            write_sorted(dst_txn, rows)
     return rtn
 
 
-def do_map_values(p: _UnaryProcess):
-    _mapper = __get_function(p._info)
+class _ShuffleProcess(_UnaryProcess):
+    def __init__(self, task_info: _TaskInfo, operand: _Operand, stages, partitions):
+        super(_ShuffleProcess, self).__init__(task_info, operand, stages)
+        self._partitions = partitions
+
+
+class _ShuffleStats:
+    def __init__(self, rows=0, bytes=0, spills=0):
+        self.rows = rows
+        self.bytes = bytes
+        self.spills = spills
+
+    def __add__(self, other):
+        return _ShuffleStats(self.rows + other.rows, self.bytes + other.bytes, self.spills + other.spills)
+
+    def __str__(self):
+        return "rows: {}, bytes: {}, spills: {}".format(self.rows, self.bytes, self.spills)
+
+
+def _get_spill_dir(task_info: _TaskInfo, partition):
+    return _get_db_path('__SHUFFLE__', task_info._task_id, task_info._function_id, str(partition))
+
+
+def _spill(p: _ShuffleProcess, rows):
+    '''
+    Map side of a shuffle: buckets serialized (key, value) pairs by destination partition and writes
+    every bucket as a sorted spill run, starting a new run whenever the buffer exceeds SHUFFLE_BUFFER_BYTES.
+    '''
+    stats = _ShuffleStats()
+    buckets = [[] for _ in range(p._partitions)]
+    buffered = 0
+
+    def _flush():
+        for dst, bucket in enumerate(buckets):
+            if not bucket:
+                continue
+            # stable on the key, duplicated keys stay in the order they were mapped
+            bucket.sort(key=itemgetter(0))
+            spill_dir = _get_spill_dir(p._info, dst)
+            os.makedirs(spill_dir, exist_ok=True)
+            spill_path = os.path.join(spill_dir, "{}_{}".format(p._operand._partition, stats.spills))
+            with open(spill_path, 'wb') as f:
+                c_pickle.dump(bucket, f, protocol=c_pickle.HIGHEST_PROTOCOL)
+            stats.spills += 1
+            buckets[dst] = []
+
+    for chunk in chunks(rows):
+        dsts = hash_keys_to_partitions([k_bytes for k_bytes, _ in chunk], p._partitions)
+        for dst, kv in zip(dsts.tolist(), chunk):
+            buckets[dst].append(kv)
+            buffered += len(kv[0]) + len(kv[1])
+        stats.rows += len(chunk)
+        if buffered >= SHUFFLE_BUFFER_BYTES:
+            stats.bytes += buffered
+            buffered = 0
+            _flush()
+    stats.bytes += buffered
+    _flush()
+    return stats
+
+
+def _first_of_keys(rows):
+    last_key = None
+    for k_bytes, v_bytes in rows:
+        if k_bytes != last_key:
+            yield k_bytes, v_bytes
+            last_key = k_bytes
+
+
+def do_shuffle_merge(p: _UnaryProcess):
+    '''
+    Reduce side of a shuffle: merges the sorted spill runs of one destination partition and writes them
+    with the only write transaction opened on that partition. Duplicated keys keep the value mapped first,
+    by source partition and then by row: runs are merged on the key alone, ties go to the earlier run.
+    '''
     op = p._operand
-    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
-    source_env = op.as_env()
+    spill_dir = _get_spill_dir(p._info, op._partition)
+    runs = []
+    if os.path.isdir(spill_dir):
+        # spills are named <source partition>_<spill number>
+        spills = sorted(os.listdir(spill_dir), key=lambda spill: tuple(int(n) for n in spill.split('_')))
+        for spill in spills:
+            with open(os.path.join(spill_dir, spill), 'rb') as f:
+                runs.append(c_pickle.load(f))
+    dst_env = op.as_env(write=True)
+    with dst_env.begin(write=True) as dst_txn:
+        write_sorted(dst_txn, _first_of_keys(merge(*runs, key=itemgetter(0))))
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    return op
+
+
+def do_map(p: _ShuffleProcess):
+    _mapper = __get_function(p._info)
+    serialize, serialize_value = c_pickle.dumps, _value_dumps(p._codec)
+
+    def _mapped_rows(_rows):
+        for k, v in _rows:
+            k1, v1 = _mapper(k, v)
+            yield serialize(k1), serialize_value(v1)
+
+    with ExitStack() as stack:
+        return _spill(p, _mapped_rows(_open_generator(p, stack)))
+
+
+def do_map_partitions_to_pairs(p: _ShuffleProcess):
+    _mapper = __get_function(p._info)
+    serialize, serialize_value = c_pickle.dumps, _value_dumps(p._codec)
+    with ExitStack() as stack:
+        pairs = _mapper(_open_generator(p, stack))
+        return _spill(p, ((serialize(k), serialize_value(v)) for k, v in pairs))
+
+
+def do_map_partitions_in_place(p: _UnaryProcess):
+    _mapper = __get_function(p._info)
+    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, p._operand._partition)
     dst_env = rtn.as_env(write=True)
-    serialize = c_pickle.dumps
-    deserialize = c_pickle.loads
-    with source_env.begin() as source_txn:
+    serialize, serialize_value = c_pickle.dumps, _value_dumps(p._codec)
+    with ExitStack() as stack:
+        pairs = _mapper(_open_generator(p, stack))
         with dst_env.begin(write=True) as dst_txn:
-            cursor = source_txn.cursor()
-            for k_bytes, v_bytes in cursor:
-                v = deserialize(v_bytes)
-                v1 = _mapper(v)
-                dst_txn.put(k_bytes, serialize(v1))
-            cursor.close()
+            for k, v in pairs:
+                dst_txn.put(serialize(k), serialize_value(v))
     return rtn
 
 
-def do_join(p: _BinaryProcess):
-    _joiner = __get_function(p._info)
-    left_op = p._left
-    right_op = p._right
-    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, left_op._partition)
-    right_env = right_op.as_env()
-    left_env = left_op.as_env()
+def do_flat_map(p: _ShuffleProcess):
+    _mapper = __get_function(p._info)
+    serialize, serialize_value = c_pickle.dumps, _value_dumps(p._codec)
+
+    def _flat_rows(_rows):
+        for k, v in _rows:
+            for k1, v1 in _mapper(k, v):
+                yield serialize(k1), serialize_value(v1)
+
+    with ExitStack() as stack:
+        return _spill(p, _flat_rows(_open_generator(p, stack)))
+
+
+def do_repartition(p: _ShuffleProcess):
+    serialize = _value_dumps(p._codec)
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        return _spill(p, rows if raw else ((k_bytes, serialize(v)) for k_bytes, v in rows))
+
+
+def do_map_partitions(p: _UnaryProcess):
+    _mapper = __get_function(p._info)
+    op = p._operand
+    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
     dst_env = rtn.as_env(write=True)
     serialize = c_pickle.dumps
-    deserialize = c_pickle.loads
-    with left_env.begin() as left_txn:
-        with right_env.begin() as right_txn:
-            with dst_env.begin(write=True) as dest_txn:
-                cursor = left_txn.cursor()
-                for k_bytes, v1_bytes in cursor:
-                    v2_bytes = right_txn.get(k_bytes)
-                    if v2_bytes is None:
-                        continue
-                    v1 = deserialize(v1_bytes)
-                    v2 = deserialize(v2_bytes)
-                    v3 = _joiner(v1, v2)
-                    dest_txn.put(k_bytes, serialize(v3))
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        last = [None]
+
+        def _track_last(_rows):
+            for k_bytes, v in _rows:
+                last[0] = k_bytes
+                yield k_bytes, v
+
+        deserialize = _loads
+        tracked = _track_last(rows)
+        v = _mapper((deserialize(k_bytes), deserialize(v) if raw else v) for k_bytes, v in tracked)
+        # exhaust the rows the mapper did not consume so the last key is known
+        for _ in tracked:
+            pass
+        if last[0] is not None:
+            with dst_env.begin(write=True) as dst_txn:
+                dst_txn.put(last[0], serialize(v))
     return rtn
 
 
 def do_reduce(p: _UnaryProcess):
     _reducer = __get_function(p._info)
-    op = p._operand
-    source_env = op.as_env()
-    deserialize = c_pickle.loads
     value = None
-    with source_env.begin() as source_txn:
-        cursor = source_txn.cursor()
-        for k_bytes, v_bytes in cursor:
-            v = deserialize(v_bytes)
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        deserialize = _loads
+        for k_bytes, v in rows:
+            v = deserialize(v) if raw else v
             if value is None:
                 value = v
             else:
@@ -256,144 +1204,377 @@ def do_reduce(p: _UnaryProcess):
     return value
 
 
-def do_glom(p: _UnaryProcess):
+def _get_partials(task_info: _TaskInfo):
+    return _DTable(StoreType.IN_MEMORY.value, task_info._task_id, task_info._function_id, 1)
+
+
+def do_aggregate(p: _UnaryProcess):
+    zero_bytes, seq_op = __get_function(p._info)
+    with ExitStack() as stack:
+        acc = aggregate_partition(_open_generator(p, stack), zero_bytes, seq_op)
+    _get_partials(p._info).put(p._operand._partition, acc)
+    return p._operand._partition
+
+
+def do_tree_reduce(p: _UnaryProcess):
+    value = do_reduce(p)
+    if value is None:
+        return None
+    _get_partials(p._info).put(p._operand._partition, value)
+    return p._operand._partition
+
+
+class _CombineProcess:
+    def __init__(self, task_info: _TaskInfo, partials_info: _TaskInfo, keys):
+        self._info = task_info
+        self._partials_info = partials_info
+        self._keys = keys
+        self._env_pool_settings = _env_pool.settings()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        _env_pool.apply(self._env_pool_settings)
+
+
+def do_combine(p: _CombineProcess):
+    '''
+    Combines a group of partial results in place of the first one, the driver only ever reads the last one.
+    '''
+    _combiner = __get_function(p._info)
+    partials = _get_partials(p._partials_info)
+    value = partials.get(p._keys[0])
+    for k in p._keys[1:]:
+        value = _combiner(value, partials.get(k))
+    partials.put(p._keys[0], value)
+    return p._keys[0]
+
+
+def do_to_numpy(p: _UnaryProcess):
+    value_fn, ordered = __get_function(p._info)
+    keys, values = [], []
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        if raw:
+            rows = _deserialize_values(rows)
+        for k_bytes, v in rows:
+            if ordered:
+                keys.append(k_bytes)
+            values.append(v if value_fn is None else value_fn(v))
+    return keys if ordered else None, np.asarray(values)
+
+
+def do_take_sample(p: _UnaryProcess):
+    n, seed = c_pickle.loads(p._info._function_bytes)
+    random_state = np.random.RandomState(None if seed is None else [seed, p._operand._partition])
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        count, reservoir = reservoir_sample(rows, n, random_state)
+    return count, reservoir, raw
+
+
+def do_load_chunk(p: _LoadProcess):
+    parse = __get_function(p._info)
+    serialize, serialize_value = c_pickle.dumps, _value_dumps(p._codec)
+    rows = {}
+    for line in read_lines(p._path, p._chunk):
+        k, v = parse(line)
+        # a later row of the same key in this chunk wins, as with put_all, chunks race each other
+        rows[serialize(k)] = serialize_value(v)
+    k_bytes_list = sorted(rows)
+    by_partition = {}
+    for part, k_bytes in zip(hash_keys_to_partitions(k_bytes_list, p._partitions).tolist(), k_bytes_list):
+        by_partition.setdefault(part, []).append((k_bytes, rows[k_bytes]))
     op = p._operand
-    rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
-    source_env = op.as_env()
-    dst_env = rtn.as_env(write=True)
-    serialize = c_pickle.dumps
-    deserialize = c_pickle.loads
-    with source_env.begin() as source_txn:
-        with dst_env.begin(write=True) as dest_txn:
-            cursor = source_txn.cursor()
-            v_list = []
-            k_bytes = None
-            for k, v in cursor:
-                v_list.append((deserialize(k), deserialize(v)))
-                k_bytes = k
-            if k_bytes is not None:
-                dest_txn.put(k_bytes, serialize(v_list))
-    return rtn
+    for part, part_rows in by_partition.items():
+        env = _get_env(op._type, op._namespace, op._name, str(part), write=True)
+        for commit in chunks(part_rows, p._commit_rows):
+            with env.begin(write=True) as txn:
+                write_sorted(txn, commit)
+    return len(rows), p._chunk[1]
+
 
+def do_codec_stats(p: _UnaryProcess):
+    with p._operand.as_env().begin() as txn:
+        return measure(txn.cursor().iternext(keys=False, values=True), p._codec, _load_dictionary)
 
-def do_sample(p: _UnaryProcess):
+
+def do_glom(p: _UnaryProcess):
     op = p._operand
     rtn = _Operand(StoreType.IN_MEMORY.value, p._info._task_id, p._info._function_id, op._partition)
-    source_env = op.as_env()
     dst_env = rtn.as_env(write=True)
-    deserialize = c_pickle.loads
-    fraction, seed = deserialize(p._info._function_bytes)
-    with source_env.begin() as source_txn:
-        with dst_env.begin(write=True) as dst_txn:
-            cursor = source_txn.cursor()
-            cursor.first()
-            random_state = np.random.RandomState(seed)
-            for k, v in cursor:
-                if random_state.rand() < fraction:
-                    dst_txn.put(k, v)
+    serialize = c_pickle.dumps
+    deserialize = _loads
+    with ExitStack() as stack:
+        rows, raw = _open_source(p, stack)
+        v_list = []
+        k_bytes = None
+        for k, v in rows:
+            v_list.append((deserialize(k), deserialize(v) if raw else v))
+            k_bytes = k
+        if k_bytes is not None:
+            with dst_env.begin(write=True) as dest_txn:
+                dest_txn.put(k_bytes, serialize(v_list))
     return rtn
 
 
 class _DTable(object):
 
-    def __init__(self, _type, namespace, name, partitions):
+    def __init__(self, _type, namespace, name, partitions, pipeline=None):
         self._type = _type
         self._namespace = namespace
         self._name = name
         self._partitions = partitions
+        # (source table, stages) while the table is pending in lazy mode, None once it is in storage
+        self._pipeline = pipeline
+        # other tables the pending stages read, held so they are not reclaimed before the pipeline runs
+        self._depends_on = []
 
     def __str__(self):
         return "type: {}, namespace: {}, name: {}, partitions: {}".format(self._type, self._namespace, self._name,
                                                                           self._partitions)
 
-    def _get_env_for_partition(self, p: int):
-        return _get_env(self._type, self._namespace, self._name, str(p))
+    def _get_env_for_partition(self, p: int, write=False):
+        self.persist()
+        return _get_env(self._type, self._namespace, self._name, str(p), write=write)
+
+    def _key(self):
+        return self._type, self._namespace, self._name
+
+    def _value_dumps(self):
+        return _value_dumps(_codecs.get(self._key()))
+
+    def _inherit_codec(self, rtn):
+        # tables computed from this one compress their values like it
+        source = self._pipeline[0] if self._pipeline is not None else self
+        codec = _codecs.get(source._key())
+        if codec is not None:
+            _codecs[rtn._key()] = codec
+        return rtn
+
+    def _derived(self, rtn):
+        return Standalone.get_instance().tracker.track(self._inherit_codec(rtn))
 
     def put(self, k, v):
+        self._check_cached()
         k_bytes = c_pickle.dumps(k)
-        v_bytes = c_pickle.dumps(v)
+        v_bytes = self._value_dumps()(v)
         p = _hash_key_to_partition(k_bytes, self._partitions)
-        env = self._get_env_for_partition(p)
-        with env.begin(write=True) as txn:
-            return txn.put(k_bytes, v_bytes)
-        return False
+        env = self._get_env_for_partition(p, write=True)
+        try:
+            with env.begin(write=True) as txn:
+                return txn.put(k_bytes, v_bytes)
+        finally:
+            self._invalidate_stats([p])
 
     def count(self):
-        cnt = 0
-        for p in range(self._partitions):
-            env = self._get_env_for_partition(p)
-            cnt += env.stat()['entries']
-        return cnt
+        return self.stats().rows
+
+    def stats(self):
+        '''
+        TableStats from the stats catalog, returned as they are unless a writer marked partitions stale.
+        Stale partitions are read from the lmdb metadata and their first and last keys, no row is scanned.
+        Pending tables of mapValues stages only take the stats of their source, without running.
+        '''
+        if self._pipeline is not None:
+            source, stages = self._pipeline
+            if all(stage._kind == 'mapValues' for stage in stages):
+                return source.stats().derived()
+            self.persist()
+        catalog = Standalone.get_instance().stats_catalog
+        _table_key = ".".join(self._key())
+        stats = catalog.get(_table_key) or TableStats(self._partitions)
+        stale = stats.stale_partitions()
+        if stale:
+            for p in stale:
+                stats.update(p, *_partition_stats(self._get_env_for_partition(p)))
+            catalog.put(_table_key, stats)
+        return stats
+
+    def _invalidate_stats(self, partitions):
+        # every writer of a stored table calls this once its transactions are committed, meta tables have no stats
+        if self._type != '__META__':
+            Standalone.get_instance().stats_catalog.invalidate(".".join(self._key()), partitions)
 
     def delete(self, k):
+        self._check_cached()
         k_bytes = c_pickle.dumps(k)
         p = _hash_key_to_partition(k_bytes, self._partitions)
-        env = self._get_env_for_partition(p)
-        with env.begin(write=True) as txn:
-            old_value_bytes = txn.get(k_bytes)
-            if txn.delete(k_bytes):
-                return None if old_value_bytes is None else c_pickle.loads(old_value_bytes)
-            return None
+        env = self._get_env_for_partition(p, write=True)
+        try:
+            with env.begin(write=True) as txn:
+                old_value_bytes = txn.get(k_bytes)
+                if txn.delete(k_bytes):
+                    return None if old_value_bytes is None else _loads(old_value_bytes)
+                return None
+        finally:
+            self._invalidate_stats([p])
 
     def put_if_absent(self, k, v):
+        self._check_cached()
         k_bytes = c_pickle.dumps(k)
         p = _hash_key_to_partition(k_bytes, self._partitions)
-        env = self._get_env_for_partition(p)
+        env = self._get_env_for_partition(p, write=True)
         with env.begin(write=True) as txn:
             old_value_bytes = txn.get(k_bytes)
-            if old_value_bytes is None:
-                txn.put(k_bytes, c_pickle.dumps(v))
-                return None
-            return c_pickle.loads(old_value_bytes)
+            if old_value_bytes is not None:
+                return _loads(old_value_bytes)
+            txn.put(k_bytes, self._value_dumps()(v))
+        self._invalidate_stats([p])
+        return None
 
     def put_all(self, kv_list: Iterable):
+        self._check_cached()
         txn_map = {}
         _succ = True
-        for p in range(self._partitions):
-            env = self._get_env_for_partition(p)
-            txn = env.begin(write=True)
-            txn_map[p] = env, txn
-        for k, v in kv_list:
-            try:
-                k_bytes = c_pickle.dumps(k)
-                v_bytes = c_pickle.dumps(v)
-                p = _hash_key_to_partition(k_bytes, self._partitions)
-                _succ = _succ and txn_map[p][1].put(k_bytes, v_bytes)
-            except:
-                _succ = False
-                break
-        for p, (env, txn) in txn_map.items():
+        serialize, serialize_value = c_pickle.dumps, self._value_dumps()
+        try:
+            for chunk in chunks(kv_list):
+                k_bytes_list = [serialize(k) for k, _ in chunk]
+                partitions = hash_keys_to_partitions(k_bytes_list, self._partitions)
+                for p, k_bytes, (_, v) in zip(partitions.tolist(), k_bytes_list, chunk):
+                    # one write transaction per partition that actually receives keys
+                    if p not in txn_map:
+                        txn_map[p] = self._get_env_for_partition(p, write=True).begin(write=True)
+                    _succ = _succ and txn_map[p].put(k_bytes, serialize_value(v))
+                if not _succ:
+                    break
+        except:
+            _succ = False
+        for p, txn in txn_map.items():
             txn.commit() if _succ else txn.abort()
+        if _succ:
+            self._invalidate_stats(list(txn_map))
+
+    def load_file(self, path, parse=None, head=True, chunk_bytes=LOAD_CHUNK_BYTES, commit_rows=LOAD_COMMIT_ROWS,
+                  progress_path=None):
+        '''
+        Bulk loads a text file. Workers parse byte ranges of about chunk_bytes of the file, parse(line)
+        returning a (key, value) pair, and write the rows of a chunk to their partitions in transactions of
+        at most commit_rows rows. Loaded chunks are logged to progress_path, so a failed load resumes
+        where it stopped when it is run again. Returns the LoadStats, with the rows per second.
+
+        Of rows sharing a key, the last one of a chunk wins within that chunk. Chunks are written by the
+        workers as they finish, so across chunks the last writer wins with no ordering guarantee, a key
+        repeated in several chunks may keep the value of any of them.
+        '''
+        self.persist()
+        self._check_cached()
+        if parse is None:
+            parse = parser_of(path)
+        if progress_path is None:
+            progress_path = default_progress_path(self._namespace, self._name)
+        progress = LoadProgress(progress_path, path, chunk_bytes)
+        chunk_list = split_file(path, chunk_bytes, head)
+        _task_info = self._task_info_of(parse)
+        chunk_numbers = {c[0]: i for i, c in enumerate(chunk_list)}
+        pool = Standalone.get_instance().pool
+
+        def _submit(chunk):
+            _op = _Operand(self._type, self._namespace, self._name, chunk_numbers[chunk[0]])
+            return pool.submit(do_load_chunk, _LoadProcess(_task_info, _op, self._partitions, os.path.abspath(path),
+                                                           chunk, commit_rows))
+
+        try:
+            return run_load(path, chunk_list, progress, _submit)
+        finally:
+            # chunks of a failed load are committed as well
+            self._invalidate_stats(range(self._partitions))
 
     def get(self, k):
         k_bytes = c_pickle.dumps(k)
         p = _hash_key_to_partition(k_bytes, self._partitions)
         env = self._get_env_for_partition(p)
-        with env.begin(write=True) as txn:
+        with env.begin() as txn:
             old_value_bytes = txn.get(k_bytes)
-            return None if old_value_bytes is None else c_pickle.loads(old_value_bytes)
+            return None if old_value_bytes is None else _loads(old_value_bytes)
+
+    def get_all(self, keys):
+        '''
+        Values of keys in input order, None for missing keys. Keys are grouped by partition and every
+        partition is read in key order within a single read-only transaction.
+        '''
+        k_bytes_list = [c_pickle.dumps(k) for k in keys]
+        indexes_by_partition = {}
+        for i, p in enumerate(hash_keys_to_partitions(k_bytes_list, self._partitions).tolist()):
+            indexes_by_partition.setdefault(p, []).append(i)
+        rtn = [None] * len(k_bytes_list)
+        deserialize = _loads
+        for p, indexes in indexes_by_partition.items():
+            env = self._get_env_for_partition(p)
+            with env.begin() as txn:
+                for i in sorted(indexes, key=k_bytes_list.__getitem__):
+                    v_bytes = txn.get(k_bytes_list[i])
+                    rtn[i] = None if v_bytes is None else deserialize(v_bytes)
+        return rtn
 
     def destroy(self):
+        Standalone.get_instance().tracker.untrack(self)
+        self.unpin()
+        self.unpersist()
+        _codecs.pop(self._key(), None)
+        if self._pipeline is not None:
+            self._pipeline = None
+            self._depends_on = []
+            return
         for p in range(self._partitions):
-            env = self._get_env_for_partition(p)
+            env = self._get_env_for_partition(p, write=True)
             db = env.open_db()
             with env.begin(write=True) as txn:
                 txn.drop(db)
+        if self._type == StoreType.IN_MEMORY.value:
+            # lmdb never shrinks its file, the tmpfs pages are released once the partitions are unlinked
+            _table_path = _get_memory_path(self._type, self._namespace, self._name)
+            for p in range(self._partitions):
+                _env_pool.close(os.sep.join([_table_path, str(p)]))
+            shutil.rmtree(_table_path, ignore_errors=True)
         _table_key = ".".join([self._type, self._namespace, self._name])
         Standalone.get_instance().meta_table.delete(_table_key)
-
-    def collect(self):
+        Standalone.get_instance().stats_catalog.drop(_table_key)
+        _table_partitions.pop(_table_key, None)
+
+    def collect(self, ordered=True):
+        '''
+        Iterates over all (key, value) pairs. Ordered iteration merges the partitions by key, unordered
+        iteration reads them one after another and skips the merge.
+        '''
         iterators = []
         for p in range(self._partitions):
             env = self._get_env_for_partition(p)
             txn = env.begin()
             iterators.append(txn.cursor())
-        return self._merge(iterators)
+        return self._hold(self._merge(iterators) if ordered else self._chain(iterators))
+
+    def pin(self):
+        '''
+        Keeps the environments of this table open in the driver and the workers until unpin or destroy.
+        '''
+        _env_pool.pin(_get_table_path(self._type, self._namespace, self._name))
+        return self
+
+    def unpin(self):
+        _env_pool.unpin(_get_table_path(self._type, self._namespace, self._name))
+        return self
+
+    def _hold(self, iterator):
+        # the generator references the table, so it is not reclaimed while its cursors are read
+        yield from iterator
+
+    def checkpoint(self, name=None, namespace=None):
+        '''
+        Excludes the table from automatic cleanup. With a name, the table is copied to a persistent
+        table that outlives the job and the copy is returned.
+        '''
+        if name is None:
+            Standalone.get_instance().tracker.untrack(self.persist())
+            return self
+        if namespace is None:
+            namespace = Standalone.get_instance().job_id
+        return self.save_as(name, namespace)
 
     def save_as(self, name, namespace, partition=None):
         if partition is None:
             partition = self._partitions
-        dup = Standalone.get_instance().table(name, namespace, partition, persistent=True)
+        dup = self._inherit_codec(Standalone.get_instance().table(name, namespace, partition, persistent=True))
         dup.put_all(self.collect())
         return dup
 
@@ -410,7 +1591,7 @@ class _DTable(object):
         heapify(entries)
         while entries:
             key, value, _, it = entry = entries[0]
-            yield c_pickle.loads(key), c_pickle.loads(value)
+            yield _loads(key), _loads(value)
             if it.next():
                 entry[0], entry[1] = it.item()
                 heapreplace(entries, entry)
@@ -418,83 +1599,380 @@ class _DTable(object):
                 _, _, _, it = heappop(entries)
                 it.close()
 
+    @staticmethod
+    def _chain(cursors):
+        deserialize = _loads
+        for it in cursors:
+            for key, value in it:
+                yield deserialize(key), deserialize(value)
+            it.close()
+
+    def to_numpy(self, value_fn=None, ordered=True):
+        '''
+        Values, mapped by value_fn if given, as one array. Every worker builds the array of its partition
+        and returns it in a single transfer. Rows follow collect() order unless ordered is False.
+        '''
+        task_info = self._task_info_of((value_fn, ordered))
+        return concat_arrays([r.result() for r in self._submit_task_info(task_info, do_to_numpy)], ordered)
+
+    def values_as_array(self, ordered=True):
+        return self.to_numpy(ordered=ordered)
+
     @staticmethod
     def _serialize_and_hash_func(func):
         pickled_function = f_pickle.dumps(func)
         func_id = str(uuid.uuid1())
         return func_id, pickled_function
 
+    @staticmethod
+    def _task_info_of(func):
+        '''
+        Stores the pickled function once per job, tasks only carry its id and every worker
+        deserializes it on first use.
+        '''
+        func_id, pickled_function = _DTable._serialize_and_hash_func(func)
+        Standalone.get_instance().function_table.put(func_id, pickled_function)
+        return _TaskInfo(Standalone.get_instance().job_id, func_id, None)
+
     def _submit_to_pool(self, func, _do_func):
-        func_id, pickled_function = self._serialize_and_hash_func(func)
-        _task_info = _TaskInfo(Standalone.get_instance().job_id, func_id, pickled_function)
+        _task_info = self._task_info_of(func)
+        return self._submit_task_info(_task_info, _do_func)
+
+    def _submit_task_info(self, task_info: _TaskInfo, _do_func, splittable=False):
+        '''
+        One task per partition. With splittable, partitions holding more than their share of rows run as
+        several key range tasks, which idle workers take up.
+        '''
+        source, stages = self._pipeline if self._pipeline is not None else (self, [])
+        key_ranges = self._key_ranges(source, stages) if splittable else [[None]] * self._partitions
+        processes = []
+        for p, ranges in enumerate(key_ranges):
+            _op = _Operand(source._type, source._namespace, source._name, p)
+            for key_range in ranges:
+                _p = _UnaryProcess(task_info, _op, stages)
+                _p._key_range = key_range
+                processes.append(_p)
+        timer = _OperationTimer("{} {}.{}".format(_do_func.__name__, self._namespace, self._name), len(processes),
+                                sum(1 for ranges in key_ranges if len(ranges) > 1))
+        pool = Standalone.get_instance().pool
+        return [timer.submit(pool, _do_func, _p) for _p in processes]
+
+    def _key_ranges(self, source, stages):
+        # partitions cached by workers stay with them, sampled partitions draw their rows per partition
+        if source._key() in _storage_levels or any(stage._kind == 'sample' for stage in stages):
+            return [[None]] * self._partitions
+        envs = [_get_env(source._type, source._namespace, source._name, str(p)) for p in range(self._partitions)]
+        counts = [env.stat()['entries'] for env in envs]
+        parallelism = Standalone.get_instance().parallelism
+        share = max(sum(counts) / max(self._partitions, parallelism), SPLIT_MIN_ROWS)
+        rtn = []
+        for env, rows in zip(envs, counts):
+            pieces = min(int(math.ceil(rows / share)), parallelism)
+            if pieces < 2:
+                rtn.append([None])
+                continue
+            with env.begin() as txn:
+                bounds = [None] + split_keys(txn, rows, pieces) + [None]
+            rtn.append(list(zip(bounds[:-1], bounds[1:])))
+        return rtn
+
+    def _then(self, kind, task_info: _TaskInfo, other=None):
+        return self._computed(self._pending(kind, task_info, other))
+
+    def _pending(self, kind, task_info: _TaskInfo, other=None):
+        source, stages = self._pipeline if self._pipeline is not None else (self, [])
+        stage = _Stage(kind, task_info, None if other is None else (other._type, other._namespace, other._name))
+        rtn = _DTable(StoreType.IN_MEMORY.value, task_info._task_id, task_info._function_id, self._partitions,
+                      pipeline=(source, stages + [stage]))
+        rtn._depends_on = self._depends_on + ([] if other is None else [other])
+        return self._derived(rtn)
+
+    @staticmethod
+    def _computed(rtn):
+        if not Standalone.get_instance().lazy:
+            rtn.persist()
+        return rtn
+
+    def _persist_async(self):
+        if self._pipeline is None:
+            return DTableFuture.completed(self)
+        _task_info = _TaskInfo(self._namespace, self._name, None)
+
+        def _stored(_):
+            self._pipeline = None
+            self._depends_on = []
+            Standalone.get_instance().table(self._name, self._namespace, self._partitions, persistent=False)
+            return self
+
+        return DTableFuture(self._submit_task_info(_task_info, do_pipeline, splittable=True), _stored)
+
+    def persist(self, level: StorageLevel = None):
+        '''
+        Computes a pending table into storage. With MEMORY_ONLY or MEMORY_AND_DISK, the worker running
+        the tasks of a partition also keeps it deserialized for later tasks, DISK_ONLY releases it again.
+        '''
+        self._persist_async().result()
+        if level == StorageLevel.DISK_ONLY:
+            self.unpersist()
+        elif level is not None:
+            _storage_levels[(self._type, self._namespace, self._name)] = level
+        return self
+
+    def cache(self):
+        return self.persist(StorageLevel.MEMORY_ONLY)
+
+    def unpersist(self):
+        if _storage_levels.pop((self._type, self._namespace, self._name), None) is not None:
+            self._uncache()
+        return self
+
+    def _uncache(self):
+        table_key = (self._type, self._namespace, self._name)
+        for r in Standalone.get_instance().pool.submit_all(do_uncache, table_key):
+            r.result()
+
+    def _check_cached(self):
+        # a write makes the partitions the workers keep stale, they are read again on the next task
+        if (self._type, self._namespace, self._name) in _storage_levels:
+            self._uncache()
+
+    def _shuffle(self, task_info: _TaskInfo, _do_func, partitions):
+        source, stages = self._pipeline if self._pipeline is not None else (self, [])
+        pool = Standalone.get_instance().pool
         results = []
         for p in range(self._partitions):
-            _op = _Operand(self._type, self._namespace, self._name, p)
-            _p = _UnaryProcess(_task_info, _op)
-            results.append(Standalone.get_instance().pool.submit(_do_func, _p))
-        return results
+            _op = _Operand(source._type, source._namespace, source._name, p)
+            results.append(pool.submit(_do_func, _ShuffleProcess(task_info, _op, stages, partitions)))
+        stats = _ShuffleStats()
+        for r in results:
+            stats += r.result()
+        results = []
+        for p in range(partitions):
+            _op = _Operand(StoreType.IN_MEMORY.value, task_info._task_id, task_info._function_id, p)
+            results.append(pool.submit(do_shuffle_merge, _UnaryProcess(task_info, _op)))
+        for r in results:
+            r.result()
+        shutil.rmtree(_get_db_path('__SHUFFLE__', task_info._task_id, task_info._function_id), ignore_errors=True)
+        LOGGER.info("shuffle {} to {} partitions, {}".format(task_info._function_id, partitions, stats))
+        rtn = Standalone.get_instance().table(task_info._function_id, task_info._task_id, partitions, persistent=False)
+        return self._derived(rtn)
 
     def map(self, func):
-        results = self._submit_to_pool(func, do_map)
-        for r in results:
-            result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        _task_info = self._task_info_of(func)
+        return self._shuffle(_task_info, do_map, self._partitions)
+
+    def repartition(self, partitions):
+        '''
+        Redistributes the rows over `partitions` partitions. Workers move the serialized rows through
+        the shuffle, nothing is deserialized or passes through the driver.
+        '''
+        if partitions == self._partitions:
+            return self
+        _task_info = _TaskInfo(Standalone.get_instance().job_id, str(uuid.uuid1()), None)
+        return self._shuffle(_task_info, do_repartition, partitions)
 
     def mapValues(self, func):
-        results = self._submit_to_pool(func, do_map_values)
-        for r in results:
-            result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        _task_info = self._task_info_of(func)
+        return self._then('mapValues', _task_info)
+
+    def map_values_async(self, func):
+        '''
+        DTableFuture of mapValues(func), computed whether or not the eggroll is lazy.
+        '''
+        return self._pending('mapValues', self._task_info_of(func))._persist_async()
 
     def mapPartitions(self, func):
         results = self._submit_to_pool(func, do_map_partitions)
         for r in results:
             result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        rtn = Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        return Standalone.get_instance().tracker.track(rtn)
+
+    def map_partitions_to_pairs(self, func, preserves_partitioning=False):
+        '''
+        func turns the (key, value) iterator of a partition into an iterable of (key, value) pairs, which
+        are written to a new table. Pairs are shuffled to the partitions of their keys, unless
+        preserves_partitioning promises that func only emits keys of the partition it reads.
+        '''
+        _task_info = self._task_info_of(func)
+        if not preserves_partitioning:
+            return self._shuffle(_task_info, do_map_partitions_to_pairs, self._partitions)
+        for r in self._submit_task_info(_task_info, do_map_partitions_in_place):
+            r.result()
+        rtn = Standalone.get_instance().table(_task_info._function_id, _task_info._task_id, self._partitions,
+                                              persistent=False)
+        return self._derived(rtn)
+
+    def flat_map(self, func):
+        '''
+        func maps a key and value to an iterable of (key, value) pairs, all pairs make up the new table.
+        '''
+        return self._shuffle(self._task_info_of(func), do_flat_map, self._partitions)
 
     def reduce(self, func):
-        rs = [r.result() for r in self._submit_to_pool(func, do_reduce)]
-        rs = [r for r in filter(partial(is_not, None), rs)]
-        if len(rs) <= 0:
-            return None
-        rtn = rs[0]
-        for r in rs[1:]:
-            rtn = func(rtn, r)
+        return self.reduce_async(func).result()
+
+    def reduce_async(self, func):
+        results = self._submit_task_info(self._task_info_of(func), do_reduce, splittable=True)
+        return DTableFuture(results, partial(combine_partials, func=func))
+
+    def aggregate(self, zero, seq_op, comb_op, depth=2):
+        '''
+        Folds every partition into a copy of zero with seq_op, then merges the partition results with
+        comb_op in a tree of depth levels. Both functions may mutate and return their first argument.
+        '''
+        task_info = self._task_info_of((dump_zero(zero), seq_op))
+        return self._tree_combine(self._submit_task_info(task_info, do_aggregate), task_info, comb_op, depth)
+
+    def tree_reduce(self, func, depth=2):
+        task_info = self._task_info_of(func)
+        return self._tree_combine(self._submit_task_info(task_info, do_tree_reduce), task_info, func, depth)
+
+    def _tree_combine(self, results, partials_info: _TaskInfo, comb_op, depth):
+        keys = [k for k in (r.result() for r in results) if k is not None]
+        comb_info = self._task_info_of(comb_op)
+        scale = tree_scale(len(keys), depth)
+        pool = Standalone.get_instance().pool
+        while len(keys) > 1:
+            groups = [keys[i:i + scale] for i in range(0, len(keys), scale)]
+            results = [pool.submit(do_combine, _CombineProcess(comb_info, partials_info, g)) for g in groups]
+            keys = [r.result() for r in results]
+        partials = _get_partials(partials_info)
+        rtn = partials.get(keys[0]) if keys else None
+        partials.destroy()
         return rtn
 
+    def take_sample(self, n, seed=None):
+        '''
+        Exactly min(n, count) rows drawn uniformly without replacement, as a list of (key, value) pairs.
+        Every worker keeps a reservoir of n serialized rows of its partition, only the rows drawn from the
+        reservoirs are deserialized by the driver.
+        '''
+        _task_info = _TaskInfo(Standalone.get_instance().job_id, str(uuid.uuid1()), c_pickle.dumps((n, seed)))
+        parts = [r.result() for r in self._submit_task_info(_task_info, do_take_sample)]
+        rows = merge_samples([(count, reservoir) for count, reservoir, _ in parts], n, np.random.RandomState(seed))
+        # every partition runs the same stages, so values are either all serialized or none
+        raw = parts[0][2] if parts else True
+        deserialize = _loads
+        return [(deserialize(k), deserialize(v) if raw else v) for k, v in rows]
+
     def glom(self):
         results = self._submit_to_pool(None, do_glom)
         for r in results:
             result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        rtn = Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+        return Standalone.get_instance().tracker.track(rtn)
 
     def join(self, other, func):
-        _job_id = Standalone.get_instance().job_id
+        return self._computed(self._pending_join(other, func))
+
+    def join_async(self, other, func):
+        '''
+        DTableFuture of join(other, func). A pending other table, and a repartition when the partition
+        counts differ, are computed before this returns.
+        '''
+        return self._pending_join(other, func)._persist_async()
+
+    def _pending_join(self, other, func):
+        side = broadcast_side(self._known_stats(), other._known_stats(), BROADCAST_JOIN_MAX_ROWS,
+                              BROADCAST_JOIN_MAX_BYTES)
+        if side is not None:
+            small, large = (other, self) if side == 'right' else (self, other)
+            rows = small._broadcast_rows()
+            rtn = large._pending('broadcast_join', self._task_info_of((_TableBroadcast(rows), side == 'left', func)))
+            # the rows are reclaimed once the join is in storage and no pending table reads them any more
+            rtn._depends_on.append(rows)
+            return rtn
         if other._partitions != self._partitions:
-            if other.count() > self.count():
-                return self.save_as(str(uuid.uuid1()), _job_id, partition=other._partitions).join(other,
-                                                                                                  func)
-            else:
-                return self.join(other.save_as(str(uuid.uuid1()), _job_id, partition=self._partitions),
-                                 func)
-        func_id, pickled_function = self._serialize_and_hash_func(func)
-        _task_info = _TaskInfo(_job_id, func_id, pickled_function)
-        results = []
+            # the larger side keeps its partitions, a pending left side is never computed just to count it
+            if self._pipeline is None and other.count() > self.count():
+                return self.repartition(other._partitions)._pending_join(other, func)
+            return self._pending_join(other.repartition(self._partitions), func)
+        other.persist()
+        return self._pending('join', self._task_info_of(func), other=other)
+
+    def _known_stats(self):
+        # stats that need no pending stage to run, None otherwise
+        if self._pipeline is not None and any(stage._kind != 'mapValues' for stage in self._pipeline[1]):
+            return None
+        return self.stats()
+
+    def _broadcast_rows(self):
+        '''
+        Intermediate table holding a dict from the serialized keys to the values of this table. Each worker
+        loads it once and keeps it while it is among the latest broadcasts it used.
+        '''
+        self.persist()
+        rows = {}
+        deserialize = _loads
         for p in range(self._partitions):
-            _left = _Operand(self._type, self._namespace, self._name, p)
-            _right = _Operand(other._type, other._namespace, other._name, p)
-            _p = _BinaryProcess(_task_info, _left, _right)
-            results.append(Standalone.get_instance().pool.submit(do_join, _p))
-        for r in results:
-            result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
+            with self._get_env_for_partition(p).begin() as txn:
+                rows.update((k_bytes, deserialize(v_bytes)) for k_bytes, v_bytes in txn.cursor())
+        return Standalone.get_instance().parallelize([(0, rows)], include_key=True, partition=1)
+
+    def filter(self, func):
+        '''
+        Rows for which func(key, value) is true, their values are copied to the new table as stored.
+        '''
+        return self._then('filter', self._task_info_of(func))
+
+    def semi_join(self, other):
+        '''
+        Rows whose keys are in other, whatever their values there.
+        '''
+        return self._then_keys_of('semi_join', other)
+
+    def subtract_by_key(self, other):
+        '''
+        Rows whose keys are not in other.
+        '''
+        return self._then_keys_of('subtract_by_key', other)
+
+    def _then_keys_of(self, kind, other):
+        other = other.repartition(self._partitions)
+        other.persist()
+        _task_info = _TaskInfo(Standalone.get_instance().job_id, str(uuid.uuid1()), None)
+        return self._then(kind, _task_info, other=other)
 
     def sample(self, fraction, seed=None):
-        results = self._submit_to_pool((fraction, seed), do_sample)
+        _task_info = _TaskInfo(Standalone.get_instance().job_id, str(uuid.uuid1()), c_pickle.dumps((fraction, seed)))
+        return self._then('sample', _task_info)
+
+    def set_codec(self, codec=None, level=None, dictionary=False):
+        '''
+        Compresses the values written to this table from now on, and to the tables computed from it, with
+        codec ('none', 'zlib', 'lz4' or 'zstd', the best installed one by default). With dictionary, one is
+        trained from a sample of the stored values. Values already stored are read as they are.
+        '''
+        codec = default_codec() if codec is None else codec
+        _dictionary = None
+        if dictionary and codec != 'none':
+            samples = [c_pickle.dumps(v) for _, v in self.take_sample(DICTIONARY_SAMPLES)]
+            _dictionary = train_dictionary(samples)
+        _codec = Codec(codec, level, _dictionary)
+        if _dictionary is not None:
+            Standalone.get_instance().dictionary_table.put(_codec._dict_id, _dictionary)
+        if codec == 'none':
+            _codecs.pop(self._key(), None)
+        else:
+            _codecs[self._key()] = _codec
+        return self
+
+    def codec_stats(self):
+        '''
+        CodecStats of the stored values: raw and stored bytes, and the CPU seconds to decode them and to
+        encode them again with the codec of the table.
+        '''
+        self.persist()
+        codec = _codecs.get(self._key())
+        pool = Standalone.get_instance().pool
+        results = []
+        for p in range(self._partitions):
+            _p = _UnaryProcess(_TaskInfo(Standalone.get_instance().job_id, None, None), _Operand(*self._key(), p))
+            results.append(pool.submit(do_codec_stats, _p))
+        stats = CodecStats()
         for r in results:
-            result = r.result()
-        return Standalone.get_instance().table(result._name, result._namespace, self._partitions, persistent=False)
-
-
-
-
+            stats += r.result()
+        LOGGER.info("codec {} of table {}.{}: {}".format(codec.name if codec else 'none', self._namespace, self._name,
+                                                         stats))
+        return stats
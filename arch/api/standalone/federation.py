@@ -116,6 +116,8 @@ class FederationRuntime(object):
                                                         _partyId)
                 _status_table = _get_meta_table(STATUS_TABLE_NAME, self.job_id)
                 if isinstance(obj, _DTable):
+                    # the receiving party reads the table after this handle may be gone
+                    obj.checkpoint()
                     _status_table.put(_tagged_key, (obj._type, obj._name, obj._namespace, obj._partitions))
                 else:
                     _table = _get_meta_table(OBJECT_STORAGE_NAME, self.job_id)
@@ -156,7 +158,7 @@ class FederationRuntime(object):
         _object_table = _get_meta_table(OBJECT_STORAGE_NAME, self.job_id)
         for r in results:
             if isinstance(r, tuple):
-                _persistent = r[0] == StoreType.LMDB
+                _persistent = r[0] == StoreType.LMDB.value
                 rtn.append(
                     Standalone.get_instance().table(name=r[1], namespace=r[2], persistent=_persistent, partition=r[3]))
             else:
@@ -0,0 +1,57 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import pickle
+import unittest
+
+from arch.api.utils import codec_utils, eggroll_serdes
+
+
+class TestCodecUtils(unittest.TestCase):
+    def test_round_trip(self):
+        value = pickle.dumps(['ciphertext', 'public key ' * 50, list(range(100))])
+        for name in codec_utils.available_codecs():
+            codec = codec_utils.Codec(name)
+            encoded = codec.encode(value)
+            self.assertEqual(codec_utils.decode(encoded), value)
+            self.assertEqual(codec_utils.is_encoded(encoded), name != 'none')
+        small = pickle.dumps(1)
+        self.assertEqual(codec_utils.Codec('zlib').encode(small), small)
+        self.assertEqual(eggroll_serdes.get_serdes().deserialize(codec_utils.Codec('zlib').encode(value)),
+                         pickle.loads(value))
+
+    def test_dictionary(self):
+        samples = [pickle.dumps({'id': i, 'key': 'public key'}) for i in range(100)]
+        dictionary = codec_utils.train_dictionary(samples)
+        codec = codec_utils.Codec('zlib', dictionary=dictionary)
+        value = pickle.dumps({'id': 1000, 'key': 'public key', 'other': 'x' * 40})
+        encoded = codec.encode(value)
+        self.assertLess(len(encoded), len(codec_utils.Codec('zlib').encode(value)))
+        self.assertEqual(codec_utils.decode(encoded), value)
+        restored = pickle.loads(pickle.dumps(codec))
+        self.assertEqual(restored.encode(value), encoded)
+
+    def test_measure(self):
+        codec = codec_utils.Codec('zlib')
+        stored = [codec.encode(pickle.dumps('value ' * 100)) for _ in range(10)]
+        stats = codec_utils.measure(stored, codec)
+        self.assertEqual(stats.values, 10)
+        self.assertGreater(stats.ratio, 5)
+        self.assertEqual((stats + stats).stored_bytes, 2 * stats.stored_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import hashlib
+import pickle
+import unittest
+
+from arch.api.utils import hash_utils
+
+
+class TestHashUtils(unittest.TestCase):
+    def setUp(self):
+        self.keys = [pickle.dumps(k) for k in list(range(2000)) + ["id_{}".format(i) for i in range(2000)]]
+
+    def test_batch_jump_hash(self):
+        for partitions in [1, 2, 7, 16, 100]:
+            batch = hash_utils.hash_keys_to_partitions(self.keys, partitions).tolist()
+            self.assertListEqual(batch, [hash_utils.hash_key_to_partition(k, partitions) for k in self.keys])
+            self.assertTrue(all(0 <= p < partitions for p in batch))
+
+    def test_batch_mod_hash(self):
+        for partitions in [1, 3, 10]:
+            expected = [int.from_bytes(hashlib.sha1(k).digest(), byteorder='little') % partitions for k in self.keys]
+            self.assertListEqual(hash_utils.hash_keys_mod(self.keys, partitions).tolist(), expected)
+            self.assertListEqual([hash_utils.hash_key_mod(k, partitions) for k in self.keys], expected)
+
+    def test_invalid_partitions(self):
+        with self.assertRaises(ValueError):
+            hash_utils.hash_keys_to_partitions(self.keys, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
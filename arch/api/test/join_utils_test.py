@@ -0,0 +1,46 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import unittest
+
+from arch.api.utils.broadcast_utils import Broadcast
+from arch.api.utils.join_utils import broadcast_side
+from arch.api.utils.pair_utils import broadcast_join_partition
+from arch.api.utils.stats_utils import TableStats
+
+
+class TestJoinUtils(unittest.TestCase):
+    def test_broadcast_side(self):
+        small, large = TableStats(1, [10], [1 << 10]), TableStats(2, [10 ** 6, 10 ** 6], [1 << 30, 1 << 30])
+        self.assertEqual(broadcast_side(large, small), 'right')
+        self.assertEqual(broadcast_side(small, large), 'left')
+        self.assertEqual(broadcast_side(small, None), 'left')
+        self.assertEqual(broadcast_side(small, TableStats(1, [10])), None)
+        self.assertEqual(broadcast_side(TableStats(1, [5]), small), 'left')
+        self.assertEqual(broadcast_side(large, TableStats(2, [10, None])), None)
+        self.assertEqual(broadcast_side(large, small, max_bytes=1 << 9), None)
+        self.assertEqual(broadcast_side(large, large), None)
+
+    def test_broadcast_join_partition(self):
+        broadcast = Broadcast({1: 'a', 3: 'c'})
+        rows = [(1, 10), (2, 20), (3, 30)]
+        self.assertEqual(list(broadcast_join_partition(rows, broadcast, lambda a, b: (a, b), False)),
+                         [(1, (10, 'a')), (3, (30, 'c'))])
+        self.assertEqual(list(broadcast_join_partition(rows, broadcast, lambda a, b: (a, b), True)),
+                         [(1, ('a', 10)), (3, ('c', 30))])
+
+
+if __name__ == '__main__':
+    unittest.main()
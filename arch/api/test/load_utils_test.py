@@ -0,0 +1,53 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import os
+import tempfile
+import unittest
+
+from arch.api.utils import load_utils
+
+
+class TestLoadUtils(unittest.TestCase):
+    def _rows(self, path, chunk_bytes, head=True):
+        parse = load_utils.parser_of(path)
+        return [parse(line) for chunk in load_utils.split_file(path, chunk_bytes, head)
+                for line in load_utils.read_lines(path, chunk)]
+
+    def test_quoted_line_ends(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rows.csv")
+            with open(path, 'w', newline='') as f:
+                f.write("id,\"note\nof the row\"\r\n")
+                for i in range(200):
+                    f.write("{},\"line {}\nnext line, \"\"quoted\"\"\"\r\n".format(i, i))
+            expected = [(str(i), "line {}\nnext line, \"quoted\"".format(i)) for i in range(200)]
+            for chunk_bytes in (1, 7, 100, 1 << 20):
+                self.assertEqual(self._rows(path, chunk_bytes), expected)
+
+    def test_line_ends(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rows.txt")
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                for i in range(100):
+                    f.write("{}\ta\x0bb c\x1c\x85\r\n\n".format(i))
+            expected = [(str(i), "a\x0bb c\x1c\x85") for i in range(100)]
+            for chunk_bytes in (1, 50, 1 << 20):
+                self.assertEqual(self._rows(path, chunk_bytes, head=False), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import unittest
+
+from arch.api.utils import partition_utils
+
+
+class TestPartitionUtils(unittest.TestCase):
+    def test_suggest_partitions(self):
+        self.assertEqual(partition_utils.suggest_partitions(8, rows=100, size=1 << 10), 1)
+        self.assertEqual(partition_utils.suggest_partitions(8, rows=35000, size=1 << 20), 4)
+        self.assertEqual(partition_utils.suggest_partitions(8, rows=10 ** 7, size=1 << 30), 8)
+        self.assertEqual(partition_utils.suggest_partitions(8, rows=10 ** 8, size=10 << 30), 32)
+        self.assertEqual(partition_utils.suggest_partitions(2, rows=10 ** 8, size=2 << 30), 8)
+        self.assertEqual(partition_utils.suggest_partitions(8), 8)
+
+    def test_resolve_partitions(self):
+        self.assertEqual(partition_utils.resolve_partitions(3, 8, [1, 2]), (3, [1, 2]))
+        partitions, data = partition_utils.resolve_partitions(None, 2, (i for i in range(30000)))
+        self.assertEqual(partitions, 2)
+        self.assertEqual(list(data), list(range(30000)))
+        self.assertEqual(partition_utils.resolve_partitions(None, 4, list(range(100)))[0], 1)
+        try:
+            partition_utils.set_default_partitions(5)
+            self.assertEqual(partition_utils.resolve_partitions(None, 4, list(range(100)))[0], 5)
+        finally:
+            partition_utils.set_default_partitions(None)
+        self.assertRaises(ValueError, partition_utils.set_default_partitions, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import unittest
+
+import numpy as np
+
+from arch.api.utils import sample_utils
+
+
+class TestSampleUtils(unittest.TestCase):
+    def test_reservoir_sample(self):
+        random_state = np.random.RandomState(0)
+        self.assertEqual(sample_utils.reservoir_sample(range(5), 10, random_state), (5, [0, 1, 2, 3, 4]))
+        count, reservoir = sample_utils.reservoir_sample(range(10000), 10, random_state)
+        self.assertEqual(count, 10000)
+        self.assertEqual(len(set(reservoir)), 10)
+        self.assertEqual(sample_utils.reservoir_sample(range(7), 0, random_state), (7, []))
+
+    def test_uniform_merge(self):
+        random_state = np.random.RandomState(1)
+        partitions = [range(0, 10), range(10, 100), range(100, 130)]
+        hits = np.zeros(130)
+        for _ in range(2000):
+            parts = [sample_utils.reservoir_sample(p, 13, random_state) for p in partitions]
+            rows = sample_utils.merge_samples(parts, 13, random_state)
+            self.assertEqual(len(rows), 13)
+            self.assertEqual(len(set(rows)), 13)
+            hits[rows] += 1
+        # every row is drawn with probability 13 / 130
+        self.assertLess(np.abs(hits / 2000 - 0.1).max(), 0.04)
+
+    def test_sample_partition(self):
+        self.assertEqual(sample_utils.sample_partition(iter([]), 3, 7), (0, []))
+        count, reservoir = sample_utils.sample_partition(((i, i) for i in range(50)), 3, 7)
+        self.assertEqual(count, 50)
+        self.assertEqual(len(reservoir), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,425 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import gc
+import os
+import tempfile
+import unittest
+from operator import add
+
+import numpy as np
+
+from arch.api import eggroll, StorageLevel
+from arch.api.standalone.eggroll import Standalone, _EnvPool, _RoutedPool
+from arch.api.utils import load_utils
+from arch.api.utils.stats_utils import TableStats
+
+
+class TestStandaloneEggroll(unittest.TestCase):
+    def setUp(self):
+        eggroll.init("test_standalone_eggroll")
+
+    def tearDown(self):
+        Standalone.get_instance().lazy = False
+
+    def test_lazy_chain(self):
+        x = eggroll.parallelize(range(100), partition=4)
+        y = eggroll.parallelize(range(100), partition=4).mapValues(lambda v: v * 10)
+        expected = dict(x.mapValues(lambda v: v + 1).join(y, lambda a, b: a + b).sample(0.5, 7).collect())
+
+        Standalone.get_instance().lazy = True
+        z = x.mapValues(lambda v: v + 1).join(y, lambda a, b: a + b).sample(0.5, 7)
+        self.assertIsNotNone(z._pipeline)
+        self.assertEqual(len(z._pipeline[1]), 3)
+        self.assertEqual(dict(z.collect()), expected)
+        self.assertIsNone(z._pipeline)
+
+    def test_lazy_reduce_and_map_partitions(self):
+        Standalone.get_instance().lazy = True
+        x = eggroll.parallelize(range(10), partition=3).mapValues(lambda v: v * 2)
+        self.assertEqual(x.mapValues(lambda v: v + 1).reduce(add), 100)
+        sums = x.mapPartitions(lambda kvs: sum(v for _, v in kvs))
+        self.assertEqual(sum(v for _, v in sums.collect()), 90)
+        self.assertIsNotNone(x._pipeline)
+        self.assertEqual(x.persist().count(), 10)
+
+    def test_map_shuffle(self):
+        x = eggroll.parallelize(range(1000), partition=4)
+        y = x.map(lambda k, v: (k % 10, k % 10))
+        self.assertEqual(y._partitions, 4)
+        self.assertEqual(y.count(), 10)
+        self.assertEqual(dict(y.collect()), {i: i for i in range(10)})
+        for i in range(10):
+            self.assertEqual(y.get(i), i)
+        # duplicated keys keep the value mapped first, not the smallest one
+        x = eggroll.parallelize(range(1000), partition=1)
+        first = {}
+        for k, _ in x.collect():
+            first.setdefault(k % 10, 1000 - k)
+        self.assertEqual(dict(x.map(lambda k, v: (k % 10, 1000 - k)).collect()), first)
+
+    def test_broadcast(self):
+        lookup = eggroll.broadcast({i: i * i for i in range(10)})
+        x = eggroll.parallelize(range(10), partition=3)
+        self.assertEqual(dict(x.mapValues(lambda v: lookup.value[v]).collect()), {i: i * i for i in range(10)})
+        self.assertEqual(x.mapValues(lambda v: lookup.value[v]).reduce(add), 285)
+
+    def test_aggregate(self):
+        x = eggroll.parallelize(range(100), partition=7)
+
+        def seq_op(acc, v):
+            acc[v % 3] += v
+            return acc
+
+        def comb_op(acc, other):
+            for i in range(3):
+                acc[i] += other[i]
+            return acc
+
+        expected = [sum(v for v in range(100) if v % 3 == i) for i in range(3)]
+        self.assertEqual(x.aggregate([0, 0, 0], seq_op, comb_op), expected)
+        self.assertEqual(x.aggregate([0, 0, 0], seq_op, comb_op, depth=1), expected)
+        self.assertEqual(x.tree_reduce(add, depth=3), 4950)
+        self.assertIsNone(eggroll.parallelize([], partition=3).tree_reduce(add))
+
+    def test_get_all(self):
+        x = eggroll.table("test_get_all", "test_standalone_eggroll", partition=4, persistent=False)
+        x.put_all((i, str(i)) for i in range(100))
+        keys = [99, -1, 3, 50, 3]
+        self.assertEqual(x.get_all(keys), ['99', None, '3', '50', '3'])
+        self.assertEqual(x.get_all([]), [])
+        x.destroy()
+
+    def test_in_memory_placement(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(10), partition=2)
+        y = eggroll.parallelize(range(10), partition=2, name="test_in_memory_placement",
+                                namespace="test_standalone_eggroll", persistent=True)
+        x_path = os.path.join(instance.memory_dir, x._type, x._namespace, x._name)
+        self.assertTrue(os.path.isdir(x_path))
+        self.assertFalse(os.path.exists(os.path.join(instance.data_dir, x._type, x._namespace, x._name)))
+        self.assertTrue(os.path.isdir(os.path.join(instance.data_dir, y._type, y._namespace, y._name)))
+        self.assertEqual(dict(x.join(y, lambda a, b: a + b).collect()), {i: 2 * i for i in range(10)})
+        x.destroy()
+        y.destroy()
+        self.assertFalse(os.path.exists(x_path))
+
+    def test_repartition(self):
+        x = eggroll.parallelize(range(100), partition=3)
+        y = x.repartition(5)
+        self.assertEqual(y._partitions, 5)
+        self.assertEqual(dict(y.collect()), dict(x.collect()))
+        self.assertIs(x.repartition(3), x)
+
+        z = eggroll.parallelize(range(50), partition=4).mapValues(lambda v: v * 2)
+        self.assertEqual(dict(x.join(z, lambda a, b: a + b).collect()), {i: 3 * i for i in range(50)})
+        self.assertEqual(dict(z.join(x, lambda a, b: a + b).collect()), {i: 3 * i for i in range(50)})
+        Standalone.get_instance().lazy = True
+        pending = x.mapValues(lambda v: v + 1)
+        joined = pending.join(z, lambda a, b: a + b)
+        self.assertEqual(joined._partitions, 3)
+        self.assertEqual(dict(joined.collect()), {i: 3 * i + 1 for i in range(50)})
+
+    def test_unordered_collect_and_to_numpy(self):
+        x = eggroll.parallelize(range(100), partition=4)
+        self.assertEqual(sorted(x.collect(ordered=False)), list(enumerate(range(100))))
+        ordered_values = [v for _, v in x.collect()]
+        self.assertTrue(np.array_equal(x.values_as_array(), np.asarray(ordered_values)))
+        self.assertEqual(sorted(x.values_as_array(ordered=False).tolist()), list(range(100)))
+        rows = x.to_numpy(lambda v: [v, v * 2])
+        self.assertEqual(rows.shape, (100, 2))
+        self.assertTrue(np.array_equal(rows[:, 1], rows[:, 0] * 2))
+        self.assertEqual(eggroll.parallelize([], partition=2).values_as_array().shape, (0,))
+
+    def test_env_pool(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(100), partition=4).pin()
+        try:
+            instance.configure_env_pool(max_envs=2)
+            before = instance.env_pool_stats()
+            for i in range(3):
+                self.assertEqual(x.mapValues(lambda v: v + i).reduce(add), 4950 + 100 * i)
+            stats = instance.env_pool_stats()
+            self.assertGreater(stats['evictions'], before['evictions'])
+            self.assertGreaterEqual(stats['envs'], 4)
+            self.assertEqual(stats['pinned'], 1)
+            self.assertGreater(stats['all_processes']['misses'], before['all_processes']['misses'])
+        finally:
+            instance.configure_env_pool(max_envs=256)
+            x.destroy()
+        self.assertEqual(instance.env_pool_stats()['pinned'], 0)
+
+    def test_env_pool_one_env_per_path(self):
+        opened = []
+
+        def opener(path, write, map_size):
+            opened.append(write)
+            return object()
+
+        pool = _EnvPool()
+        reader = pool.open('p', False, opener)
+        self.assertIs(pool.open('p', False, opener), reader)
+        writer = pool.open('p', True, opener)
+        self.assertIsNot(writer, reader)
+        self.assertIs(pool.open('p', False, opener), writer)
+        self.assertIs(pool.open('p', True, opener), writer)
+        self.assertEqual(opened, [False, True])
+        self.assertEqual(pool.stats()['envs'], 1)
+
+    def test_take_sample(self):
+        x = eggroll.parallelize(range(1000), partition=4)
+        rows = x.take_sample(37, seed=3)
+        self.assertEqual(len(rows), 37)
+        self.assertEqual(len(set(k for k, _ in rows)), 37)
+        self.assertTrue(all(k == v for k, v in rows))
+        self.assertEqual(rows, x.take_sample(37, seed=3))
+        self.assertEqual(sorted(x.take_sample(2000)), list(enumerate(range(1000))))
+        self.assertTrue(all(v == 2 * k for k, v in x.mapValues(lambda v: v * 2).take_sample(5)))
+        self.assertEqual(eggroll.parallelize([], partition=2).take_sample(3), [])
+
+    def test_map_partitions_to_pairs(self):
+        x = eggroll.parallelize(range(100), partition=4)
+        y = x.map_partitions_to_pairs(lambda kvs: ((k % 10, v) for k, v in kvs if k < 10))
+        self.assertEqual(dict(y.collect()), {i: i for i in range(10)})
+        self.assertEqual(y.get(3), 3)
+        z = x.map_partitions_to_pairs(lambda kvs: ((k, v * 2) for k, v in kvs), preserves_partitioning=True)
+        self.assertEqual(z._partitions, 4)
+        self.assertEqual(dict(z.collect()), {i: 2 * i for i in range(100)})
+        self.assertEqual(z.get(42), 84)
+        w = x.flat_map(lambda k, v: [(k, v), (k + 100, -v)] if k < 50 else [])
+        self.assertEqual(w.count(), 100)
+        self.assertEqual(dict(w.collect()), dict([(i, i) for i in range(50)] + [(i + 100, -i) for i in range(50)]))
+
+    def test_filter_and_key_joins(self):
+        x = eggroll.parallelize(range(100), partition=4).mapValues(lambda v: [v])
+        keys = eggroll.parallelize([(i, None) for i in range(0, 120, 3)], include_key=True, partition=3)
+        self.assertEqual(dict(x.filter(lambda k, v: k % 2 == 0 and v[0] < 50).collect()),
+                         {i: [i] for i in range(0, 50, 2)})
+        self.assertEqual(dict(x.semi_join(keys).collect()), {i: [i] for i in range(0, 100, 3)})
+        self.assertEqual(dict(x.subtract_by_key(keys).collect()), {i: [i] for i in range(100) if i % 3 != 0})
+        self.assertEqual(x.semi_join(keys)._partitions, 4)
+
+        Standalone.get_instance().lazy = True
+        y = x.filter(lambda k, v: k < 60).subtract_by_key(keys).mapValues(lambda v: v[0])
+        self.assertEqual(len(y._pipeline[1]), 3)
+        self.assertEqual(y.reduce(add), sum(i for i in range(60) if i % 3 != 0))
+        keys.persist(StorageLevel.MEMORY_ONLY)
+        try:
+            self.assertEqual(x.semi_join(keys).count(), 34)
+        finally:
+            keys.unpersist()
+
+    def test_merge_join(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(0, 400, 2), partition=2).mapValues(lambda v: [v])
+        y = eggroll.parallelize(range(300), partition=2, name="test_merge_join",
+                                namespace="test_standalone_eggroll", persistent=True)
+        expected = dict(x.join(y, lambda a, b: a[0] + b).collect())
+        try:
+            instance.configure_merge_join(min_rows=10)
+            instance.configure_broadcast_join(max_rows=0)
+            before = instance.join_stats()
+            self.assertEqual(dict(x.join(y, lambda a, b: a[0] + b).collect()), expected)
+            self.assertEqual(expected, {i: 3 * i for i in range(200)})
+            stats = instance.join_stats()
+            self.assertEqual(stats['merge_joins'], before['merge_joins'] + 2)
+            self.assertGreater(stats['lookups_avoided'], before['lookups_avoided'])
+            self.assertEqual(dict(x.join(x, lambda a, b: a + b).collect()), {i: [2 * i, 2 * i] for i in range(200)})
+            self.assertEqual(instance.join_stats(), stats)
+        finally:
+            instance.configure_merge_join(min_rows=1 << 16)
+            instance.configure_broadcast_join(max_rows=1 << 16)
+            y.destroy()
+
+    def test_split_skewed_partitions(self):
+        instance = Standalone.get_instance()
+        pool, instance.pool = instance.pool, _RoutedPool(slots=4)
+        x = eggroll.parallelize(range(1000), partition=1)
+        try:
+            instance.configure_task_splitting(min_rows=100)
+            self.assertEqual(dict(x.mapValues(lambda v: v + 1).collect()), {i: i + 1 for i in range(1000)})
+            self.assertEqual(x.filter(lambda k, v: v % 2 == 0).reduce(add), sum(range(0, 1000, 2)))
+            stats = instance.straggler_stats()[-2:]
+            self.assertEqual([s['split_partitions'] for s in stats], [1, 1])
+            self.assertEqual([s['tasks'] for s in stats], [4, 4])
+            self.assertTrue(all(s['max_seconds'] >= s['median_seconds'] for s in stats))
+        finally:
+            instance.configure_task_splitting(min_rows=1 << 16)
+            for executor in instance.pool._slots:
+                executor.shutdown()
+            instance.pool = pool
+
+    def test_stats(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(100), partition=3)
+        stats = x.stats()
+        self.assertEqual(stats.rows, 100)
+        self.assertEqual(len(stats.partition_rows), 3)
+        self.assertGreater(stats.bytes, 0)
+        self.assertIsNotNone(stats.key_range)
+        x.put(100, 100)
+        x.delete(0)
+        self.assertIsNone(instance.stats_catalog.get(".".join(x._key())).rows)
+        self.assertEqual(x.count(), 100)
+        self.assertEqual(instance.stats_catalog.get(".".join(x._key())).rows, 100)
+        # fresh entries are served without reading the partitions
+        instance.stats_catalog.put(".".join(x._key()), TableStats(3, [1, 2, 4]))
+        self.assertEqual(x.count(), 7)
+        instance.stats_catalog.drop(".".join(x._key()))
+        self.assertEqual(x.count(), 100)
+        x.put_all([(0, 0)])
+        self.assertEqual(len(instance.stats_catalog.get(".".join(x._key())).stale_partitions()), 1)
+        self.assertEqual(x.count(), 101)
+        instance.lazy = True
+        y = x.mapValues(lambda v: v + 1)
+        self.assertEqual(y.count(), 101)
+        self.assertIsNotNone(y._pipeline)
+        self.assertEqual(y.filter(lambda k, v: v % 2 == 0).count(), 50)
+        x.destroy()
+        self.assertIsNone(instance.stats_catalog.get(".".join(x._key())))
+
+    def test_broadcast_join(self):
+        x = eggroll.parallelize(range(1000), partition=4)
+        y = eggroll.parallelize(((i, i * 10) for i in range(0, 1000, 100)), include_key=True, partition=3)
+        expected = {i: i * 11 for i in range(0, 1000, 100)}
+        self.assertEqual(dict(x.join(y, lambda a, b: a + b).collect()), expected)
+        self.assertEqual(dict(y.join(x, lambda a, b: a - b).collect()), {i: i * 9 for i in range(0, 1000, 100)})
+        Standalone.get_instance().lazy = True
+        z = x.mapValues(lambda v: v * 2).join(y, lambda a, b: (a, b))
+        self.assertEqual(z._partitions, 4)
+        self.assertEqual([stage._kind for stage in z._pipeline[1]], ['mapValues', 'broadcast_join'])
+        rows = z._depends_on[-1]
+        path = os.path.join(Standalone.get_instance().memory_dir, rows._type, rows._namespace, rows._name)
+        self.assertEqual(rows.count(), 1)
+        del rows
+        self.assertEqual(dict(z.collect()), {i: (i * 2, i * 10) for i in range(0, 1000, 100)})
+        self.assertEqual(z._depends_on, [])
+        gc.collect()
+        Standalone.get_instance().tracker.wait()
+        self.assertFalse(os.path.exists(path))
+
+    def test_codec(self):
+        rows = [(i, {'id': i, 'key': 'public key ' * 20}) for i in range(500)]
+        table = eggroll.parallelize(rows, include_key=True, partition=2)
+        table.set_codec('zlib', dictionary=True)
+        table.put_all(rows)
+        self.assertEqual(dict(table.collect()), dict(rows))
+        self.assertEqual(table.get(3), rows[3][1])
+        stats = table.codec_stats()
+        self.assertEqual(stats.values, 500)
+        self.assertGreater(stats.ratio, 5)
+        mapped = table.mapValues(lambda v: v['key'])
+        self.assertEqual(dict(mapped.collect()), {i: 'public key ' * 20 for i in range(500)})
+        self.assertGreater(mapped.codec_stats().ratio, 5)
+        self.assertEqual(table.set_codec('none').codec_stats().values, 500)
+
+    def test_async_operations(self):
+        x = eggroll.parallelize(range(100), partition=3)
+        y = eggroll.parallelize(range(50), partition=3)
+        mapped = x.map_values_async(lambda v: v * 2)
+        joined = mapped.then(lambda t: t.join_async(y, add))
+        total = x.reduce_async(add)
+        self.assertEqual(dict(joined.result().collect()), {i: 3 * i for i in range(50)})
+        self.assertTrue(mapped.done())
+        self.assertEqual(total.result(), sum(range(100)))
+        self.assertEqual(dict(mapped.result().collect()), {i: 2 * i for i in range(100)})
+        failed = x.map_values_async(lambda v: 1 / (v - v)).then(lambda t: t.count())
+        self.assertRaises(ZeroDivisionError, failed.result)
+        self.assertRaises(ZeroDivisionError, failed.result)
+
+    def test_load_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rows.csv")
+            with open(path, 'w') as f:
+                f.write("id,x0,x1\n")
+                for i in range(1000):
+                    f.write("{},{},\"{}\"\n".format(i, i * 2, i % 7))
+            progress_path = os.path.join(tmp, "rows.progress")
+            table = eggroll.table("test_load_file", "test_standalone_eggroll", partition=3)
+            chunk_list = load_utils.split_file(path, chunk_bytes=1024)
+            self.assertGreater(len(chunk_list), 3)
+            # the first chunk was loaded by an earlier, interrupted load
+            progress = load_utils.LoadProgress(progress_path, path, 1024)
+            progress.mark(chunk_list[0])
+            stats = table.load_file(path, chunk_bytes=1024, commit_rows=16, progress_path=progress_path)
+            self.assertEqual(stats.skipped_chunks, 1)
+            self.assertEqual(stats.chunks, len(chunk_list) - 1)
+            self.assertFalse(os.path.exists(progress_path))
+            stats = table.load_file(path, chunk_bytes=1024, progress_path=progress_path)
+            self.assertEqual(stats.rows, 1000)
+            self.assertGreater(stats.rows_per_second, 0)
+            self.assertEqual(dict(table.collect()), {str(i): "{},{}".format(i * 2, i % 7) for i in range(1000)})
+            table.destroy()
+
+    def test_persist_in_worker_memory(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(100), partition=4).mapValues(lambda v: [v])
+        y = eggroll.parallelize(range(50), partition=4).persist(StorageLevel.MEMORY_ONLY)
+        self.assertIs(x.persist(StorageLevel.MEMORY_AND_DISK), x)
+        try:
+            instance.configure_worker_cache(1024)
+            for _ in range(2):
+                self.assertEqual(x.mapValues(lambda v: v[0]).reduce(add), 4950)
+                self.assertEqual(dict(x.join(y, lambda a, b: a[0] + b).collect()), {i: 2 * i for i in range(50)})
+                self.assertEqual(dict(y.join(x, lambda a, b: a + b[0]).collect()), {i: 2 * i for i in range(50)})
+            x.put(100, [100])
+            self.assertEqual(x.mapValues(lambda v: v[0]).reduce(add), 5050)
+            self.assertEqual(x.persist(StorageLevel.DISK_ONLY).mapValues(lambda v: v[0]).reduce(add), 5050)
+        finally:
+            instance.configure_worker_cache(1 << 30)
+            y.unpersist()
+
+    def test_chained_joins_of_persisted_tables(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(10), partition=2)
+        a = eggroll.parallelize((('a{}'.format(i)) for i in range(10)), partition=2).cache()
+        b = eggroll.parallelize((('b{}'.format(i)) for i in range(10)), partition=2).cache()
+        try:
+            instance.configure_broadcast_join(max_rows=0)
+            instance.lazy = True
+            z = x.join(a, lambda u, v: (u, v)).join(b, lambda u, v: u + (v,))
+            self.assertEqual(len(z._pipeline[1]), 2)
+            self.assertEqual(dict(z.collect()), {i: (i, 'a{}'.format(i), 'b{}'.format(i)) for i in range(10)})
+        finally:
+            instance.configure_broadcast_join(max_rows=1 << 16)
+            a.unpersist()
+            b.unpersist()
+
+    def test_reclaim_intermediates(self):
+        instance = Standalone.get_instance()
+        x = eggroll.parallelize(range(100), partition=2)
+        y = x.mapValues(lambda v: v + 1)
+        kept = y.mapValues(lambda v: v * 2).checkpoint()
+        named = y.checkpoint("test_reclaim_intermediates", "test_standalone_eggroll")
+        paths = [os.path.join(instance.memory_dir, t._type, t._namespace, t._name) for t in (x, y)]
+        self.assertEqual(y.collect().__next__(), (0, 1))
+        before = instance.tracker.report()
+        del x, y
+        gc.collect()
+        instance.tracker.wait()
+        report = instance.tracker.report()
+        self.assertEqual(report['reclaimed_tables'], before['reclaimed_tables'] + 2)
+        self.assertGreater(report['reclaimed_bytes'], before['reclaimed_bytes'])
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(kept.count(), 100)
+        self.assertEqual(named.get(1), 2)
+        kept.destroy()
+        named.destroy()
+
+
+if __name__ == '__main__':
+    unittest.main()
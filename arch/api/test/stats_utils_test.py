@@ -0,0 +1,60 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import unittest
+
+from arch.api.utils.stats_utils import StatsCatalog, TableStats
+
+
+class _MetaTable(dict):
+    def put(self, k, v):
+        self[k] = v
+
+    def delete(self, k):
+        return self.pop(k, None)
+
+
+class TestStatsUtils(unittest.TestCase):
+    def test_table_stats(self):
+        stats = TableStats(2, [2, 1], [10, 5], [(b'b', b'd'), (b'a', b'a')])
+        self.assertEqual((stats.rows, stats.bytes, stats.key_range), (3, 15, (b'a', b'd')))
+        stats.invalidate(1)
+        self.assertEqual(stats.stale_partitions(), [1])
+        self.assertEqual((stats.rows, stats.bytes, stats.key_range), (None, None, None))
+        stats.update(1, 0, 0)
+        self.assertEqual((stats.rows, stats.key_range), (2, (b'b', b'd')))
+        derived = TableStats.from_dict(stats.to_dict()).derived()
+        self.assertEqual(derived.partition_rows, [2, 0])
+        self.assertIsNone(derived.bytes)
+
+    def test_catalog(self):
+        meta_table = _MetaTable()
+        catalog = StatsCatalog(meta_table)
+        self.assertIsNone(catalog.get('t'))
+        catalog.invalidate('t', [0])
+        self.assertNotIn('t', meta_table)
+        catalog.put('t', TableStats(2, [1, 1]))
+        catalog.invalidate('t', [0])
+        self.assertEqual(meta_table['t']['partition_rows'], [None, 1])
+        meta_table['t'] = TableStats(2, [0, 0]).to_dict()
+        catalog.invalidate('t', [0])
+        self.assertEqual(meta_table['t']['partition_rows'], [0, 0])
+        self.assertEqual(StatsCatalog(meta_table, cached=False).get('t').rows, 0)
+        catalog.drop('t')
+        self.assertIsNone(catalog.get('t'))
+        self.assertNotIn('t', meta_table)
+
+if __name__ == '__main__':
+    unittest.main()
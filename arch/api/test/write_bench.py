@@ -0,0 +1,67 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import lmdb
+import numpy as np
+
+from arch.api.utils.lmdb_utils import write_sorted
+
+
+def sorted_rows(rows, width):
+    value = pickle.dumps(np.ones(width))
+    return sorted((pickle.dumps(str(i)), value) for i in range(rows))
+
+
+def put_rows(txn, rows):
+    for k_bytes, v_bytes in rows:
+        txn.put(k_bytes, v_bytes)
+
+
+def time_write(writer, rows, directory):
+    path = tempfile.mkdtemp(dir=directory)
+    try:
+        env = lmdb.open(path, create=True, max_dbs=1, sync=False, writemap=True, map_size=10_737_418_240)
+        start = time.time()
+        with env.begin(write=True) as txn:
+            writer(txn, rows)
+        elapsed = time.time() - start
+        env.close()
+        return elapsed
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="txn.put against ordered append writes of one partition")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--dir", default="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    args = parser.parse_args()
+
+    print("{:>8} {:>12} {:>10} {:>10} {:>8}".format("width", "bytes", "put", "append", "speedup"))
+    for width in args.widths:
+        rows = sorted_rows(args.rows, width)
+        put = min(time_write(put_rows, rows, args.dir) for _ in range(3))
+        append = min(time_write(write_sorted, rows, args.dir) for _ in range(3))
+        print("{:>8} {:>12} {:>10.3f} {:>10.3f} {:>7.1f}x".format(
+            width, sum(len(k) + len(v) for k, v in rows), put, append, put / append))
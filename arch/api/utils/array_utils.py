@@ -0,0 +1,44 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import numpy as np
+
+from arch.api.utils import eggroll_serdes
+
+
+def array_partition(kv_iterator, value_fn, ordered):
+    '''
+    Values of one partition, mapped by value_fn if given, as one array. With ordered the serialized keys
+    come along so that concat_arrays can put the rows of all partitions in key order.
+    '''
+    serdes = eggroll_serdes.get_serdes()
+    keys, values = [], []
+    for k, v in kv_iterator:
+        if ordered:
+            keys.append(serdes.serialize(k))
+        values.append(v if value_fn is None else value_fn(v))
+    return keys if ordered else None, np.asarray(values)
+
+
+def concat_arrays(parts, ordered):
+    parts = [(keys, values) for keys, values in parts if len(values) > 0]
+    if not parts:
+        return np.asarray([])
+    rtn = np.concatenate([values for _, values in parts])
+    if ordered and len(parts) > 1:
+        keys = [k for part_keys, _ in parts for k in part_keys]
+        rtn = rtn[sorted(range(len(keys)), key=keys.__getitem__)]
+    return rtn
@@ -0,0 +1,83 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import uuid
+
+from cachetools import LRUCache
+
+# deserialized broadcast values, shared by every task running in the same process
+BROADCAST_CACHE_SIZE = 32
+_broadcast_cache = LRUCache(maxsize=BROADCAST_CACHE_SIZE)
+
+# reads a broadcast value from the storage of this process by (table locator, broadcast id), set by
+# processes without an eggroll client, the processors
+_local_reader = None
+
+
+def set_local_reader(reader):
+    global _local_reader
+    _local_reader = reader
+
+
+def local_reader():
+    return _local_reader
+
+
+def broadcast_copy(kv_iterator, broadcast_id, value):
+    '''
+    The single pair a partition of a broadcast table holds, whatever the source partition.
+    '''
+    yield broadcast_id, value
+
+
+class Broadcast(object):
+    '''
+    Read-only value shared by every task of a job. Closures capture the handle instead of the value,
+    and each worker process deserializes the value once, on first access.
+
+    The handle carries the id only. This one keeps the value in the process creating it, the eggrolls
+    store it once per job by id for their workers.
+    '''
+
+    def __init__(self, value, broadcast_id=None):
+        self._id = str(uuid.uuid1()) if broadcast_id is None else broadcast_id
+        self._store(value)
+        _broadcast_cache[self._id] = value
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def value(self):
+        try:
+            return _broadcast_cache[self._id]
+        except KeyError:
+            value = self._load()
+            _broadcast_cache[self._id] = value
+            return value
+
+    def _store(self, value):
+        pass
+
+    def _load(self):
+        raise LookupError("{} is only held by the process that created it".format(self))
+
+    def unpersist(self):
+        _broadcast_cache.pop(self._id, None)
+
+    def __str__(self):
+        return "broadcast: {}".format(self._id)
@@ -0,0 +1,226 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import struct
+import time
+import zlib
+
+try:
+    import lz4.block as _lz4
+except ImportError:
+    _lz4 = None
+
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+# first byte of a compressed value, pickles never start with it
+_MAGIC = 0xfc
+# magic, codec id, dictionary id (0 for none)
+_FRAME_HEADER = struct.Struct("<BBI")
+
+# values shorter than this are stored as they are
+MIN_COMPRESS_BYTES = 64
+# samples and size of the dictionary trained for a table
+DICTIONARY_SAMPLES = 1024
+DICTIONARY_BYTES = 16 << 10
+
+_CODEC_IDS = {'none': 0, 'zlib': 1, 'lz4': 2, 'zstd': 3}
+_CODEC_NAMES = {v: k for k, v in _CODEC_IDS.items()}
+
+# dictionary id -> dictionary bytes, known to this process
+_dictionaries = {}
+
+
+def available_codecs():
+    return [name for name in _CODEC_IDS if name in ('none', 'zlib')
+            or (name == 'lz4' and _lz4 is not None) or (name == 'zstd' and _zstd is not None)]
+
+
+def default_codec():
+    return 'zstd' if _zstd is not None else 'zlib'
+
+
+def dictionary_id(dictionary):
+    # 0 marks frames without a dictionary
+    return zlib.crc32(dictionary) or 1
+
+
+def register_dictionary(dictionary):
+    dict_id = dictionary_id(dictionary)
+    _dictionaries[dict_id] = dictionary
+    return dict_id
+
+
+def train_dictionary(samples, size=DICTIONARY_BYTES):
+    '''
+    Dictionary for values like samples. zstd trains one when it is installed, otherwise the dictionary is
+    the tail of the concatenated samples, which is what a zlib preset dictionary makes use of.
+    '''
+    samples = [s for s in samples if s]
+    if not samples:
+        return None
+    if _zstd is not None:
+        try:
+            return _zstd.train_dictionary(size, samples).as_bytes()
+        except _zstd.ZstdError:
+            pass
+    return b''.join(samples)[-min(size, 32 << 10):]
+
+
+class Codec(object):
+    '''
+    Compression of the value bytes of one table. Encoded values are self-describing frames, readers need
+    nothing but decode, and values which do not shrink are stored as they are.
+    '''
+
+    def __init__(self, name='zlib', level=None, dictionary=None):
+        if name not in _CODEC_IDS:
+            raise ValueError("unknown codec: {}".format(name))
+        if name == 'lz4' and _lz4 is None or name == 'zstd' and _zstd is None:
+            raise ValueError("codec {} is not installed, available: {}".format(name, available_codecs()))
+        if dictionary is not None and name == 'lz4':
+            raise ValueError("lz4 has no dictionary support")
+        self.name = name
+        self.level = level
+        self.dictionary = dictionary
+        self._dict_id = 0 if dictionary is None else register_dictionary(dictionary)
+        self._compressor = None
+
+    def __getstate__(self):
+        return self.name, self.level, self.dictionary
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _compress(self, data):
+        if self.name == 'zlib':
+            level = 1 if self.level is None else self.level
+            if self.dictionary is None:
+                return zlib.compress(data, level)
+            compressor = zlib.compressobj(level, zdict=self.dictionary)
+            return compressor.compress(data) + compressor.flush()
+        if self.name == 'lz4':
+            return _lz4.compress(data, store_size=True)
+        if self._compressor is None:
+            level = 3 if self.level is None else self.level
+            dict_data = None if self.dictionary is None else _zstd.ZstdCompressionDict(self.dictionary)
+            self._compressor = _zstd.ZstdCompressor(level=level, dict_data=dict_data)
+        return self._compressor.compress(data)
+
+    def encode(self, data):
+        if self.name == 'none' or len(data) < MIN_COMPRESS_BYTES:
+            return data
+        payload = self._compress(data)
+        if len(payload) + _FRAME_HEADER.size >= len(data):
+            return data
+        return _FRAME_HEADER.pack(_MAGIC, _CODEC_IDS[self.name], self._dict_id) + payload
+
+
+def is_encoded(data):
+    return len(data) > 0 and data[0] == _MAGIC
+
+
+def codec_of(data):
+    '''
+    Codec, without its dictionary, of an encoded value, None for plain values.
+    '''
+    if not is_encoded(data):
+        return None
+    _, codec_id, _ = _FRAME_HEADER.unpack_from(data)
+    return Codec(_CODEC_NAMES[codec_id])
+
+
+def decode(data, load_dictionary=None):
+    '''
+    Value bytes of a frame, plain values are returned as they are. load_dictionary(dict_id) supplies
+    dictionaries this process has not seen yet.
+    '''
+    if len(data) == 0 or data[0] != _MAGIC:
+        return data
+    _, codec_id, dict_id = _FRAME_HEADER.unpack_from(data)
+    payload = memoryview(data)[_FRAME_HEADER.size:]
+    dictionary = None
+    if dict_id:
+        dictionary = _dictionaries.get(dict_id)
+        if dictionary is None and load_dictionary is not None:
+            dictionary = load_dictionary(dict_id)
+            if dictionary is not None:
+                _dictionaries[dict_id] = dictionary
+        if dictionary is None:
+            raise KeyError("dictionary {} of an encoded value is unknown".format(dict_id))
+    name = _CODEC_NAMES[codec_id]
+    if name == 'zlib':
+        if dictionary is None:
+            return zlib.decompress(payload)
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        return decompressor.decompress(payload) + decompressor.flush()
+    if name == 'lz4':
+        return _lz4.decompress(payload)
+    dict_data = None if dictionary is None else _zstd.ZstdCompressionDict(dictionary)
+    return _zstd.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+
+
+class CodecStats(object):
+    '''
+    Raw and stored bytes of a table's values and the seconds spent encoding and decoding them.
+    '''
+
+    def __init__(self, values=0, raw_bytes=0, stored_bytes=0, encode_seconds=0.0, decode_seconds=0.0):
+        self.values = values
+        self.raw_bytes = raw_bytes
+        self.stored_bytes = stored_bytes
+        self.encode_seconds = encode_seconds
+        self.decode_seconds = decode_seconds
+
+    def __add__(self, other):
+        return CodecStats(*[a + b for a, b in zip(self._fields(), other._fields())])
+
+    def _fields(self):
+        return self.values, self.raw_bytes, self.stored_bytes, self.encode_seconds, self.decode_seconds
+
+    @property
+    def ratio(self):
+        return self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+    def to_dict(self):
+        return dict(values=self.values, raw_bytes=self.raw_bytes, stored_bytes=self.stored_bytes,
+                    ratio=self.ratio, encode_seconds=self.encode_seconds, decode_seconds=self.decode_seconds)
+
+    def __str__(self):
+        return "values: {}, raw bytes: {}, stored bytes: {}, ratio: {:.2f}, encode: {:.3f}s, decode: {:.3f}s".format(
+            self.values, self.raw_bytes, self.stored_bytes, self.ratio, self.encode_seconds, self.decode_seconds)
+
+
+def measure(stored_values, codec=None, load_dictionary=None):
+    '''
+    CodecStats of stored values: their decode time and, when codec is given, the time to encode them again.
+    '''
+    stats = CodecStats()
+    timer = time.process_time
+    for stored in stored_values:
+        start = timer()
+        raw = decode(stored, load_dictionary)
+        stats.decode_seconds += timer() - start
+        if codec is not None:
+            start = timer()
+            codec.encode(raw)
+            stats.encode_seconds += timer() - start
+        stats.values += 1
+        stats.raw_bytes += len(raw)
+        stats.stored_bytes += len(stored)
+    return stats
@@ -15,6 +15,7 @@
 #
 
 from arch.api.utils import cloudpickle
+from arch.api.utils.codec_utils import decode
 from abc import ABCMeta
 from abc import abstractmethod
 from pickle import loads as p_loads
@@ -43,7 +44,7 @@ class CloudPickleSerdes(ABCSerdes):
 
     @staticmethod
     def deserialize(_bytes):
-        return cloudpickle.loads(_bytes)
+        return cloudpickle.loads(decode(_bytes))
 
 
 class PickleSerdes(ABCSerdes):
@@ -54,7 +55,7 @@ class PickleSerdes(ABCSerdes):
 
     @staticmethod
     def deserialize(_bytes):
-        return p_loads(_bytes)
+        return p_loads(decode(_bytes))
 
 
 serdes_cache = {}
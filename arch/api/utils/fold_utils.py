@@ -0,0 +1,49 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import math
+import pickle
+
+
+def dump_zero(zero):
+    '''
+    The zero value travels as bytes so every partition folds into its own copy, seq_op and comb_op
+    are then free to mutate their first argument and return it.
+    '''
+    return pickle.dumps(zero)
+
+
+def aggregate_partition(kv_iterator, zero_bytes, seq_op):
+    acc = pickle.loads(zero_bytes)
+    for _, v in kv_iterator:
+        acc = seq_op(acc, v)
+    return acc
+
+
+def reduce_partition(kv_iterator, func):
+    rtn = None
+    for _, v in kv_iterator:
+        rtn = v if rtn is None else func(rtn, v)
+    return rtn
+
+
+def tree_scale(num_partials, depth):
+    '''
+    Fan-in of every combine task, chosen so that num_partials partials are combined in depth levels.
+    '''
+    if depth < 1:
+        raise ValueError('depth must be a positive number')
+    return max(int(math.ceil(num_partials ** (1.0 / depth))), 2)
@@ -0,0 +1,83 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import time
+from functools import reduce
+
+
+class DTableFuture(object):
+    '''
+    Pending result of an asynchronous table operation. The partition tasks run while the driver goes on,
+    result() waits for them and finishes the operation in the calling thread, so the driver never shares
+    its tables with another thread.
+
+    futures are the partition tasks, anything with done() and result(timeout), and finish turns their
+    results into the value of this future. A finish returning another DTableFuture is waited for as well.
+    '''
+
+    def __init__(self, futures, finish):
+        self._futures = list(futures)
+        self._finish = finish
+        self._resolved = False
+        self._value = None
+        self._error = None
+
+    @staticmethod
+    def completed(value):
+        return DTableFuture([], lambda _: value)
+
+    def done(self):
+        return self._resolved or all(f.done() for f in self._futures)
+
+    def result(self, timeout=None):
+        if not self._resolved:
+            deadline = None if timeout is None else time.time() + timeout
+            # a timeout leaves the future pending, it may be waited for again
+            results = [f.result(timeout=_remaining(deadline)) for f in self._futures]
+            try:
+                value = self._finish(results)
+                while isinstance(value, DTableFuture):
+                    value = value.result(timeout=_remaining(deadline))
+                self._value = value
+            except Exception as e:
+                self._error = e
+            self._resolved = True
+            self._futures, self._finish = [], None
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def then(self, func):
+        '''
+        Future of func(result of this future). func runs in the thread waiting for the returned future,
+        it may start further asynchronous operations and return their future.
+        '''
+        return DTableFuture([self], lambda results: func(results[0]))
+
+    def __str__(self):
+        return "DTableFuture: {}".format("done" if self.done() else "pending")
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(deadline - time.time(), 0)
+
+
+def combine_partials(partials, func):
+    '''
+    Folds the non-None partition results of a reduce with func, None if there are none.
+    '''
+    partials = [p for p in partials if p is not None]
+    return reduce(func, partials) if partials else None
@@ -0,0 +1,110 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import hashlib
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+_JUMP_MULTIPLIER = 2862933555777941757
+_JUMP_MASK = 0xffffffffffffffff
+
+# hot keys (federation tags, meta table keys, small id tables) are memoized, this bounds the memo
+HASH_MEMO_SIZE = 1 << 16
+
+# keys hashed per numpy batch when partitioning an iterator
+HASH_BATCH_SIZE = 4096
+
+
+def _check_partitions(partitions):
+    if partitions < 1:
+        raise ValueError('partitions must be a positive number')
+
+
+@lru_cache(maxsize=HASH_MEMO_SIZE)
+def hash_key_to_partition(key_bytes, partitions):
+    '''
+    Jump consistent hash of the sha1 digest of a serialized key, used by the standalone eggroll.
+    '''
+    _check_partitions(partitions)
+    _key = int.from_bytes(hashlib.sha1(key_bytes).digest(), byteorder='little', signed=False)
+    b, j = -1, 0
+    while j < partitions:
+        b = int(j)
+        _key = ((_key * _JUMP_MULTIPLIER) + 1) & _JUMP_MASK
+        j = float(b + 1) * (float(1 << 31) / float((_key >> 33) + 1))
+    return int(b)
+
+
+def hash_keys_to_partitions(keys_bytes, partitions):
+    '''
+    Batch version of hash_key_to_partition, returns an int array with the partition of every key.
+    Only the low 64 bits of a digest take part in the jump steps, so every step runs as NumPy
+    arithmetic over the whole batch.
+    '''
+    _check_partitions(partitions)
+    if len(keys_bytes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    sha1 = hashlib.sha1
+    digests = b''.join([sha1(k).digest()[:8] for k in keys_bytes])
+    keys = np.frombuffer(digests, dtype='<u8').astype(np.uint64)
+    b = np.full(keys.shape[0], -1, dtype=np.int64)
+    j = np.zeros(keys.shape[0], dtype=np.float64)
+    multiplier, one = np.uint64(_JUMP_MULTIPLIER), np.uint64(1)
+    active = np.arange(keys.shape[0])
+    while active.shape[0] > 0:
+        b[active] = j[active].astype(np.int64)
+        keys[active] = keys[active] * multiplier + one
+        j[active] = (b[active] + 1).astype(np.float64) * (
+                float(1 << 31) / ((keys[active] >> np.uint64(33)) + one).astype(np.float64))
+        active = active[j[active] < partitions]
+    return b
+
+
+@lru_cache(maxsize=HASH_MEMO_SIZE)
+def hash_key_mod(key_bytes, partitions):
+    '''
+    sha1 digest of a serialized key modulo partitions, used by simple_roll.
+    '''
+    _check_partitions(partitions)
+    return int.from_bytes(hashlib.sha1(key_bytes).digest(), byteorder='little') % partitions
+
+
+def hash_keys_mod(keys_bytes, partitions):
+    '''
+    Batch version of hash_key_mod. The 160 bit digests are reduced limb by limb, from the most
+    significant 32 bit limb down, so every intermediate value fits in 64 bits.
+    '''
+    _check_partitions(partitions)
+    if len(keys_bytes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    sha1 = hashlib.sha1
+    digests = b''.join([sha1(k).digest() for k in keys_bytes])
+    limbs = np.frombuffer(digests, dtype='<u4').reshape(-1, 5).astype(np.uint64)
+    modulus = np.uint64(partitions)
+    rtn = np.zeros(limbs.shape[0], dtype=np.uint64)
+    for i in range(4, -1, -1):
+        rtn = ((rtn << np.uint64(32)) + limbs[:, i]) % modulus
+    return rtn.astype(np.int64)
+
+
+def chunks(iterable, size=HASH_BATCH_SIZE):
+    it = iter(iterable)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
@@ -0,0 +1,94 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+# a join merges two partitions instead of looking keys up once both hold this many rows
+MERGE_JOIN_MIN_ROWS = 1 << 16
+# and the right partition holds at most this many times the rows of the left one
+MERGE_JOIN_MAX_RATIO = 4
+
+
+def use_merge_join(left_rows, right_rows, min_rows=MERGE_JOIN_MIN_ROWS, max_ratio=MERGE_JOIN_MAX_RATIO):
+    return min(left_rows, right_rows) >= min_rows and right_rows <= max_ratio * left_rows
+
+
+# a join ships a side of at most this many rows and bytes to every worker as a hash map, and only the
+# other side is read by the tasks, in its own partitions
+BROADCAST_JOIN_MAX_ROWS = 1 << 16
+BROADCAST_JOIN_MAX_BYTES = 16 << 20
+
+
+def broadcast_side(left_stats, right_stats, max_rows=BROADCAST_JOIN_MAX_ROWS, max_bytes=BROADCAST_JOIN_MAX_BYTES):
+    '''
+    'left' or 'right', the side of a join to broadcast given the TableStats of both sides, None when neither
+    is known to be small. The broadcast side is the one with fewer rows, a side whose stats are unknown is
+    never broadcast. Unknown bytes do not rule a side out, rows are known more often.
+    '''
+    candidates = []
+    for side, stats in (('right', right_stats), ('left', left_stats)):
+        if stats is None or stats.rows is None or stats.rows > max_rows:
+            continue
+        if stats.bytes is not None and stats.bytes > max_bytes:
+            continue
+        candidates.append((stats.rows, side))
+    if not candidates:
+        return None
+    rows, side = min(candidates)
+    other_stats = left_stats if side == 'right' else right_stats
+    if len(candidates) == 2 and other_stats.rows == rows:
+        # two small tables of the same size, a broadcast saves nothing over the partition join
+        return None
+    return side
+
+
+class MergeJoin(object):
+    '''
+    Joins rows arriving in key order with the rows of an lmdb cursor, both sides move forward in a
+    single pass. The cursor steps along while it trails the left key by one row and seeks otherwise.
+    Counts the left rows and the seeks, every other left row was matched without a lookup.
+    '''
+
+    def __init__(self, right_cursor):
+        self._cursor = right_cursor
+        self.rows = 0
+        self.seeks = 0
+
+    @property
+    def lookups_avoided(self):
+        return self.rows - self.seeks
+
+    def pairs(self, rows):
+        '''
+        Yields (key bytes, left value, right value bytes) for the keys of rows found on the right.
+        '''
+        cursor = self._cursor
+        right = cursor.iternext()
+        r = next(right, None)
+        for k_bytes, v1 in rows:
+            if r is None:
+                return
+            self.rows += 1
+            r_key = r[0]
+            if r_key > k_bytes:
+                continue
+            if r_key < k_bytes:
+                r = next(right, None)
+                if r is not None and r[0] < k_bytes:
+                    self.seeks += 1
+                    r = cursor.item() if cursor.set_range(k_bytes) else None
+                if r is None or r[0] != k_bytes:
+                    continue
+            yield k_bytes, v1, r[1]
+            r = next(right, None)
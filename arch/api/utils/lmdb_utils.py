@@ -0,0 +1,62 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+def write_sorted(txn, rows):
+    '''
+    Writes (key bytes, value bytes) rows that arrive in key order through one cursor. An empty database
+    takes them with MDB_APPEND, which skips the B-tree search of every insert. Returns the rows written.
+    '''
+    cursor = txn.cursor()
+    append = not cursor.first()
+    consumed, added = cursor.putmulti(rows, append=append)
+    cursor.close()
+    if append and added != consumed:
+        raise ValueError("{} of {} rows out of key order".format(consumed - added, consumed))
+    return consumed
+
+
+def split_keys(txn, rows, pieces):
+    '''
+    pieces - 1 keys splitting a database of rows rows into key ranges of about equal row counts. Only
+    the keys are read, in one cursor pass.
+    '''
+    if pieces < 2 or rows < pieces:
+        return []
+    step = rows / pieces
+    targets = [int(step * i) for i in range(1, pieces)]
+    rtn = []
+    cursor = txn.cursor()
+    for i, key in enumerate(cursor.iternext(keys=True, values=False)):
+        if i == targets[len(rtn)]:
+            rtn.append(bytes(key))
+            if len(rtn) == len(targets):
+                break
+    cursor.close()
+    return rtn
+
+
+def range_rows(cursor, start=None, end=None):
+    '''
+    (key, value) rows of a cursor with start <= key < end, None leaves that side open.
+    '''
+    positioned = cursor.first() if start is None else cursor.set_range(start)
+    if not positioned:
+        return
+    for key, value in cursor.iternext():
+        if end is not None and key >= end:
+            return
+        yield key, value
@@ -0,0 +1,243 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from arch.api.utils import cloudpickle as f_pickle, file_utils
+from arch.api.utils.log_utils import getLogger
+
+LOGGER = getLogger()
+
+# bytes of the input file parsed by one task and committed to every partition in one transaction per task
+LOAD_CHUNK_BYTES = 64 << 20
+# rows committed per partition transaction, bounds the dirty pages of chunks with many small rows
+LOAD_COMMIT_ROWS = 1 << 17
+# seconds between two progress reports
+LOAD_REPORT_SECONDS = 10
+
+
+def parse_csv_line(line):
+    '''
+    First field of a csv record as the key, the other fields joined with ',' as the value. Quoted fields
+    may hold line ends.
+    '''
+    row = next(csv.reader([line]))
+    return row[0], ",".join(row[1:])
+
+
+def parse_text_line(line):
+    values = line.rstrip("\r\n").replace("\t", ",").split(",")
+    return values[0], ",".join(values[1:])
+
+
+def is_csv(path):
+    return 'csv' in os.path.basename(path).split('.')
+
+
+def parser_of(path):
+    return parse_csv_line if is_csv(path) else parse_text_line
+
+
+def _read_record(f, quoted, quotes=0):
+    '''
+    Reads up to the next line end, with quoted up to the next one outside a quoted field. quotes counts
+    the '"' already read of the record.
+    '''
+    record = line = f.readline()
+    quotes += line.count(b'"')
+    while quoted and quotes % 2 and line:
+        line = f.readline()
+        quotes += line.count(b'"')
+        record += line
+    return record
+
+
+def split_file(path, chunk_bytes=LOAD_CHUNK_BYTES, head=True):
+    '''
+    (offset, length) byte ranges of at most about chunk_bytes covering the rows of a file, every range
+    ends at a line end, in csv files at one outside quoted fields. With head, the first row is left out.
+    '''
+    quoted = is_csv(path)
+    size = os.path.getsize(path)
+    rtn = []
+    with open(path, 'rb') as f:
+        offset = len(_read_record(f, quoted)) if head else 0
+        while offset < size:
+            if quoted:
+                # a line end ends a row only after an even number of '"', so csv chunks are read in full
+                f.seek(offset)
+                _read_record(f, quoted, f.read(chunk_bytes).count(b'"'))
+            else:
+                f.seek(min(offset + chunk_bytes, size))
+                f.readline()
+            end = min(f.tell(), size)
+            rtn.append((offset, end - offset))
+            offset = end
+    return rtn
+
+
+def read_lines(path, chunk):
+    '''
+    The non-blank rows of a chunk without their line ends. Only '\\n' ends a row, in csv files only outside
+    quoted fields.
+    '''
+    offset, length = chunk
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    lines = data.decode('utf-8').split('\n')
+    if is_csv(path):
+        lines = _join_quoted(lines)
+    return [line.rstrip('\r') for line in lines if line.strip()]
+
+
+def _join_quoted(lines):
+    rtn = []
+    record, quotes = [], 0
+    for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            rtn.append('\n'.join(record))
+            record, quotes = [], 0
+    if record:
+        rtn.append('\n'.join(record))
+    return rtn
+
+
+def default_progress_path(namespace, name):
+    return os.path.join(file_utils.get_project_base_directory(), 'data', '__LOAD__', namespace, name + '.progress')
+
+
+class LoadProgress(object):
+    '''
+    Append-only log of the chunks of a file already loaded into a table. The first line identifies the
+    file and the chunking, a log written for another file or chunking is started over.
+    '''
+
+    def __init__(self, path, input_path, chunk_bytes):
+        self._path = path
+        stat = os.stat(input_path)
+        self._signature = json.dumps({'file': os.path.abspath(input_path), 'size': stat.st_size,
+                                      'mtime': int(stat.st_mtime), 'chunk_bytes': chunk_bytes}, sort_keys=True)
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.read().splitlines()
+            if lines and lines[0] == self._signature:
+                self.done = {int(line) for line in lines[1:] if line}
+        if not self.done:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(self._signature + '\n')
+
+    def mark(self, chunk):
+        with open(self._path, 'a') as f:
+            f.write("{}\n".format(chunk[0]))
+        self.done.add(chunk[0])
+
+    def finish(self):
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+
+class LoadStats(object):
+    def __init__(self, rows=0, bytes=0, chunks=0, skipped_chunks=0, seconds=0.0):
+        self.rows = rows
+        self.bytes = bytes
+        self.chunks = chunks
+        self.skipped_chunks = skipped_chunks
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return dict(rows=self.rows, bytes=self.bytes, chunks=self.chunks, skipped_chunks=self.skipped_chunks,
+                    seconds=self.seconds, rows_per_second=self.rows_per_second)
+
+    def __str__(self):
+        return "rows: {}, bytes: {}, chunks: {}, skipped chunks: {}, {:.1f}s, {:.0f} rows/s".format(
+            self.rows, self.bytes, self.chunks, self.skipped_chunks, self.seconds, self.rows_per_second)
+
+
+def run_load(path, chunks, progress: LoadProgress, submit, complete=None, window=None):
+    '''
+    Submits every chunk not loaded yet and records the chunks in progress, in file order, as they complete.
+    submit(chunk) returns a future, complete(result) turns its result into (rows, bytes) and defaults to
+    the result itself. At most window chunks are in flight.
+    '''
+    pending = [c for c in chunks if c[0] not in progress.done]
+    stats = LoadStats(skipped_chunks=len(chunks) - len(pending))
+    start = time.time()
+    last_report = [start]
+
+    def _complete(chunk, future):
+        result = future.result()
+        rows, size = result if complete is None else complete(result)
+        progress.mark(chunk)
+        stats.rows += rows
+        stats.bytes += size
+        stats.chunks += 1
+        stats.seconds = time.time() - start
+        if time.time() - last_report[0] >= LOAD_REPORT_SECONDS:
+            last_report[0] = time.time()
+            LOGGER.info("loading {}: {}/{} chunks, {}".format(path, stats.chunks, len(pending), stats))
+
+    window = max(len(pending) if window is None else window, 1)
+    futures = deque()
+    for chunk in pending:
+        futures.append((chunk, submit(chunk)))
+        if len(futures) >= window:
+            _complete(*futures.popleft())
+    while futures:
+        _complete(*futures.popleft())
+    progress.finish()
+    stats.seconds = time.time() - start
+    LOGGER.info("loaded {}: {}".format(path, stats))
+    return stats
+
+
+def _parse_chunk(path, chunk, parse_bytes):
+    parse = f_pickle.loads(parse_bytes)
+    return [parse(line) for line in read_lines(path, chunk)], chunk[1]
+
+
+def load_file(table, path, progress_path, parse=None, head=True, chunk_bytes=LOAD_CHUNK_BYTES, processes=None):
+    '''
+    Bulk load through table.put_all, for eggrolls whose workers cannot read the file. Chunks are parsed
+    by a local process pool while the previous ones are put.
+    '''
+    parse_bytes = f_pickle.dumps(parser_of(path) if parse is None else parse)
+    progress = LoadProgress(progress_path, path, chunk_bytes)
+    processes = processes or os.cpu_count() or 1
+
+    def _put(result):
+        rows, size = result
+        table.put_all(rows)
+        return len(rows), size
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return run_load(path, split_file(path, chunk_bytes, head), progress,
+                        lambda chunk: pool.submit(_parse_chunk, path, chunk, parse_bytes), _put, window=2 * processes)
@@ -0,0 +1,75 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+class PartitionPairs(object):
+    '''
+    mapPartitions function yielding the (key, value) pairs of a partition. Processors write the pairs as
+    the partition of their result, instead of the single value other functions leave under the last key.
+    '''
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, kv_iterator):
+        return self.func(kv_iterator)
+
+
+def flat_map_partition(kv_iterator, func):
+    for k, v in kv_iterator:
+        yield from func(k, v)
+
+
+def filter_partition(kv_iterator, predicate):
+    for k, v in kv_iterator:
+        if predicate(k, v):
+            yield k, v
+
+
+class KeepRows(object):
+    '''
+    mapPartitions function keeping the rows of a partition predicate(key, value) holds for. Processors copy
+    the stored bytes of the rows kept.
+    '''
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def __call__(self, kv_iterator):
+        return filter_partition(kv_iterator, self.predicate)
+
+
+class ProbeKeys(object):
+    '''
+    join function keeping the rows of the left partition whose keys are in the right one, with subtract
+    those whose keys are not. Processors only look the keys up and copy the stored bytes of the left rows.
+    '''
+
+    def __init__(self, subtract=False):
+        self.subtract = subtract
+
+    def __call__(self, left, right):
+        return left
+
+
+def broadcast_join_partition(kv_iterator, broadcast, func, broadcast_on_left):
+    '''
+    Joins a partition with the rows of a broadcast dict, func gets the values in join order.
+    '''
+    rows = broadcast.value
+    for k, v in kv_iterator:
+        if k in rows:
+            yield k, func(rows[k], v) if broadcast_on_left else func(v, rows[k])
@@ -0,0 +1,92 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import math
+import pickle
+from itertools import chain, islice
+
+from arch.api.utils.log_utils import getLogger
+
+LOGGER = getLogger()
+
+# rows a partition should hold before the work is spread over more partitions
+MIN_PARTITION_ROWS = 10000
+# serialized bytes above which partitions are split further, even beyond the available cores
+MAX_PARTITION_BYTES = 256 << 20
+# partitions per core the policy never goes beyond
+MAX_PARTITIONS_PER_CORE = 4
+# rows pickled to estimate the serialized size of data
+SIZE_SAMPLE_ROWS = 100
+
+# partition count of every table the job creates without one, None leaves it to the policy
+_default_partitions = None
+
+
+def set_default_partitions(partitions):
+    global _default_partitions
+    if partitions is not None and partitions < 1:
+        raise ValueError('partitions must be a positive number')
+    _default_partitions = partitions
+
+
+def get_default_partitions():
+    return _default_partitions
+
+
+def suggest_partitions(parallelism, rows=None, size=None):
+    '''
+    Partitions for rows taking size serialized bytes on parallelism cores. Up to one partition per
+    core while every partition gets MIN_PARTITION_ROWS rows, more once partitions would exceed
+    MAX_PARTITION_BYTES. Without a row count every core gets a partition.
+    '''
+    parallelism = max(parallelism, 1)
+    by_rows = parallelism if rows is None else int(math.ceil(rows / MIN_PARTITION_ROWS))
+    by_bytes = 0 if size is None else int(math.ceil(size / MAX_PARTITION_BYTES))
+    return max(1, min(max(min(by_rows, parallelism), by_bytes), parallelism * MAX_PARTITIONS_PER_CORE))
+
+
+def estimate_size(sample, rows):
+    if not sample:
+        return 0
+    return int(sum(len(pickle.dumps(r)) for r in sample) / len(sample) * rows)
+
+
+def resolve_partitions(partition, parallelism, data=None, name=None):
+    '''
+    partition if it is given, else the job default or the policy applied to data. Returns the partitions
+    and data, which is an equivalent iterator when rows had to be read ahead to count them.
+    '''
+    if partition is not None:
+        return partition, data
+    if _default_partitions is not None:
+        LOGGER.info("{} partitions for table {}, the job default".format(_default_partitions, name))
+        return _default_partitions, data
+    rows = size = None
+    if data is not None:
+        if hasattr(data, '__len__'):
+            rows = len(data)
+            sample = list(islice(iter(data), SIZE_SAMPLE_ROWS))
+        else:
+            # the rows needed to fill every core are read ahead, beyond them the count does not matter
+            it = iter(data)
+            sample = list(islice(it, parallelism * MIN_PARTITION_ROWS))
+            data = chain(sample, it)
+            rows = len(sample)
+        size = estimate_size(sample[:SIZE_SAMPLE_ROWS], rows)
+    partitions = suggest_partitions(parallelism, rows, size)
+    LOGGER.info("{} partitions for table {}: rows {}, estimated bytes {}, parallelism {}".format(
+        partitions, name, rows, size, parallelism))
+    return partitions, data
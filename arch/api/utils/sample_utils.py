@@ -0,0 +1,79 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import pickle
+import zlib
+from itertools import chain, islice
+
+import numpy as np
+
+from arch.api.utils.hash_utils import chunks
+
+
+def reservoir_sample(rows, n, random_state):
+    '''
+    Uniform sample of at most n rows of an iterator, returned with the number of rows seen. The slots of
+    a whole chunk of rows are drawn at once, only rows entering the reservoir are handled one by one.
+    '''
+    rows = iter(rows)
+    reservoir = list(islice(rows, n))
+    seen = len(reservoir)
+    if seen < n:
+        return seen, reservoir
+    for chunk in chunks(rows):
+        positions = np.arange(seen + 1, seen + len(chunk) + 1, dtype=np.float64)
+        slots = (random_state.rand(len(chunk)) * positions).astype(np.int64)
+        for i in np.flatnonzero(slots < n).tolist():
+            reservoir[slots[i]] = chunk[i]
+        seen += len(chunk)
+    return seen, reservoir
+
+
+def sample_partition(kv_iterator, n, seed):
+    '''
+    Reservoir sample of one partition for eggrolls that cannot tell a task its partition, the seed is
+    mixed with the first key so that partitions draw different slots.
+    '''
+    rows = iter(kv_iterator)
+    first = next(rows, None)
+    if first is None:
+        return 0, []
+    random_state = np.random.RandomState(None if seed is None else [seed, zlib.crc32(pickle.dumps(first[0]))])
+    return reservoir_sample(chain([first], rows), n, random_state)
+
+
+def merge_samples(parts, n, random_state):
+    '''
+    Exactly min(n, total rows) rows, uniform over all partitions, from their (rows seen, reservoir) samples.
+    n is split over the partitions with sequential hypergeometric draws, then every partition contributes
+    that many rows of its reservoir.
+    '''
+    remaining = sum(count for count, _ in parts)
+    needed = min(n, remaining)
+    rtn = []
+    for count, reservoir in parts:
+        if needed <= 0:
+            break
+        if count == 0:
+            continue
+        if count == remaining:
+            take = needed
+        else:
+            take = int(random_state.hypergeometric(count, remaining - count, needed))
+        rtn.extend(reservoir[i] for i in random_state.permutation(len(reservoir))[:take])
+        remaining -= count
+        needed -= take
+    return rtn
@@ -0,0 +1,131 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+from cachetools import LRUCache
+
+# catalog entries each driver keeps besides the meta table
+STATS_CACHE_SIZE = 1024
+
+_MISSING = object()
+
+
+class TableStats(object):
+    '''
+    Rows, bytes and (first, last) serialized key of every partition of a table, None where unknown.
+    Bytes are the storage size, an estimate good for planning. A partition written since its stats were
+    read is stale, all three are unknown until it is read again.
+    '''
+
+    def __init__(self, partitions, partition_rows=None, partition_bytes=None, key_ranges=None):
+        self.partition_rows = list(partition_rows) if partition_rows is not None else [None] * partitions
+        self.partition_bytes = list(partition_bytes) if partition_bytes is not None else [None] * partitions
+        self.key_ranges = list(key_ranges) if key_ranges is not None else [None] * partitions
+
+    @property
+    def partitions(self):
+        return len(self.partition_rows)
+
+    @property
+    def rows(self):
+        return None if None in self.partition_rows else sum(self.partition_rows)
+
+    @property
+    def bytes(self):
+        return None if None in self.partition_bytes else sum(self.partition_bytes)
+
+    @property
+    def key_range(self):
+        if self.rows is None:
+            return None
+        ranges = [r for r in self.key_ranges if r is not None]
+        if not ranges:
+            return None
+        return min(first for first, _ in ranges), max(last for _, last in ranges)
+
+    def stale_partitions(self):
+        return [p for p, rows in enumerate(self.partition_rows) if rows is None]
+
+    def update(self, p, rows, size=None, key_range=None):
+        self.partition_rows[p] = rows
+        self.partition_bytes[p] = size
+        self.key_ranges[p] = key_range
+
+    def invalidate(self, p):
+        self.update(p, None)
+
+    def derived(self):
+        '''
+        Stats of a table holding the same keys in the same partitions, with other values.
+        '''
+        return TableStats(self.partitions, self.partition_rows, key_ranges=self.key_ranges)
+
+    def to_dict(self):
+        return dict(partition_rows=self.partition_rows, partition_bytes=self.partition_bytes,
+                    key_ranges=self.key_ranges)
+
+    @staticmethod
+    def from_dict(d):
+        return TableStats(len(d['partition_rows']), **d)
+
+    def __str__(self):
+        return "rows: {}, bytes: {}, partition rows: {}".format(self.rows, self.bytes, self.partition_rows)
+
+
+class StatsCatalog(object):
+    '''
+    TableStats by table key, stored as dicts in a meta table. With cached, entries read or written are
+    kept by the driver as well, tables without an entry are remembered too, so maintaining stats of such
+    tables costs no meta table round trip. Only drivers that are the single writer of their tables'
+    entries may cache them.
+    '''
+
+    def __init__(self, meta_table, cached=True):
+        self._meta_table = meta_table
+        self._cache = LRUCache(maxsize=STATS_CACHE_SIZE) if cached else None
+
+    def get(self, table_key):
+        d = _MISSING if self._cache is None else self._cache.get(table_key, _MISSING)
+        if d is _MISSING:
+            d = self._meta_table.get(table_key)
+            self._remember(table_key, d)
+        return None if d is None else TableStats.from_dict(d)
+
+    def put(self, table_key, stats: TableStats):
+        d = stats.to_dict()
+        self._meta_table.put(table_key, d)
+        self._remember(table_key, d)
+
+    def invalidate(self, table_key, partitions):
+        '''
+        Marks the partitions a writer wrote stale. The meta table is only written when one of them was not
+        stale yet, so a run of writes to a partition costs one catalog write.
+        '''
+        stats = self.get(table_key)
+        if stats is None:
+            return
+        fresh = [p for p in partitions if stats.partition_rows[p] is not None]
+        if fresh:
+            for p in fresh:
+                stats.invalidate(p)
+            self.put(table_key, stats)
+
+    def drop(self, table_key):
+        self._meta_table.delete(table_key)
+        self._remember(table_key, None)
+
+    def _remember(self, table_key, d):
+        if self._cache is not None:
+            self._cache[table_key] = d
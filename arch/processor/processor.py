@@ -24,9 +24,15 @@ import lmdb
 from cachetools import cached
 from grpc._cython import cygrpc
 from arch.api.utils import eggroll_serdes
+from arch.api.utils.broadcast_utils import set_local_reader
+from arch.api.utils.codec_utils import codec_of
+from arch.api.utils.join_utils import MergeJoin, use_merge_join
+from arch.api.utils.lmdb_utils import write_sorted
+from arch.api.utils.pair_utils import KeepRows, PartitionPairs, ProbeKeys
 from cachetools import LRUCache
 from arch.api.proto import kv_pb2, processor_pb2, processor_pb2_grpc, storage_basic_pb2
 import os
+from itertools import islice
 import numpy as np
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
@@ -38,6 +44,9 @@ PROCESS_RECV_FORMAT = "method {} receive task: {}"
 
 PROCESS_DONE_FORMAT = "method {} done response: {}"
 
+# leading source values looked at for the codec of an output
+CODEC_PROBE_VALUES = 16
+
 
 def generator(serdes: eggroll_serdes.ABCSerdes, cursor):
     for k, v in cursor:
@@ -50,9 +59,26 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
         self._serdes = eggroll_serdes.get_serdes()
         Processor.TEMP_DIR = os.sep.join([data_dir, 'lmdb_temporary'])
         Processor.DATA_DIR = os.sep.join([data_dir, 'lmdb'])
-
-    @cached(cache=LRUCache(maxsize=100))
-    def get_function(self, function_bytes):
+        set_local_reader(self.read_broadcast)
+
+    def read_broadcast(self, locator, broadcast_id):
+        '''
+        Value of a broadcast from any fragment of its table in the storage of this egg, every fragment
+        holds a copy.
+        '''
+        _type, namespace, name = locator
+        table_dir = os.path.dirname(Processor._do_get_path(_type, namespace, name, 0))
+        k_bytes = self._serdes.serialize(broadcast_id)
+        for fragment in os.listdir(table_dir) if os.path.isdir(table_dir) else []:
+            with Processor.get_environment(os.sep.join([table_dir, fragment]), create_if_missing=False) as env:
+                with env.begin() as txn:
+                    v_bytes = txn.get(k_bytes)
+            if v_bytes is not None:
+                return self._serdes.deserialize(v_bytes)
+        raise KeyError("broadcast {} has no copy in {}".format(broadcast_id, table_dir))
+
+    @cached(cache=LRUCache(maxsize=100), key=lambda self, function_id, function_bytes: function_id)
+    def get_function(self, function_id, function_bytes):
         try:
             return cloudpickle.loads(function_bytes)
         except:
@@ -72,11 +98,12 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
         with Processor.get_environment(dst_db_path, create_if_missing=True) as dst_env, Processor.get_environment(
                 src_db_path) as source_env:
             with source_env.begin() as source_txn, dst_env.begin(write=True) as dst_txn:
+                serialize_value = Processor._value_serializer(_serdes, source_txn)
                 cursor = source_txn.cursor()
                 for k_bytes, v_bytes in cursor:
                     k, v = _serdes.deserialize(k_bytes), _serdes.deserialize(v_bytes)
                     k1, v1 = _mapper(k, v)
-                    dst_txn.put(_serdes.serialize(k1), _serdes.serialize(v1))
+                    dst_txn.put(_serdes.serialize(k1), serialize_value(v1))
                 cursor.close()
         LOGGER.debug(PROCESS_DONE_FORMAT.format('map', rtn))
         return rtn
@@ -95,11 +122,22 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
         with Processor.get_environment(dst_db_path, create_if_missing=True) as dst_env, Processor.get_environment(
                 src_db_path) as src_env:
             with src_env.begin() as src_txn, dst_env.begin(write=True) as dst_txn:
-                cursor = src_txn.cursor()
-                v = _mapper(generator(_serdes, cursor))
-                if cursor.last():
-                    k_bytes = cursor.key()
-                    dst_txn.put(k_bytes, _serdes.serialize(v))
+                if isinstance(_mapper, KeepRows):
+                    cursor = src_txn.cursor()
+                    write_sorted(dst_txn, ((k_bytes, v_bytes) for k_bytes, v_bytes in cursor
+                                           if _mapper.predicate(_serdes.deserialize(k_bytes),
+                                                                _serdes.deserialize(v_bytes))))
+                elif isinstance(_mapper, PartitionPairs):
+                    serialize_value = Processor._value_serializer(_serdes, src_txn)
+                    cursor = src_txn.cursor()
+                    for k, v in _mapper(generator(_serdes, cursor)):
+                        dst_txn.put(_serdes.serialize(k), serialize_value(v))
+                else:
+                    cursor = src_txn.cursor()
+                    v = _mapper(generator(_serdes, cursor))
+                    if cursor.last():
+                        k_bytes = cursor.key()
+                        dst_txn.put(k_bytes, _serdes.serialize(v))
                 cursor.close()
         LOGGER.debug(PROCESS_DONE_FORMAT.format('mapPartitions', rtn))
         return rtn
@@ -118,11 +156,10 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
         with Processor.get_environment(dst_db_path, create_if_missing=True) as dst_env, Processor.get_environment(
                 src_db_path) as src_env:
             with src_env.begin() as src_txn, dst_env.begin(write=True) as dst_txn:
+                serialize_value = Processor._value_serializer(_serdes, src_txn)
                 cursor = src_txn.cursor()
-                for k_bytes, v_bytes in cursor:
-                    v = _serdes.deserialize(v_bytes)
-                    v1 = _mapper(v)
-                    dst_txn.put(k_bytes, _serdes.serialize(v1))
+                write_sorted(dst_txn, ((k_bytes, serialize_value(_mapper(_serdes.deserialize(v_bytes))))
+                                       for k_bytes, v_bytes in cursor))
                 cursor.close()
         LOGGER.debug(PROCESS_DONE_FORMAT.format('mapValues', rtn))
         return rtn
@@ -140,20 +177,58 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
         with Processor.get_environment(Processor.get_path(left_op)) as left_env, Processor.get_environment(
                 Processor.get_path(right_op)) as right_env, Processor.get_environment(Processor.get_path(rtn),
                                                                                       create_if_missing=True) as dst_env:
+            merge = use_merge_join(left_env.stat()['entries'], right_env.stat()['entries'])
             with left_env.begin() as left_txn, right_env.begin() as right_txn, dst_env.begin(write=True) as dst_txn:
+                serialize_value = Processor._value_serializer(_serdes, left_txn)
                 cursor = left_txn.cursor()
-                for k_bytes, v1_bytes in cursor:
-                    v2_bytes = right_txn.get(k_bytes)
-                    if v2_bytes is None:
-                        continue
-                    v1 = _serdes.deserialize(v1_bytes)
-                    v2 = _serdes.deserialize(v2_bytes)
-                    v3 = _joiner(v1, v2)
-                    dst_txn.put(k_bytes, _serdes.serialize(v3))
+                # the output keeps the key order of the left cursor
+                if isinstance(_joiner, ProbeKeys):
+                    write_sorted(dst_txn, Processor._probe_keys(cursor, right_txn, _joiner.subtract))
+                elif merge:
+                    # both sides in key order, they are read in one sequential pass
+                    right_cursor = right_txn.cursor()
+                    merge_join = MergeJoin(right_cursor)
+                    write_sorted(dst_txn, ((k_bytes, serialize_value(
+                        _joiner(_serdes.deserialize(v1_bytes), _serdes.deserialize(v2_bytes))))
+                                           for k_bytes, v1_bytes, v2_bytes in merge_join.pairs(cursor)))
+                    right_cursor.close()
+                    LOGGER.debug("join merged {} rows, {} lookups avoided".format(merge_join.rows,
+                                                                                 merge_join.lookups_avoided))
+                else:
+                    write_sorted(dst_txn, Processor._lookup_join(cursor, right_txn, _joiner, _serdes, serialize_value))
                 cursor.close()
         LOGGER.debug(PROCESS_DONE_FORMAT.format('join', rtn))
         return rtn
 
+    @staticmethod
+    def _lookup_join(cursor, right_txn, _joiner, _serdes, serialize_value):
+        for k_bytes, v1_bytes in cursor:
+            v2_bytes = right_txn.get(k_bytes)
+            if v2_bytes is None:
+                continue
+            v1 = _serdes.deserialize(v1_bytes)
+            v2 = _serdes.deserialize(v2_bytes)
+            yield k_bytes, serialize_value(_joiner(v1, v2))
+
+    @staticmethod
+    def _probe_keys(cursor, right_txn, subtract):
+        for k_bytes, v_bytes in cursor:
+            if (right_txn.get(k_bytes) is None) == subtract:
+                yield k_bytes, v_bytes
+
+    @staticmethod
+    def _value_serializer(_serdes, src_txn):
+        '''
+        Serializer of output values, which are compressed like the leading values of the source are.
+        '''
+        cursor = src_txn.cursor()
+        codecs = [codec_of(v) for v in islice(cursor.iternext(keys=False, values=True), CODEC_PROBE_VALUES)]
+        cursor.close()
+        codec = next((c for c in codecs if c is not None), None)
+        if codec is None:
+            return _serdes.serialize
+        return lambda _obj: codec.encode(_serdes.serialize(_obj))
+
     def reduce(self, request, context):
         task_info = request.info
         LOGGER.debug(PROCESS_RECV_FORMAT.format('reduce', task_info))
@@ -222,15 +297,13 @@ class Processor(processor_pb2_grpc.ProcessServiceServicer):
                     cursor = source_txn.cursor()
                     cursor.first()
                     random_state = np.random.RandomState(seed)
-                    for k, v in cursor:
-                        if random_state.rand() < fraction:
-                            dest_txn.put(k, v)
+                    write_sorted(dest_txn, ((k, v) for k, v in cursor if random_state.rand() < fraction))
         LOGGER.debug(PROCESS_DONE_FORMAT.format('sample', rtn))
         return rtn
 
     def get_function_and_serdes(self, task_info: processor_pb2.TaskInfo):
         _function_bytes = task_info.function_bytes
-        return self.get_function(_function_bytes), self._serdes
+        return self.get_function(task_info.function_id, _function_bytes), self._serdes
 
     @staticmethod
     def get_environment(path, create_if_missing=True):
@@ -17,50 +17,15 @@ import json
 import argparse
 import os
 import traceback
-import csv
 import sys
 import time
 from arch.api import eggroll
+from arch.api.utils.load_utils import LOAD_CHUNK_BYTES
 
 
-CSV = 'csv'
 LOAD_DATA_COUNT = 10000
 MAX_PARTITION_NUM = 32
 
-def list_to_str(input_list):
-    str1 = ''
-    size = len(input_list)
-    for i in range(size):
-        if i == size - 1:
-            str1 += str(input_list[i])
-        else:
-            str1 += str(input_list[i]) + ','
-
-    return str1
-
-def read_data(input_file='', head=True):
-    split_file_name = input_file.split('.')
-    if CSV in split_file_name:
-        print("file type is csv")
-        with open(input_file) as csv_file:
-            csv_reader = csv.reader(csv_file)
-            if head is True:
-                csv_head = next(csv_reader)
-
-            for row in csv_reader:
-                yield (row[0], list_to_str(row[1:]))
-    else:
-        print("file type is not known, read it as txt")
-        with open(input_file, 'r') as fin:
-            if head is True:
-                head = fin.readline()
-
-            lines = fin.readlines()
-            for line in lines:
-                values = line.replace("\n", "").replace("\t", ",").split(",")
-                yield (values[0], list_to_str(values[1:]))
-
-
 def generate_table_name(input_file_path):
     local_time = time.localtime(time.time())
     str_time = time.strftime("%Y%m%d%H%M%S", time.localtime())
@@ -68,13 +33,15 @@ def generate_table_name(input_file_path):
     file_name = file_name.split("/")[-1]
     return file_name,str_time
 
-def data_to_eggroll_table(data, namespace, table_name,partition=1, work_mode=0):
+def file_to_eggroll_table(input_file, namespace, table_name, partition=1, work_mode=0, head=True,
+                          chunk_bytes=LOAD_CHUNK_BYTES):
+    # chunks of the file are parsed in parallel and committed as they are loaded, a failed load resumes
     eggroll.init(mode=work_mode)
     data_table = eggroll.table(table_name, namespace, partition=partition, create_if_missing=True, error_if_exist=False)
-    data_table.put_all(data)
-    data_table_count = data_table.count()
+    stats = data_table.load_file(input_file, head=head, chunk_bytes=chunk_bytes)
     print("------------load data finish!-----------------")
     print("total data_count:"+str(data_table.count()))
+    print("load stats: %s" % stats)
     print("namespace:%s, table_name:%s" %(namespace, table_name))
     #for kv in data_table.collect():
     #    print(kv)
@@ -145,18 +112,19 @@ if __name__ == "__main__":
                 if work_mode is None:
                     work_mode = 0
 
+                chunk_bytes = data.get('chunk_bytes', LOAD_CHUNK_BYTES)
+
             if not os.path.exists(input_file_path):
                 print("%s is not exist, please check the configure" % (input_file_path))
                 sys.exit()
 
 
-            input_data = read_data(input_file_path, head)
             _namespace, _table_name = generate_table_name(input_file_path)
             if namespace is None:
                 namespace = _namespace
             if table_name is None:
                 table_name = _table_name
-            data_to_eggroll_table(input_data, namespace, table_name, partition, work_mode)
+            file_to_eggroll_table(input_file_path, namespace, table_name, partition, work_mode, head, chunk_bytes)
 
         except ValueError:
             print('json解析错误')
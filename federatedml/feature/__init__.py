@@ -14,8 +14,9 @@
 #  limitations under the License.
 #
 
+from federatedml.feature.data_block import DataBlock
 from federatedml.feature.instance import Instance
 from federatedml.feature.quantile import Quantile
 from federatedml.feature.sparse_vector import SparseVector
 
-__all__ = ['Instance', 'Quantile', "SparseVector"]
+__all__ = ['DataBlock', 'Instance', 'Quantile', "SparseVector"]
@@ -0,0 +1,222 @@
+#!/usr/bin/env python    
+# -*- coding: utf-8 -*- 
+
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+################################################################################
+#
+#
+################################################################################
+
+# =============================================================================
+# DataBlock
+# =============================================================================
+
+import functools
+import pickle
+import struct
+
+import numpy as np
+
+from federatedml.feature.instance import Instance
+from federatedml.feature.sparse_vector import SparseVector
+
+# rows packed into one block by to_blocks
+DEFAULT_BLOCK_SIZE = 4096
+
+_ALIGNMENT = 8
+_HEADER_LEN = struct.Struct("<Q")
+
+
+class DataBlock(object):
+    """
+    Instances of one partition in columnar form: their keys, a dense feature matrix or the CSR arrays
+    data, indices and indptr of a sparse one, labels and weights. A block pickles as a single frame,
+    a small header followed by the raw array buffers, and the arrays of an unpickled block are
+    read-only views of that frame.
+    """
+
+    def __init__(self, keys, features=None, labels=None, weights=None,
+                 data=None, indices=None, indptr=None, shape=None, inst_ids=None):
+        self.keys = keys
+        self.features = features
+        self.labels = labels
+        self.weights = weights
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.shape = shape if features is None else features.shape
+        self.inst_ids = inst_ids
+
+    @property
+    def sparse(self):
+        return self.features is None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def from_instances(pairs):
+        """
+        Block of (key, Instance) pairs whose features are all ndarrays or all SparseVectors.
+        """
+        keys = [k for k, _ in pairs]
+        instances = [inst for _, inst in pairs]
+        labels = [inst.label for inst in instances]
+        labels = None if all(label is None for label in labels) else np.asarray(labels)
+        weights = np.asarray([inst.weight for inst in instances], dtype=np.float64)
+        inst_ids = [inst.inst_id for inst in instances]
+        inst_ids = None if all(inst_id is None for inst_id in inst_ids) else inst_ids
+
+        if all(type(inst.features).__name__ == "ndarray" for inst in instances):
+            features = np.vstack([inst.features for inst in instances]) if instances else np.zeros((0, 0))
+            return DataBlock(keys, features=features, labels=labels, weights=weights, inst_ids=inst_ids)
+
+        if not all(isinstance(inst.features, SparseVector) for inst in instances):
+            raise ValueError("a block holds either dense or sparse features")
+        indptr = np.zeros(len(instances) + 1, dtype=np.int64)
+        indices, data = [], []
+        for i, inst in enumerate(instances):
+            indices.extend(inst.features.sparse_vec.keys())
+            data.extend(inst.features.sparse_vec.values())
+            indptr[i + 1] = len(indices)
+        shape = (len(instances), max([inst.features.get_shape() for inst in instances], default=0))
+        return DataBlock(keys, labels=labels, weights=weights, data=np.asarray(data),
+                         indices=np.asarray(indices, dtype=np.int64), indptr=indptr, shape=shape, inst_ids=inst_ids)
+
+    def with_features(self, features=None, data=None):
+        """
+        Block of the same rows with new dense features, or new CSR data for the same non-zero positions.
+        """
+        if features is not None:
+            return DataBlock(self.keys, features=features, labels=self.labels, weights=self.weights,
+                             inst_ids=self.inst_ids)
+        return DataBlock(self.keys, labels=self.labels, weights=self.weights, data=data, indices=self.indices,
+                         indptr=self.indptr, shape=self.shape, inst_ids=self.inst_ids)
+
+    def row_ids(self):
+        """
+        Row of every CSR entry.
+        """
+        return np.repeat(np.arange(len(self.keys)), np.diff(self.indptr))
+
+    def dot(self, w):
+        if not self.sparse:
+            return self.features.dot(w)
+        return np.bincount(self.row_ids(), weights=self.data * np.asarray(w)[self.indices],
+                           minlength=len(self.keys))
+
+    def to_instances(self):
+        labels = [None] * len(self.keys) if self.labels is None else self.labels.tolist()
+        inst_ids = [None] * len(self.keys) if self.inst_ids is None else self.inst_ids
+        weights = self.weights.tolist()
+        for i, key in enumerate(self.keys):
+            if self.sparse:
+                start, end = self.indptr[i], self.indptr[i + 1]
+                features = SparseVector(self.indices[start:end].tolist(), self.data[start:end].tolist(),
+                                        self.shape[1])
+            else:
+                features = np.array(self.features[i])
+            yield key, Instance(inst_id=inst_ids[i], weight=weights[i], features=features, label=labels[i])
+
+    def __reduce__(self):
+        return _load_block, (self._frame(),)
+
+    def _frame(self):
+        header = {"keys": self.keys, "shape": self.shape, "inst_ids": self.inst_ids, "arrays": []}
+        buffers = []
+        offset = 0
+        for name in ("features", "labels", "weights", "data", "indices", "indptr"):
+            array = getattr(self, name)
+            if array is None:
+                continue
+            if array.dtype.hasobject:
+                header[name] = array
+                continue
+            array = np.ascontiguousarray(array)
+            padding = -offset % _ALIGNMENT
+            buffers.append(b"\0" * padding)
+            offset += padding
+            header["arrays"].append((name, array.dtype.str, array.shape, offset))
+            buffers.append(array.tobytes())
+            offset += array.nbytes
+        header_bytes = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+        # buffers start aligned within the frame
+        header_bytes += b"\0" * (-(_HEADER_LEN.size + len(header_bytes)) % _ALIGNMENT)
+        return b"".join([_HEADER_LEN.pack(len(header_bytes)), header_bytes] + buffers)
+
+
+def _load_block(frame):
+    header_len, = _HEADER_LEN.unpack_from(frame)
+    header = pickle.loads(frame[_HEADER_LEN.size: _HEADER_LEN.size + header_len])
+    base = _HEADER_LEN.size + header_len
+    arrays = {}
+    for name, dtype, shape, offset in header.pop("arrays"):
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(frame, dtype=dtype, count=count, offset=base + offset).reshape(shape)
+    for name in ("features", "labels", "weights", "data", "indices", "indptr"):
+        if name in header:
+            arrays[name] = header.pop(name)
+    return DataBlock(header["keys"], shape=header["shape"], inst_ids=header["inst_ids"], **arrays)
+
+
+def instances_to_blocks(kv_iterator, block_size=DEFAULT_BLOCK_SIZE):
+    block = []
+    for k, inst in kv_iterator:
+        block.append((k, inst))
+        if len(block) >= block_size:
+            yield block[0][0], DataBlock.from_instances(block)
+            block = []
+    if block:
+        yield block[0][0], DataBlock.from_instances(block)
+
+
+def blocks_to_instances(kv_iterator):
+    for _, block in kv_iterator:
+        yield from block.to_instances()
+
+
+def block_rows(kv_iterator, func):
+    for _, block in kv_iterator:
+        yield from zip(block.keys, func(block))
+
+
+def to_blocks(data_instances, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Block table of an instance table. A block is stored under the key of its first row, which keeps it
+    in the partition its rows come from.
+    """
+    return data_instances.map_partitions_to_pairs(functools.partial(instances_to_blocks, block_size=block_size),
+                                                  preserves_partitioning=True)
+
+
+def to_instances(block_table):
+    return block_table.map_partitions_to_pairs(blocks_to_instances, preserves_partitioning=True)
+
+
+def map_blocks(block_table, func):
+    """
+    Applies a vectorized func to every DataBlock, func returns the new block.
+    """
+    return block_table.mapValues(func)
+
+
+def map_block_rows(block_table, func):
+    """
+    Row table of the per-row values func computes for a whole DataBlock at once.
+    """
+    return block_table.map_partitions_to_pairs(functools.partial(block_rows, func=func),
+                                               preserves_partitioning=True)
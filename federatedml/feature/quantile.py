@@ -29,7 +29,6 @@ from arch.api.utils import log_utils
 
 import numpy as np
 import functools
-from arch.api import eggroll
 from federatedml.feature.sparse_vector import SparseVector
 from federatedml.util import consts
 
@@ -39,6 +38,9 @@ DEFAULT_BIN_GAP = 1e-6
 DEFAULT_BIN_NUM = 32
 DEFAULT_BIN_SAMPLE_NUM = 10000
 
+# dense instances binned together by convert_partition_to_bin
+CONVERT_BLOCK_SIZE = 4096
+
 
 class Quantile(object):
     def __init__(self, params):
@@ -55,8 +57,8 @@ class Quantile(object):
         bin_split_points = np.asarray(bin_split_points)
         bin_sparse_points = Quantile.find_bin_sparse_points(bin_split_points)
 
-        convert_bins = functools.partial(Quantile.convert_instance_to_bin, bin_split_points=bin_split_points)
-        data_bin = data_instance.mapValues(convert_bins)
+        convert_bins = functools.partial(Quantile.convert_partition_to_bin, bin_split_points=bin_split_points)
+        data_bin = data_instance.map_partitions_to_pairs(convert_bins, preserves_partitioning=True)
 
         LOGGER.info("end to fconvert feature to bin")
         return data_bin, bin_split_points, bin_sparse_points
@@ -281,21 +283,82 @@ class Quantile(object):
     @staticmethod
     def sample_data(data_instance, bin_sample_num=DEFAULT_BIN_SAMPLE_NUM):
         LOGGER.info("fsample data set")
+        return data_instance.take_sample(bin_sample_num)
+
+    @staticmethod
+    def convert_partition_to_bin(kv_iterator, bin_split_points=None):
+        """
+        Same bins as convert_instance_to_bin, dense instances are binned a block at a time with one
+        searchsorted per feature, sparse instances fall back to convert_instance_to_bin.
+        """
+        block = []
+        for key, instance in kv_iterator:
+            if type(instance.features).__name__ != "ndarray":
+                yield from Quantile._convert_block_to_bin(block, bin_split_points)
+                block = []
+                yield key, Quantile.convert_instance_to_bin(instance, bin_split_points)
+                continue
 
-        data_key_none_value = data_instance.mapValues(lambda value: None)
-        data_key_none_value_tuple = list(data_key_none_value.collect())
+            if block and instance.features.shape != block[0][1].features.shape:
+                yield from Quantile._convert_block_to_bin(block, bin_split_points)
+                block = []
 
-        data_num = len(data_key_none_value_tuple)
+            block.append((key, instance))
+            if len(block) >= CONVERT_BLOCK_SIZE:
+                yield from Quantile._convert_block_to_bin(block, bin_split_points)
+                block = []
 
-        if data_num <= bin_sample_num:
-            data_keys = [(key, _) for (key, _) in data_key_none_value_tuple]
-        else:
-            sample_idxs = np.random.choice(data_num, bin_sample_num, replace=False)
-            data_keys = [data_key_none_value_tuple[idx] for idx in sample_idxs]
+        yield from Quantile._convert_block_to_bin(block, bin_split_points)
+
+    @staticmethod
+    def convert_data_block_to_bin(block, bin_split_points=None):
+        """
+        DataBlock of bins, the same bins convert_instance_to_bin gives its rows. Sparse blocks bin
+        their non-zero entries one feature at a time.
+        """
+        if not block.sparse:
+            bins = np.zeros(block.features.shape, dtype='int')
+            for fid in range(block.features.shape[1]):
+                bins[:, fid] = Quantile._search_bins(bin_split_points[fid], block.features[:, fid])
+            return block.with_features(features=bins)
+
+        bins = np.zeros(block.data.shape, dtype='int')
+        order = np.argsort(block.indices, kind='mergesort')
+        fids, starts = np.unique(block.indices[order], return_index=True)
+        ends = np.append(starts[1:], order.shape[0])
+        for fid, start, end in zip(fids.tolist(), starts.tolist(), ends.tolist()):
+            entries = order[start:end]
+            bins[entries] = Quantile._search_bins(bin_split_points[fid], block.data[entries])
+        return block.with_features(data=bins)
+
+    @staticmethod
+    def convert_blocks_to_bin(block_table, bin_split_points):
+        convert_bins = functools.partial(Quantile.convert_data_block_to_bin, bin_split_points=bin_split_points)
+        return block_table.mapValues(convert_bins)
 
-        data_key_table = eggroll.parallelize(data_keys, include_key=True)
-        sample_data = list(data_key_table.join(data_instance, lambda x, y: y).collect())
-        return sample_data
+    @staticmethod
+    def _search_bins(split_points, values):
+        # first split point not below the value, or the number of split points past the last one
+        bins = np.searchsorted(split_points, values, side='left')
+        if split_points.shape[0] > 20:
+            # the binary search of convert_instance_to_bin leaves NaN in bin 0, the linear scan
+            # (and searchsorted) puts it past the last split point
+            bins[np.isnan(values)] = 0
+        return bins
+
+    @staticmethod
+    def _convert_block_to_bin(block, bin_split_points):
+        if not block:
+            return
+
+        features = np.vstack([instance.features for _, instance in block])
+        bins = np.zeros(features.shape, dtype='int')
+        for fid in range(features.shape[1]):
+            bins[:, fid] = Quantile._search_bins(bin_split_points[fid], features[:, fid])
+
+        for i, (key, instance) in enumerate(block):
+            instance.features = bins[i]
+            yield key, instance
 
     @staticmethod
     def convert_instance_to_bin(instance, bin_split_points=None):
@@ -0,0 +1,81 @@
+#
+#  Copyright 2019 The FATE Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import pickle
+import unittest
+
+import numpy as np
+
+from arch.api import eggroll
+from federatedml.feature import DataBlock
+from federatedml.feature import Instance
+from federatedml.feature import Quantile
+from federatedml.feature import SparseVector
+from federatedml.feature.data_block import map_block_rows, to_blocks, to_instances
+
+
+class TestDataBlock(unittest.TestCase):
+    def setUp(self):
+        eggroll.init("test_data_block")
+        self.dense_inst = [(i, Instance(features=np.arange(6.0) * (i % 7), label=i % 2)) for i in range(100)]
+        self.sparse_inst = [(i, Instance(features=SparseVector([j for j in range(8) if (i + j) % 3],
+                                                               [i + j for j in range(8) if (i + j) % 3], 8),
+                                         label=i % 2, weight=0.5)) for i in range(100)]
+
+    def test_frame(self):
+        for pairs in (self.dense_inst, self.sparse_inst):
+            block = pickle.loads(pickle.dumps(DataBlock.from_instances(pairs)))
+            self.assertEqual(len(block), 100)
+            self.assertFalse(block.weights.flags.writeable)
+            for (k1, inst1), (k2, inst2) in zip(pairs, block.to_instances()):
+                self.assertEqual(k1, k2)
+                self.assertEqual(inst1.label, inst2.label)
+                self.assertEqual(inst1.weight, inst2.weight)
+                if block.sparse:
+                    self.assertEqual(inst1.features.sparse_vec, inst2.features.sparse_vec)
+                    self.assertEqual(inst2.features.get_shape(), 8)
+                else:
+                    self.assertTrue(np.array_equal(inst1.features, inst2.features))
+
+    def test_block_table(self):
+        table = eggroll.parallelize(self.sparse_inst, include_key=True, partition=3)
+        blocks = to_blocks(table, block_size=16)
+        self.assertGreaterEqual(blocks.count(), 7)
+        rows = dict(to_instances(blocks).collect())
+        self.assertEqual(sorted(rows), list(range(100)))
+        self.assertEqual(rows[5].features.sparse_vec, self.sparse_inst[5][1].features.sparse_vec)
+
+        w = np.arange(8.0)
+        wx = dict(map_block_rows(blocks, lambda block: block.dot(w) + 1).collect())
+        for k, inst in self.sparse_inst:
+            self.assertAlmostEqual(wx[k], sum(v * w[j] for j, v in inst.features.get_all_data()) + 1)
+
+    def test_block_bins(self):
+        for pairs in (self.dense_inst, self.sparse_inst):
+            table = eggroll.parallelize(pairs, include_key=True, partition=2)
+            blocks = to_blocks(table, block_size=30)
+            data_bin, split_points, _ = Quantile.convert_feature_to_bin(table, "bin_by_sample_data", bin_num=4)
+            expected = dict(data_bin.collect())
+            bins = to_instances(Quantile.convert_blocks_to_bin(blocks, split_points))
+            for k, inst in bins.collect():
+                if isinstance(inst.features, SparseVector):
+                    self.assertEqual(inst.features.sparse_vec, expected[k].features.sparse_vec)
+                else:
+                    self.assertTrue(np.array_equal(inst.features, expected[k].features))
+
+
+if __name__ == '__main__':
+    unittest.main()
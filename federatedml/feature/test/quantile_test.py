@@ -18,6 +18,7 @@ import unittest
 import numpy as np
 
 from arch.api import eggroll
+from federatedml.feature import DataBlock
 from federatedml.feature import Instance
 from federatedml.feature import Quantile
 from federatedml.feature import SparseVector
@@ -72,6 +73,21 @@ class TestInstance(unittest.TestCase):
         for i in range(20):
             self.assertTrue(len(self.sparse_inst[i][1].features.sparse_vec) == len(bin_result[i].sparse_vec))
 
+    def test_nan_bins(self):
+        for split_num in (5, 30):
+            split_points = [np.arange(split_num, dtype='float'), np.arange(split_num, dtype='float')]
+            rows = [np.array([np.nan, 2.5]), np.array([-1.0, np.nan]), np.array([split_num + 1.0, 0.0])]
+            expected = [Quantile.convert_instance_to_bin(Instance(features=row.copy()), split_points).features
+                        for row in rows]
+
+            pairs = [(i, Instance(features=row.copy())) for i, row in enumerate(rows)]
+            partition_bins = dict(Quantile.convert_partition_to_bin(iter(pairs), split_points))
+            block = DataBlock.from_instances([(i, Instance(features=row.copy())) for i, row in enumerate(rows)])
+            block_bins = Quantile.convert_data_block_to_bin(block, split_points).features
+            for i in range(len(rows)):
+                self.assertTrue(np.array_equal(partition_bins[i].features, expected[i]))
+                self.assertTrue(np.array_equal(block_bins[i], expected[i]))
+
 
 if __name__ == '__main__':
     unittest.main()
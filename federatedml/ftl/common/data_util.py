@@ -285,7 +285,7 @@ def create_table(data, indexes=None, model_table_name=None, model_namespace=None
     return dtable
 
 
-def save_data_to_eggroll_table(data, namespace, table_name, partition=1):
+def save_data_to_eggroll_table(data, namespace, table_name, partition=None):
     data_table = table(table_name, namespace, partition=partition, create_if_missing=True, error_if_exist=True)
     data_table.put_all(data)
     return data_table
@@ -19,20 +19,21 @@ import math
 import uuid
 from federatedml.ftl.eggroll_computation.util import distribute_compute_vAvg_XY, distribute_compute_hSum_XY, \
     distribute_encrypt, distribute_decrypt, distribute_compute_XY, distribute_compute_X_plus_Y
-from arch.api.eggroll import parallelize, table
+from arch.api.eggroll import parallelize, suggest_partitions, table
 
 
-def prepare_table(matrix, batch_size=1, max_partition=20):
+def prepare_table(matrix, batch_size=1, max_partition=None):
     """
     create table populated with input matrix
     :param matrix: 2D matrix
     :param batch_size: batch size for sample space
-    :param max_partition max partition allowed
+    :param max_partition max partition allowed, by default one partition per core of the job
     :return:
     """
     m_length = len(matrix)
     n_batches = math.ceil(m_length / batch_size)
-    partition = min(n_batches, max_partition)
+    # rows are encrypted or multiplied one by one, every core gets a partition however few rows there are
+    partition = min(n_batches, suggest_partitions() if max_partition is None else max_partition)
     X = parallelize(matrix, partition=partition)
     return X
 
@@ -239,11 +240,9 @@ def encrypt_matmul_2_ob(X, Y, partition=20):
     XT = create_empty_table(str(uuid.uuid1()), str(uuid.uuid1()), partition=partition)
     YT = create_empty_table(str(uuid.uuid1()), str(uuid.uuid1()), partition=partition)
 
-    for m in range(len(X)):
-        for k in range(Y.shape[1]):
-            key = str(m) + "_" + str(k)
-            XT.put(key, X[m])
-            YT.put(key, Y[:, k])
+    keys = [str(m) + "_" + str(k) for m in range(len(X)) for k in range(Y.shape[1])]
+    XT.put_all(zip(keys, (X[m] for m in range(len(X)) for _ in range(Y.shape[1]))))
+    YT.put_all(zip(keys, (Y[:, k] for _ in range(len(X)) for k in range(Y.shape[1]))))
 
     dictionary = distribute_compute_hSum_XY(XT, YT)
 
@@ -264,12 +263,10 @@ def encrypt_matmul_3_ob(X, Y, partition=20):
     XT = create_empty_table(str(uuid.uuid1()), str(uuid.uuid1()), partition=partition)
     YT = create_empty_table(str(uuid.uuid1()), str(uuid.uuid1()), partition=partition)
 
-    for i in range(X.shape[0]):
-        for m in range(X.shape[1]):
-            for k in range(Y.shape[-1]):
-                key = str(i) + "_" + str(m) + "_" + str(k)
-                XT.put(key, X[i, m, :])
-                YT.put(key, Y[i, :, k])
+    indexes = [(i, m, k) for i in range(X.shape[0]) for m in range(X.shape[1]) for k in range(Y.shape[-1])]
+    keys = [str(i) + "_" + str(m) + "_" + str(k) for i, m, k in indexes]
+    XT.put_all(zip(keys, (X[i, m, :] for i, m, _ in indexes)))
+    YT.put_all(zip(keys, (Y[i, :, k] for i, _, k in indexes)))
 
     dictionary = distribute_compute_hSum_XY(XT, YT)
 
@@ -26,7 +26,7 @@ def distribute_compute_XY(X, Y):
     :return: a DTable
     """
     R = X.join(Y, lambda x, y: x * y)
-    val = R.collect()
+    val = R.collect(ordered=False)
     table = dict(val)
     return table
 
@@ -40,7 +40,7 @@ def distribute_compute_X_plus_Y(X, Y):
     """
 
     R = X.join(Y, lambda x, y: x + y)
-    val = R.collect()
+    val = R.collect(ordered=False)
     table = dict(val)
     return table
 
@@ -53,7 +53,7 @@ def distribute_compute_hSum_XY(X, Y):
     :return: a DTable
     """
     R = X.join(Y, lambda x, y: np.sum(x * y))
-    val = R.collect()
+    val = R.collect(ordered=False)
     table = dict(val)
     return table
 
@@ -19,6 +19,7 @@ import numpy as np
 from arch.api import eggroll
 from arch.api.utils import log_utils
 from federatedml.evaluation import Evaluation
+from federatedml.feature.data_block import map_block_rows
 from federatedml.logistic_regression.logistic_regression_modelmeta import LogisticRegressionModelMeta
 from federatedml.optim import Initializer
 from federatedml.optim import L1Updater
@@ -107,6 +108,9 @@ class BaseLogisticRegression(object):
     def compute_wx(self, data_instances, coef_, intercept_=0):
         return data_instances.mapValues(lambda v: fate_operator.dot(v.features, coef_) + intercept_)
 
+    def compute_block_wx(self, block_table, coef_, intercept_=0):
+        return map_block_rows(block_table, lambda block: block.dot(coef_) + intercept_)
+
     def set_flowid(self, flowid=0):
         if self.transfer_variable is not None:
             self.transfer_variable.set_flowid(flowid)
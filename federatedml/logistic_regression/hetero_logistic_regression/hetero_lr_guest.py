@@ -16,6 +16,7 @@
 
 import numpy as np
 from arch.api import federation
+from arch.api import StorageLevel
 from arch.api.utils import log_utils
 from federatedml.logistic_regression.base_logistic_regression import BaseLogisticRegression
 from federatedml.model_selection import MiniBatch
@@ -39,11 +40,12 @@ class HeteroLRGuest(BaseLogisticRegression):
     def compute_forward(self, data_instances, coef_, intercept_):
         self.wx = self.compute_wx(data_instances, coef_, intercept_)
         encrypt_operator = self.encrypt_operator
-        self.guest_forward = self.wx.mapValues(
+        # the encryption runs while fit waits for the forward of the host
+        self.guest_forward = self.wx.map_values_async(
             lambda v: (encrypt_operator.encrypt(v), encrypt_operator.encrypt(np.square(v)), v))
 
     def aggregate_forward(self, host_forward):
-        aggregate_forward_res = self.guest_forward.join(host_forward,
+        aggregate_forward_res = self.guest_forward.result().join(host_forward,
                                                         lambda g, h: (g[0] + h[0], g[1] + h[1] + 2 * g[2] * h[0]))
         return aggregate_forward_res
 
@@ -55,7 +57,7 @@ class HeteroLRGuest(BaseLogisticRegression):
 
     def fit(self, data_instances):
         LOGGER.info("Enter hetero_lr_guest fit")
-        data_instances = data_instances.mapValues(HeteroLRGuest.load_data)
+        data_instances = data_instances.mapValues(HeteroLRGuest.load_data).persist(StorageLevel.MEMORY_ONLY)
 
         public_key = federation.get(name=self.transfer_variable.paillier_pubkey.name,
                                     tag=self.transfer_variable.generate_transferid(
@@ -205,6 +207,8 @@ class HeteroLRGuest(BaseLogisticRegression):
             self.n_iter_ += 1
             if is_stopped:
                 break
+
+        data_instances.unpersist()
         LOGGER.info("Reach max iter {}, train model finish!".format(self.max_iter))
 
     def predict(self, data_instances, predict_param):
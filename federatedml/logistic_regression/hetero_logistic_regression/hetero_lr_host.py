@@ -16,6 +16,7 @@
 
 import numpy as np
 from arch.api import federation
+from arch.api import StorageLevel
 from federatedml.logistic_regression.base_logistic_regression import BaseLogisticRegression
 from federatedml.optim.gradient import HeteroLogisticGradient
 from federatedml.util import consts
@@ -40,6 +41,8 @@ class HeteroLRHost(BaseLogisticRegression):
 
     def fit(self, data_instances):
         LOGGER.info("Enter hetero_lr host")
+        # every batch of every iteration reads data_instances, workers keep it deserialized
+        data_instances.persist(StorageLevel.MEMORY_ONLY)
         public_key = federation.get(name=self.transfer_variable.paillier_pubkey.name,
                                     tag=self.transfer_variable.generate_transferid(
                                         self.transfer_variable.paillier_pubkey),
@@ -159,6 +162,7 @@ class HeteroLRHost(BaseLogisticRegression):
             if is_stopped:
                 break
 
+        data_instances.unpersist()
         LOGGER.info("Reach max iter {}, train model finish!".format(self.max_iter))
 
     def predict(self, data_instances, predict_param=None):
@@ -52,9 +52,9 @@ class KFold(BaseCrossValidator):
             train_table = eggroll.parallelize(train_sids_table,
                                               include_key=True,
                                               partition=data_inst._partitions)
-            train_data = data_inst.join(train_table, lambda x, y: x)
+            train_data = data_inst.semi_join(train_table)
             test_table = eggroll.parallelize(test_sids_table,
                                              include_key=True,
                                              partition=data_inst._partitions)
-            test_data = data_inst.join(test_table, lambda x, y: x)
+            test_data = data_inst.semi_join(test_table)
             yield train_data, test_data
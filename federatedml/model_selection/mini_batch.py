@@ -46,7 +46,7 @@ class MiniBatch:
         for index_data in batch_data_sids:
             # LOGGER.debug('in generator, index_data is {}'.format(index_data))
             index_table = eggroll.parallelize(index_data, include_key=True, partition=data_inst._partitions)
-            batch_data = index_table.join(data_inst, lambda x, y: y)
+            batch_data = data_inst.semi_join(index_table)
             yield batch_data
 
     def mini_batch_index_generator(self, data_inst=None, batch_size=320):
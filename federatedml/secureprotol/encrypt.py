@@ -72,10 +72,7 @@ class Encrypt(object):
 
     def recursive_decrypt(self, A):
         if not isinstance(A, np.ndarray) and not isinstance(A, list):
-            data_dict = A.collect()
-            data_dict = dict(data_dict)
-            A = list(data_dict.values())
-            A = np.array(A)
+            A = A.values_as_array()
 
         # LOGGER.debug("type A is {}".format(type(A)))
         if isinstance(A, list):
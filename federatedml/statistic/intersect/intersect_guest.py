@@ -55,6 +55,8 @@ class RsaIntersectionGuest(Intersect):
         # table(sid, r)
         table_random_value = data_instances.mapValues(
             lambda v: random.SystemRandom().getrandbits(self.random_bit))
+        # random values are read twice below, keep them from being recomputed by lazy execution
+        table_random_value.persist()
 
         # table(sid, hash(sid))
         table_hash_sid = data_instances.map(lambda k, v:
@@ -141,7 +143,7 @@ class RawIntersectionGuest(Intersect):
                                  idx=0)
 
         LOGGER.info("Get intersect_host_ids from Host")
-        intersect_ids = intersect_host_ids.join(data_instances, lambda i, d: 1)
+        intersect_ids = intersect_host_ids.semi_join(data_instances)
         LOGGER.info("Finish intersect_ids computing")
 
         if self.send_intersect_id_flag:
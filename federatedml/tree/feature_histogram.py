@@ -27,7 +27,10 @@
 import functools
 import copy
 import numpy as np
+from arch.api import eggroll
 from arch.api.utils import log_utils
+from federatedml.feature.data_block import DataBlock
+from federatedml.feature.sparse_vector import SparseVector
 
 LOGGER = log_utils.getLogger()
 
@@ -52,20 +55,22 @@ class FeatureHistogram(object):
                             valid_features=None, node_map=None):
         LOGGER.info("bin_shape is {}, node num is {}".format(bin_split_points.shape, len(node_map)))
         batch_histogram_cal = functools.partial(
-            FeatureHistogram.batch_calculate_histogram,
-            bin_split_points=bin_split_points, bin_sparse_points=bin_sparse_points,
-            valid_features=valid_features, node_map=node_map)
+            FeatureHistogram.batch_calculate_histogram_with_broadcast,
+            bin_split_points=eggroll.broadcast(bin_split_points),
+            bin_sparse_points=eggroll.broadcast(bin_sparse_points),
+            valid_features=valid_features, node_map=eggroll.broadcast(node_map))
 
         agg_histogram = functools.partial(FeatureHistogram.aggregate_histogram, node_map=node_map)
 
         batch_histogram = data_bin.join(grad_and_hess, \
                                         lambda data_inst, g_h: (data_inst, g_h)).mapPartitions(batch_histogram_cal)
 
-        return batch_histogram.reduce(agg_histogram)
+        return batch_histogram.tree_reduce(agg_histogram)
 
     @staticmethod
     def aggregate_histogram(batch_histogram1, batch_histogram2, node_map=None):
-        histograms = copy.deepcopy(batch_histogram1)
+        # accumulates into batch_histogram1, reduce always hands over a histogram it owns
+        histograms = batch_histogram1
         for i in range(len(histograms)):
             for j in range(len(histograms[i])):
                 for k in range(len(histograms[i][j])):
@@ -74,6 +79,74 @@ class FeatureHistogram(object):
 
         return histograms
 
+    @staticmethod
+    def batch_calculate_histogram_with_broadcast(kv_iterator, bin_split_points=None,
+                                                 bin_sparse_points=None, valid_features=None,
+                                                 node_map=None):
+        return FeatureHistogram.batch_calculate_histogram(kv_iterator,
+                                                          bin_split_points=bin_split_points.value,
+                                                          bin_sparse_points=bin_sparse_points.value,
+                                                          valid_features=valid_features,
+                                                          node_map=node_map.value)
+
+    @staticmethod
+    def _is_plain(values):
+        return all(isinstance(v, (float, int, np.floating, np.integer)) for v in values)
+
+    @staticmethod
+    def calculate_block_histogram(block, node_ids, grad, hess, bin_split_points,
+                                  bin_sparse_points=None, valid_features=None, node_map=None):
+        """
+        batch_calculate_histogram of a sparse DataBlock of bins with plain number gradients. Every sum is
+        a bincount over the CSR entries, which adds up the rows in the same order as the row loop does.
+        """
+        node_num = len(node_map)
+        feature_num = bin_split_points.shape[0]
+        bin_nums = np.asarray([bin_split_points[fid].shape[0] + 1 for fid in range(feature_num)], dtype=np.int64)
+        bin_offsets = np.concatenate([[0], np.cumsum(bin_nums)[:-1]]).astype(np.int64)
+        bin_total = int(bin_nums.sum())
+
+        nids = np.asarray([node_map.get(nid) for nid in node_ids], dtype=np.int64)
+        grad = np.asarray(grad, dtype=np.float64)
+        hess = np.asarray(hess, dtype=np.float64)
+        rows = block.row_ids()
+        fids = block.indices
+        bins = np.asarray(block.data, dtype=np.int64)
+        if valid_features is not None:
+            valid = np.asarray([valid_features[fid] is not False for fid in range(feature_num)], dtype=bool)
+            selected = valid[fids]
+            rows, fids, bins = rows[selected], fids[selected], bins[selected]
+        entry_nids = nids[rows]
+
+        def _sums(index, size):
+            return [np.bincount(index, weights=grad[rows], minlength=size).tolist(),
+                    np.bincount(index, weights=hess[rows], minlength=size).tolist(),
+                    np.bincount(index, minlength=size).tolist()]
+
+        bin_sums = _sums(entry_nids * bin_total + bin_offsets[fids] + bins, node_num * bin_total)
+        zero_optim = _sums(entry_nids * feature_num + fids, node_num * feature_num)
+        node_sums = [np.bincount(nids, weights=grad, minlength=node_num).tolist(),
+                     np.bincount(nids, weights=hess, minlength=node_num).tolist(),
+                     np.bincount(nids, minlength=node_num).tolist()]
+
+        node_histograms = []
+        for nid in range(node_num):
+            feature_histograms = []
+            for fid in range(feature_num):
+                if valid_features is not None and valid_features[fid] is False:
+                    feature_histograms.append([])
+                    continue
+                start = nid * bin_total + int(bin_offsets[fid])
+                histogram = [[bin_sums[i][start + b] for i in range(3)] for b in range(int(bin_nums[fid]))]
+                if valid_features is not None and valid_features[fid] is True:
+                    sparse_point = bin_sparse_points[fid]
+                    for i in range(3):
+                        histogram[sparse_point][i] += node_sums[i][nid] - zero_optim[i][nid * feature_num + fid]
+                feature_histograms.append(histogram)
+            node_histograms.append(feature_histograms)
+
+        return node_histograms
+
     @staticmethod
     def batch_calculate_histogram(kv_iterator, bin_split_points=None,
                                   bin_sparse_points=None, valid_features=None,
@@ -99,6 +172,12 @@ class FeatureHistogram(object):
             data_record += 1
 
         LOGGER.info("begin batch calculate histogram, data count is {}".format(data_record))
+        if data_bins and FeatureHistogram._is_plain(grad) and FeatureHistogram._is_plain(hess) \
+                and all(isinstance(data_bin.features, SparseVector) for data_bin in data_bins):
+            block = DataBlock.from_instances(list(zip(node_ids, data_bins)))
+            return FeatureHistogram.calculate_block_histogram(block, node_ids, grad, hess, bin_split_points,
+                                                              bin_sparse_points, valid_features, node_map)
+
         node_num = len(node_map)
         zero_optim = [[[0 for i in range(3)]
                        for j in range(bin_split_points.shape[0])]
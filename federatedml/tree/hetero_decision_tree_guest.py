@@ -28,6 +28,7 @@
 from arch.api.utils import log_utils
 
 import functools
+from arch.api import eggroll
 from arch.api import federation
 import random
 import numpy as np
@@ -115,22 +116,24 @@ class HeteroDecisionTreeGuest(DecisionTree):
         LOGGER.info("set valid features")
         self.valid_features = valid_features
 
-    def sync_encrypted_grad_and_hess(self):
+    def sync_encrypted_grad_and_hess(self, encrypted_grad_and_hess=None):
+        if encrypted_grad_and_hess is None:
+            encrypted_grad_and_hess = self.encrypt_grad_and_hess()
         LOGGER.info("send encrypted grad and hess to host")
-        encrypted_grad_and_hess = self.encrypt_grad_and_hess()
-        federation.remote(obj=encrypted_grad_and_hess,
+        federation.remote(obj=encrypted_grad_and_hess.result(),
                           name=self.transfer_inst.encrypted_grad_and_hess.name,
                           tag=self.transfer_inst.generate_transferid(self.transfer_inst.encrypted_grad_and_hess),
                           role=consts.HOST,
                           idx=0)
 
     def encrypt_grad_and_hess(self):
+        '''
+        DTableFuture of the encrypted grad and hess, the encryption runs while the caller goes on.
+        '''
         LOGGER.info("start to encrypt grad and hess")
         encrypter = self.encrypter
-        encrypted_grad_and_hess = self.grad_and_hess.mapValues(
+        return self.grad_and_hess.map_values_async(
             lambda grad_hess: (encrypter.encrypt(grad_hess[0]), encrypter.encrypt(grad_hess[1])))
-        LOGGER.info("finish to encrypt grad and hess")
-        return encrypted_grad_and_hess
 
     def get_grad_hess_sum(self, grad_and_hess_table):
         LOGGER.info("calculate the sum of grad and hess")
@@ -308,6 +311,13 @@ class HeteroDecisionTreeGuest(DecisionTree):
                 return (1, tree_[nodeid].fid, tree_[nodeid].bid, \
                         nodeid, tree_[nodeid].left_nodeid, tree_[nodeid].right_nodeid)
 
+    @staticmethod
+    def dispatch_node_with_broadcast(value, tree_=None, decoder=None,
+                                     split_maskdict=None, bin_sparse_points=None):
+        return HeteroDecisionTreeGuest.dispatch_node(value, tree_=tree_.value, decoder=decoder,
+                                                     split_maskdict=split_maskdict.value,
+                                                     bin_sparse_points=bin_sparse_points.value)
+
     def sync_dispatch_node_host(self, dispatch_guest_data, dep=-1):
         LOGGER.info("send node to host to dispath, depth is {}".format(dep))
         federation.remote(obj=dispatch_guest_data,
@@ -327,11 +337,11 @@ class HeteroDecisionTreeGuest(DecisionTree):
 
     def redispatch_node(self, dep=-1):
         LOGGER.info("redispatch node of depth {}".format(dep))
-        dispatch_node_method = functools.partial(self.dispatch_node,
-                                                 tree_=self.tree_,
+        dispatch_node_method = functools.partial(self.dispatch_node_with_broadcast,
+                                                 tree_=eggroll.broadcast(self.tree_),
                                                  decoder=self.decode,
-                                                 split_maskdict=self.split_maskdict,
-                                                 bin_sparse_points=self.bin_sparse_points)
+                                                 split_maskdict=eggroll.broadcast(self.split_maskdict),
+                                                 bin_sparse_points=eggroll.broadcast(self.bin_sparse_points))
         dispatch_guest_result = self.data_bin_with_node_dispatch.mapValues(dispatch_node_method)
         tree_node_num = self.tree_node_num
         LOGGER.info("rmask edispatch node result of depth {}".format(dep))
@@ -367,7 +377,7 @@ class HeteroDecisionTreeGuest(DecisionTree):
 
     def fit(self):
         LOGGER.info("begin to fit guest decision tree")
-        self.sync_encrypted_grad_and_hess()
+        encrypted_grad_and_hess = self.encrypt_grad_and_hess()
 
         root_sum_grad, root_sum_hess = self.get_grad_hess_sum(self.grad_and_hess)
         root_node = Node(id=0, sitename=consts.GUEST, sum_grad=root_sum_grad, sum_hess=root_sum_hess,
@@ -375,6 +385,7 @@ class HeteroDecisionTreeGuest(DecisionTree):
         self.tree_node_queue = [root_node]
 
         self.dispatch_all_node_to_root()
+        self.sync_encrypted_grad_and_hess(encrypted_grad_and_hess)
 
         for dep in range(self.max_depth):
             LOGGER.info("start to fit depth {}, tree node queue size is {}".format(dep, len(self.tree_node_queue)))
@@ -41,6 +41,7 @@ from federatedml.tree import BoostingTreeModelMeta
 from federatedml.evaluation import Evaluation
 
 from arch.api import eggroll
+from arch.api import StorageLevel
 from arch.api import federation
 import numpy as np
 from arch.api.utils import log_utils
@@ -94,6 +95,8 @@ class HeteroSecureBoostingTreeGuest(BoostingTree):
             Quantile.convert_feature_to_bin(
                 data_instance, self.quantile_method, self.bin_num,
                 self.bin_gap, self.bin_sample_num)
+        # every depth of every tree reads data_bin, workers keep it deserialized
+        self.data_bin.persist(StorageLevel.MEMORY_ONLY)
 
     def set_y(self):
         LOGGER.info("set label from data and check label")
@@ -34,6 +34,7 @@ from federatedml.util import consts
 from numpy import random
 from arch.api import federation
 from arch.api import eggroll
+from arch.api import StorageLevel
 from arch.api.utils import log_utils
 
 LOGGER = log_utils.getLogger()
@@ -58,6 +59,8 @@ class HeteroSecureBoostingTreeHost(BoostingTree):
             Quantile.convert_feature_to_bin(
                 data_instance, self.quantile_method, self.bin_num,
                 self.bin_gap, self.bin_sample_num)
+        # every depth of every tree reads data_bin, workers keep it deserialized
+        self.data_bin.persist(StorageLevel.MEMORY_ONLY)
 
     def sample_valid_features(self):
         LOGGER.info("sample valid features")
@@ -25,6 +25,7 @@ import functools
 import numpy as np
 from arch.api.utils import log_utils
 
+from federatedml.feature.data_block import DEFAULT_BLOCK_SIZE, instances_to_blocks
 from federatedml.feature.instance import Instance
 from federatedml.feature.sparse_vector import SparseVector
 from federatedml.util import consts
@@ -62,6 +63,22 @@ class DenseFeatureReader(object):
 
         return data_instance
 
+    def read_data_blocks(self, table_name, namespace, block_size=DEFAULT_BLOCK_SIZE):
+        input_data = eggroll.table(table_name, namespace)
+        LOGGER.info("start to read data and change data to blocks")
+
+        params = [self.delimitor, self.data_type, self.missing_fill,
+                  self.default_value, self.with_label, self.label_idx,
+                  self.label_type, self.output_format]
+
+        to_blocks_with_param = functools.partial(self.to_data_blocks, params, block_size=block_size)
+        return input_data.map_partitions_to_pairs(to_blocks_with_param, preserves_partitioning=True)
+
+    @staticmethod
+    def to_data_blocks(param_list, kv_iterator, block_size=DEFAULT_BLOCK_SIZE):
+        instances = ((key, DenseFeatureReader.to_instance(param_list, value)) for key, value in kv_iterator)
+        return instances_to_blocks(instances, block_size)
+
     @staticmethod
     def to_instance(param_list, value):
         delimitor = param_list[0]
@@ -54,6 +54,15 @@ class TestDataIO(unittest.TestCase):
         self.assertTrue(features.shape[0] == 6)
         self.assertTrue(features.dtype == "float64")
 
+    def test_data_blocks(self):
+        dataio_param = DataIOParam()
+        reader = DenseFeatureReader(dataio_param)
+        blocks = [block for _, block in reader.read_data_blocks(self.table, self.namespace).collect()]
+        self.assertEqual(sum(len(block) for block in blocks), 2)
+        rows = dict((k, features) for block in blocks for k, features in zip(block.keys, block.features))
+        self.assertTrue(np.array_equal(rows['a'], np.asarray([1, 2, -1, 0, 0, 5], dtype="float64")))
+        self.assertTrue(np.array_equal(rows['b'], np.asarray([4, 5, 6, 0, 1, 2], dtype="float64")))
+
     def test_sparse_output_format(self):
         dataio_param = DataIOParam()
         dataio_param.output_format = "sparse"
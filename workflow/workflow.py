@@ -99,7 +99,7 @@ class WorkFlow(object):
                                       idx=0)
 
             LOGGER.info("get {} from guest".format(data_application))
-            join_data_insts = data_sid.join(data_instance, lambda s, d: d)
+            join_data_insts = data_instance.semi_join(data_sid)
             return join_data_insts
 
     def _initialize_workflow_param(self, config_path):
@@ -309,7 +309,7 @@ class WorkFlow(object):
             LOGGER.info("not eval_data!")
             return None
 
-        eval_data_local = eval_data.collect()
+        eval_data_local = eval_data.collect(ordered=False)
         labels = []
         pred_prob = []
         pred_labels = []